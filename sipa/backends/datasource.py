@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import socket
+from bisect import bisect_right
 from collections.abc import Callable
 from dataclasses import dataclass, field
-from ipaddress import IPv4Network, IPv4Address, AddressValueError
+from functools import lru_cache
+from ipaddress import IPv4Network, IPv4Address
+from itertools import pairwise
 
 from flask import Flask
 
@@ -42,6 +46,8 @@ class DataSource:
         self.user_class: type[UserLike] = _user_class
 
         self._dormitories = {d.name: d for d in dormitories}
+        self._dormitory_index = DormitoryIndex(dormitories)
+        self._cached_dormitory_lookup = lru_cache(maxsize=4096)(self._dormitory_index.lookup)
         #: The mail server to be appended to a user's login in order
         #: to construct the mail address.
         self.mail_server = mail_server
@@ -75,11 +81,7 @@ class DataSource:
 
         :return: The dormitory containing ``ip``
         """
-        try:
-            address = IPv4Address(str(ip))
-        except AddressValueError:
-            return None
-        return next((d for d in self.dormitories if address in d.subnets), None)
+        return self._cached_dormitory_lookup(str(ip))
 
     def init_app(self, app: Flask):
         """Initialize this backend
@@ -132,6 +134,52 @@ class SubnetCollection:
         return False
 
 
+class DormitoryIndex:
+    """A lookup table from IPv4 addresses to dormitories
+
+    The subnets of all dormitories are flattened into sorted, disjoint
+    integer ranges, so that a lookup is a binary search.  If subnets of
+    several dormitories overlap, the dormitory given first wins.
+    """
+
+    def __init__(self, dormitories: list[Dormitory]):
+        ranges = [
+            (int(subnet.network_address), int(subnet.broadcast_address), dormitory)
+            for dormitory in dormitories
+            for subnet in dormitory.subnets.subnets
+        ]
+        # split the address space at every range boundary; each
+        # resulting segment belongs to at most one dormitory.
+        boundaries = sorted({start for start, _, _ in ranges}
+                            | {end + 1 for _, end, _ in ranges})
+
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._dormitories: list[Dormitory] = []
+        for start, next_start in pairwise(boundaries):
+            owner = next((d for s, e, d in ranges if s <= start <= e), None)
+            if owner is None:
+                continue
+            if self._dormitories and self._dormitories[-1] is owner \
+                    and self._ends[-1] + 1 == start:
+                self._ends[-1] = next_start - 1
+                continue
+            self._starts.append(start)
+            self._ends.append(next_start - 1)
+            self._dormitories.append(owner)
+
+    def lookup(self, ip: str) -> Dormitory | None:
+        """Return the dormitory containing ``ip``, if ``ip`` is a valid IPv4 address"""
+        try:
+            address = int.from_bytes(socket.inet_pton(socket.AF_INET, ip))
+        except (OSError, ValueError):
+            return None
+        i = bisect_right(self._starts, address) - 1
+        if i < 0 or address > self._ends[i]:
+            return None
+        return self._dormitories[i]
+
+
 # used for two things:
 # 1. determining whether the source IP belongs to a pycroft user
 # 2. suggesting a default dormitory name based on an IP
@@ -2,10 +2,11 @@ from __future__ import annotations
 
 from typing import NamedTuple, cast
 
-from flask import request, current_app, Flask
+from flask import request, current_app, Flask, g
 from flask_login import AnonymousUserMixin
 from werkzeug.local import LocalProxy
 
+from sipa.utils.cache import cache, MISSING, reset_g_before_request
 from .datasource import DataSource, Dormitory
 from .exceptions import InvalidConfiguration
 from .logging import logger
@@ -59,6 +60,9 @@ class Backends:
         self.available_datasources = {d.name: d for d in available_datasources}
         self.app: Flask = None
         self.datasource: DataSource = None
+        #: For how long to remember which user an ip belongs to.
+        #: ``0`` disables this cache.
+        self.user_from_ip_ttl: float = 0
 
     def init_app(self, app: Flask):
         """Register self to app and initialize datasources
@@ -90,6 +94,9 @@ class Backends:
         if self.datasource.init_app:
             self.datasource.init_app(self.app)
 
+        self.user_from_ip_ttl = app.config.get('USER_FROM_IP_CACHE_TTL', 0)
+        reset_g_before_request(app, 'user_from_ip_memo')
+
     # CENTRAL PROPERTIES
 
     @property
@@ -134,6 +141,9 @@ class Backends:
         """Return the User that corresponds to ``ip`` according to the
         datasource.
 
+        The result is memoized for the current request, and optionally
+        (see ``USER_FROM_IP_CACHE_TTL``) across requests.
+
         :param ip: The ip
 
         :return: The corresponding User in the sense of the
@@ -143,7 +153,33 @@ class Backends:
         if not self.dormitory_from_ip(ip):
             return AnonymousUserMixin()
 
-        return self.datasource.user_class.from_ip(ip)
+        memo = g.setdefault('user_from_ip_memo', {})
+        if (user := memo.get(ip)) is None:
+            user = memo[ip] = self._cached_user_from_ip(ip)
+        return user
+
+    def _cached_user_from_ip(self, ip: str) -> UserLike:
+        if not self.user_from_ip_ttl:
+            return self.datasource.user_class.from_ip(ip)
+
+        key = f"user-from-ip:{self.datasource.name}:{ip}"
+        cached_id = cache.get(key)
+        if cached_id is None:
+            # negative entry: no user at this ip
+            return AnonymousUserMixin()
+        if cached_id is not MISSING:
+            try:
+                return self.datasource.user_class.get(cached_id)
+            except Exception:
+                # whatever went wrong, the lookup by ip is authoritative
+                logger.warning("Could not load cached user %s of ip %s", cached_id, ip,
+                               exc_info=True)
+                cache.delete(key)
+
+        user = self.datasource.user_class.from_ip(ip)
+        cache.set(key, user.get_id() if user.is_authenticated else None,
+                  self.user_from_ip_ttl)
+        return user
 
 
 #: A namedtuple to improve readability of some return values
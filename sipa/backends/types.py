@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 from typing import Protocol
 
 
@@ -11,3 +13,11 @@ class UserLike(Protocol):
 
     @property
     def is_anonymous(self) -> bool: ...
+
+    @classmethod
+    def get(cls, username: str) -> UserLike: ...
+
+    @classmethod
+    def from_ip(cls, ip: str) -> UserLike: ...
+
+    def get_id(self) -> str | None: ...
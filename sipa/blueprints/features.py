@@ -3,12 +3,27 @@ Basically, this is everything that is to specific to appear in the generic.py
 and does not fit into any other blueprint such as “documents”.
 """
 
+from functools import partial
+
 from flask import Blueprint, current_app, render_template, render_template_string
 
 from sipa.utils import get_bustimes, meetingcal, support_hotline_available, support_cal
+from sipa.utils.stale_cache import StaleWhileRevalidate
 
 bp_features = Blueprint('features', __name__)
 
+#: Departures are shown for up to two minutes, refreshed after 20 seconds
+_departures = StaleWhileRevalidate(fresh_for=20, stale_for=100)
+
+
+def fetch_bustimes(stops, count):
+    """Get the departures of all ``stops`` concurrently, see :py:func:`get_bustimes`"""
+    keys = {stop: f"bustimes:{stop}:{count}" for stop in stops}
+    departures = _departures.get_many({
+        key: partial(get_bustimes, stop, count) for stop, key in keys.items()
+    })
+    return {stop: departures[key] for stop, key in keys.items()}
+
 
 @bp_features.route("/bustimes")
 @bp_features.route("/bustimes/<string:stopname>")
@@ -17,15 +32,12 @@ def bustimes(stopname=None):
     If no specific stop is given in the URL, it will query all
     stops set up in the config.
     """
-    data = {}
-
     if stopname:
         # Only one stop requested
-        data[stopname] = get_bustimes(stopname)
+        data = fetch_bustimes([stopname], 10)
     else:
         # General output page
-        for stop in current_app.config['BUSSTOPS']:
-            data[stop] = get_bustimes(stop, 4)
+        data = fetch_bustimes(current_app.config['BUSSTOPS'], 4)
 
     return render_template('bustimes.html', stops=data, stopname=stopname)
 
@@ -2,6 +2,7 @@ import logging
 import os
 
 from flask import (
+    current_app,
     render_template,
     request,
     redirect,
@@ -38,6 +39,7 @@ from sipa.model.exceptions import (
     LoginNotAllowed,
 )
 from sipa.utils.git_utils import get_repo_active_branch, get_latest_commits
+from sipa.utils.link_patch import resolve_script_root
 
 logger = logging.getLogger(__name__)
 
@@ -247,6 +249,7 @@ def jinja_format_date(date):
 
 
 bp_generic.add_app_template_filter(format_money, name='money')
+bp_generic.add_app_template_filter(resolve_script_root)
 
 
 @bp_generic.route("/usertraffic")
@@ -369,6 +372,14 @@ def version():
     )
 
 
+@bp_generic.route('/search')
+def search():
+    """Search the content pages and news"""
+    query = request.args.get('q', '').strip()
+    results = current_app.cf_pages.search(query) if query else []
+    return render_template('search.html', query=query, results=results)
+
+
 @bp_generic.route('/debug-sentry')
 def trigger_error():
     """An endpoint intentionally triggering an error to test reporting"""
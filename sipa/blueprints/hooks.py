@@ -34,14 +34,8 @@ def content_hook():
     logger.info("Update hook triggered. Fetching content.")
     reload_necessary = update_repo(current_app.config['FLATPAGES_ROOT'])
     if reload_necessary:
-        try:
-            import uwsgi
-        except ImportError:
-            logger.debug("UWSGI not present, skipping reload")
-            pass
-        else:
-            logger.debug("Reloading UWSGI...")
-            uwsgi.reload()
+        logger.debug("Reloading flatpages...")
+        current_app.cf_pages.reload_all_workers()
 
     # 204: No content
     # https://en.wikipedia.org/wiki/List_of_HTTP_status_codes#204
@@ -2,7 +2,6 @@
 Blueprint providing features regarding the news entries.
 """
 import typing as t
-from operator import attrgetter
 from traceback import format_exception_only
 
 from flask import (
@@ -12,15 +11,37 @@ from flask import (
     render_template,
     request,
     render_template_string,
+    url_for,
 )
 from flask_flatpages import Page
 
-from sipa.flatpages import CategorizedFlatPages, Article
+from sipa.flatpages import CategorizedFlatPages, Article, request_locale_order
+from sipa.utils.cache import MISSING, cache
+from sipa.utils.news_feed import Feed, atom_feed, feed_entries, json_feed
+from sipa.utils.response_cache import (
+    cache_anonymous_response,
+    conditional_anonymous_response,
+    response_cache,
+)
 
 bp_news = Blueprint('news', __name__, url_prefix='/news')
 
+#: The feed formats, with their renderer and mimetype
+FEED_FORMATS: dict[str, tuple[t.Callable[[Feed], bytes], str]] = {
+    'atom': (atom_feed, 'application/atom+xml'),
+    'json': (json_feed, 'application/feed+json'),
+}
+#: The key contains the content version, so this only bounds the memory used
+FEED_CACHE_TTL = 24 * 60 * 60
+
+
+#: The query arguments :py:func:`show` reads
+RANGE_ARGS = ('start', 'end')
+
 
 @bp_news.route("/")
+@conditional_anonymous_response(query_args=RANGE_ARGS)
+@cache_anonymous_response(query_args=RANGE_ARGS)
 def show():
     """Get all markdown files from 'content/news/', parse them and put
     them in a list for the template.
@@ -28,13 +49,7 @@ def show():
     """
     start = request.args.get('start', None, int)
     end = request.args.get('end', None, int)
-    cf_pages = current_app.cf_pages
-    news = sorted(
-        (article for article in cf_pages.get_articles_of_category('news')
-         if hasattr(article, 'date')),
-        key=attrgetter('date'),
-        reverse=True,
-    )
+    news = current_app.cf_pages.news_index().articles
     if len(news) == 0:
         return render_template(
             "news.html", articles=None, previous_range=0, next_range=0
@@ -77,20 +92,65 @@ def show():
 
 
 @bp_news.route("/<filename>")
+@conditional_anonymous_response()
+@cache_anonymous_response()
 def show_news(filename):
-    news = current_app.cf_pages.get_articles_of_category('news')
+    article = current_app.cf_pages.news_index().by_basename.get(filename)
+    if article is None:
+        abort(404)
+    return render_template("news.html", articles=[article])
+
+
+@bp_news.route("/feed.<any(atom, json):format>")
+def feed(format: str):
+    """The dated news as a feed, in the preferred locales of the client"""
+    cf_pages: CategorizedFlatPages = current_app.cf_pages  # type: ignore
+    locale_order = request_locale_order()
+    render, mimetype = FEED_FORMATS[format]
+    host_url = _host_url()
+    url_root = f"{host_url}{request.script_root}/"
+    # without a configured server name, the links depend on the Host
+    # header, so they must not fill the shared cache
+    backend = cache if current_app.config['SERVER_NAME'] else response_cache
+    key = ":".join(("news-feed", format, cf_pages.content_version,
+                    ",".join(locale_order), url_root))
+
+    if (body := backend.get(key)) is MISSING:
+        entries = feed_entries(
+            cf_pages.news_index(locale_order).articles,
+            locale_order,
+            url_for_article=lambda article: host_url + url_for(
+                ".show_news", filename=article.file_basename
+            ),
+            url_root=url_root,
+        )
+        body = render(Feed(
+            title="AG DSN News",
+            home_url=host_url + url_for(".show"),
+            feed_url=f"{host_url}{request.script_root}{request.path}",
+            entries=entries,
+        ))
+        backend.set(key, body, FEED_CACHE_TTL)
+
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.add_etag()
+    return response.make_conditional(request)
+
 
-    for article in news:
-        if article.file_basename == filename:
-            return render_template("news.html", articles=[article])
+def _host_url() -> str:
+    """The scheme and host to build absolute links with
 
-    abort(404)
+    This is ``SERVER_NAME`` if it is configured, so that a forged
+    ``Host`` header does not end up in the links of a cached feed.
+    """
+    if server_name := current_app.config['SERVER_NAME']:
+        return f"{request.scheme}://{server_name}"
+    return request.host_url.rstrip('/')
 
 
 def try_get_content(cf_pages: CategorizedFlatPages, filename: str) -> str:
     """Reconstructs the content of a news article from the given filename."""
-    news = cf_pages.get_articles_of_category("news")
-    article = next((a for a in news if a.file_basename == filename), None)
+    article = cf_pages.news_index().by_basename.get(filename)
     if not article:
         return ""
     assert isinstance(article, Article)
@@ -102,9 +162,9 @@ def try_get_content(cf_pages: CategorizedFlatPages, filename: str) -> str:
 @bp_news.route("/edit")
 @bp_news.route("/<filename>/edit")
 def edit(filename: str | None = None):
-    return render_template(
-        "news_edit.html", content=try_get_content(current_app.cf_pages, filename)
-    )
+    # without a filename, a new article is written
+    content = try_get_content(current_app.cf_pages, filename) if filename is not None else ""
+    return render_template("news_edit.html", content=content)
 
 
 @bp_news.route("/preview", methods=["GET", "POST"])
@@ -7,6 +7,11 @@ from logging import getLogger
 from flask import Blueprint, render_template, redirect, current_app
 from flask_login import current_user
 
+from sipa.utils.response_cache import (
+    cache_anonymous_response,
+    conditional_anonymous_response,
+)
+
 
 logger = getLogger(__name__)
 
@@ -14,6 +19,8 @@ bp_pages = Blueprint('pages', __name__, url_prefix='/pages')
 
 
 @bp_pages.route('/<category_id>/<article_id>')
+@conditional_anonymous_response()
+@cache_anonymous_response()
 def show(category_id, article_id):
     """Display a flatpage and parse dynamic content if available
 
@@ -20,6 +20,9 @@ BACKEND = "pycroft"
 
 FLATPAGES_ROOT = None
 FLATPAGES_EXTENSION = '.md'
+# Where to store the parsed pages per commit of the content repository,
+# so that they need not be parsed by every worker.  `None` disables this.
+CONTENT_BUNDLE_DIR = None
 
 FLATPAGES_MARKDOWN_EXTENSIONS = [
     'sane_lists',
@@ -57,6 +60,16 @@ MAILSERVER_SSL_CA_DATA = None
 MAILSERVER_SSL_CA_FILE = None
 MAILSERVER_USER = None
 MAILSERVER_PASSWORD = None
+# Number of connections to the mail server kept open between mails,
+# 0 closes them after each mail
+MAILSERVER_POOL_SIZE = 0
+# Seconds after which a kept connection is closed
+MAILSERVER_POOL_IDLE_TIMEOUT = 60
+# If set, mails are stored in a SQLite database at this path and sent
+# in the background, retrying RETRY_DELAY, 2*RETRY_DELAY, … seconds later
+MAIL_SPOOL_PATH = None
+MAIL_SPOOL_MAX_ATTEMPTS = 10
+MAIL_SPOOL_RETRY_DELAY = 30
 # CONTACT_SENDER_MAIL  # Must be set
 
 # MySQL Helios configuration
@@ -72,6 +85,27 @@ SQL_CONNECTION_RECYCLE = 3600
 # Whether to use the timer
 UWSGI_TIMER_ENABLED = False
 
+# Calendars and the hotline status are refreshed by a thread in every
+# worker, which checks every BACKGROUND_REFRESH_TICK seconds whether one
+# of them is due.  Without it, they are never refreshed.
+BACKGROUND_REFRESH = True
+BACKGROUND_REFRESH_TICK = 10
+
+# Cache backend: "simple" (per worker) or "uwsgi" (shared between the
+# workers, needs a `cache2` named `CACHE_UWSGI_NAME` in the uwsgi.ini).
+# "auto" uses "uwsgi" when running under uwsgi with that cache configured.
+CACHE_BACKEND = "auto"
+CACHE_SIMPLE_SIZE = 4096
+CACHE_UWSGI_NAME = "sipa"
+# How long to keep rendered content pages for anonymous visitors.
+# 0 disables this.
+RESPONSE_CACHE_TTL = 0
+# How many rendered pages each worker keeps at most
+RESPONSE_CACHE_SIZE = 512
+# Identifies the deployed version of sipa in ETags and cached pages.
+# Defaults to a fingerprint of the files of the sipa package.
+APP_REVISION = None
+
 # The Token for the git update hook.
 # It is disabled if nothing provided
 GIT_UPDATE_HOOK_TOKEN = ""
@@ -96,6 +130,32 @@ MEMBERSHIP_CONTRIBUTION = 500
 # Pycroft backend
 PYCROFT_ENDPOINT = "http://localhost:5000/api/v0/"
 PYCROFT_API_KEY = "secret"
+# (connect, read) timeout in seconds.  A page may call the API twice (the
+# user and their histories), so twice the sum must stay below uwsgi's
+# `harakiri` of 8 seconds.
+PYCROFT_TIMEOUT = (1, 2.5)
+# Maximum number of connections kept alive to the API
+PYCROFT_POOL_SIZE = 10
+# Cache of user lookups, keyed by user id.  A TTL of 0 disables it.
+PYCROFT_USER_CACHE_TTL = 30
+# Convert the (possibly long) user histories without validating them
+PYCROFT_TRUSTED_DECODING = False
+# Last known user data, shown (marked as outdated) if the API fails.
+# A TTL of 0 disables this.
+PYCROFT_STALE_USER_TTL = 24 * 60 * 60
+# For how long the stale data may be shown to whoever uses the ip of the
+# user.  Keep this short, the ip may be handed to someone else.
+PYCROFT_STALE_IP_TTL = 15 * 60
+# Stop calling the API for RESET_TIMEOUT seconds once at least
+# FAILURE_RATE of the last WINDOW calls (and at least MIN_CALLS) failed
+PYCROFT_BREAKER_FAILURE_RATE = 0.5
+PYCROFT_BREAKER_WINDOW = 20
+PYCROFT_BREAKER_MIN_CALLS = 5
+PYCROFT_BREAKER_RESET_TIMEOUT = 30
+
+# For how long to remember which user (if any) is behind an IP.
+# 0 disables this; the lookup is still only done once per request.
+USER_FROM_IP_CACHE_TTL = 0
 
 DB_HELIOS_URI = "mysql+pymysql://verwaltung:{}@userdb.agdsn.network:3306/".format("secret")
 DB_HELIOS_IP_MASK = "10.0.7.%"
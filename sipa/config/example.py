@@ -87,6 +87,9 @@
 # Whether to use the timer
 # UWSGI_TIMER_ENABLED = False
 
+# Refresh calendars and the hotline status in the background
+# BACKGROUND_REFRESH = True
+
 # The languages babel provides.  It does not make much sense to chagne
 # anything here.
 
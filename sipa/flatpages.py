@@ -1,31 +1,71 @@
 from __future__ import annotations
 
 import logging
+import os
+import threading
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass, field
-from functools import cached_property, lru_cache
+from functools import lru_cache
+from itertools import permutations
 from operator import attrgetter
 from os.path import basename, dirname, splitext
 
+import click
 from babel.core import Locale, UnknownLocaleError, negotiate_locale
-from flask import abort, request, Flask
-from flask_babel import get_babel
+from flask import abort, g, request, Flask, current_app
+from flask.cli import with_appcontext
+from flask_babel import get_babel, get_locale
 from flask_flatpages import FlatPages, Page
+from markupsafe import Markup
+from werkzeug.utils import import_string
 from yaml.scanner import ScannerError
 
 from sipa.babel import possible_locales, preferred_locales
+from sipa.search import SearchIndex, SearchResult, TermCache
+from sipa.utils.cache import cache, reset_g_before_request
+from sipa.utils.git_utils import changed_files
+from sipa.utils.content_bundle import (
+    ContentBundle,
+    PageRecord,
+    get_commit,
+    load_bundle,
+    write_bundle,
+)
 
 logger = logging.getLogger(__name__)
 
 
 @lru_cache(maxsize=128)
-def cached_negotiate_locale(
-    preferred_locales: tuple[str], available_locales: tuple[str]
-) -> str | None:
-    return negotiate_locale(
-        preferred_locales,
-        available_locales,
-        sep="-",
-    )
+def content_locale_order(preferred_locales: tuple[str, ...]) -> tuple[str, ...]:
+    """The possible locales, ordered by the given preferences
+
+    Possible locales not matching any of the preferences are left out.
+    An article is shown in the first of these locales it is available in.
+    """
+    available = tuple(str(locale) for locale in possible_locales())
+    order: list[str] = []
+    for preferred in preferred_locales:
+        locale = negotiate_locale((preferred,), available, sep="-")
+        if locale is not None and locale not in order:
+            order.append(locale)
+    return tuple(order)
+
+
+def request_locale_order() -> tuple[str, ...]:
+    """The :py:func:`content_locale_order` of the current request
+
+    It is computed once per request and kept on :py:data:`flask.g`.
+    """
+    if (order := g.get('content_locale_order')) is None:
+        order = g.content_locale_order = content_locale_order(tuple(preferred_locales()))
+    return order
+
+
+def all_content_locale_orders() -> Iterable[tuple[str, ...]]:
+    """Every value :py:func:`content_locale_order` can return"""
+    locales = [str(locale) for locale in possible_locales()]
+    for length in range(len(locales) + 1):
+        yield from permutations(locales, length)
 
 
 # NB: Node is meant to be a union `Article | Category`.
@@ -62,6 +102,10 @@ class Article(Node):
     localized_pages: dict[str, Page] = field(init=False, default_factory=dict)
     #: The default page
     default_page: Page | None = field(init=False, default=None)
+    #: The result of :py:meth:`page_for`, by locale order
+    _pages_by_order: dict[tuple[str, ...], Page] = field(
+        init=False, default_factory=dict, repr=False, compare=False,
+    )
 
     def add_page(self, page: Page, locale: str | Locale) -> None:
         """Add a page to the pages list.
@@ -85,6 +129,24 @@ class Article(Node):
         self.localized_pages[str(locale)] = page
         if self.default_page is None or locale == self.default_locale:
             self.default_page = page
+        self._pages_by_order.clear()
+
+    def page_for(self, locale_order: tuple[str, ...]) -> Page:
+        """The page of the first of the given locales available
+
+        :param locale_order: As returned by :py:func:`content_locale_order`
+        :returns: That page, or :py:attr:`default_page`
+        """
+        if (page := self._pages_by_order.get(locale_order)) is not None:
+            return page
+        page = next(
+            (self.localized_pages[locale] for locale in locale_order
+             if locale in self.localized_pages),
+            self.default_page,
+        )
+        assert page is not None
+        self._pages_by_order[locale_order] = page
+        return page
 
     @property
     def rank(self) -> int:
@@ -101,6 +163,9 @@ class Article(Node):
     def html(self) -> str:
         """The :py:attr:`localized_page` as html
 
+        Absolute links still contain the script root placeholder, see
+        :py:func:`~sipa.utils.link_patch.resolve_script_root`.
+
         :returns: The :py:attr:`localized_page` converted to html
         """
         return self.localized_page.html
@@ -151,28 +216,16 @@ class Article(Node):
                 f"{type(self).__name__!r} object has no attribute {attr!r}"
             ) from e
 
-    @cached_property
-    def available_locales(self) -> tuple[str, ...]:
-        return tuple(self.localized_pages.keys())
-
     @property
     def localized_page(self) -> Page:
         """The current localized page
 
         This is the flatpage of the first available locale from
-        :py:func:`~sipa.babel.locale_preferences`, or
-        :py:attr:`default_page`.
+        :py:func:`request_locale_order`, or :py:attr:`default_page`.
 
         :returns: The localized page
         """
-        negotiated_locale = cached_negotiate_locale(
-            tuple(preferred_locales()),
-            self.available_locales,
-        )
-        if negotiated_locale is not None:
-            return self.localized_pages[negotiated_locale]
-        assert self.default_page is not None
-        return self.default_page
+        return self.page_for(request_locale_order())
 
     @property
     def file_basename(self) -> str:
@@ -218,7 +271,7 @@ class Category(Node):
     def articles(self):
         """Return an iterator over the articles sorted by rank
 
-        Only used for building the navigation bar
+        The navigation bar uses the precomputed :py:class:`Navigation`.
         """
         return iter(sorted(self._articles.values(), key=attrgetter('rank')))
 
@@ -303,6 +356,125 @@ class Category(Node):
         article.add_page(page, locale)
 
 
+@dataclass(frozen=True)
+class NewsIndex:
+    """The news articles as seen in one locale order"""
+    #: The articles with a date, newest first
+    articles: list[Article]
+    #: All articles, by the :py:attr:`Article.file_basename` of their page
+    by_basename: dict[str, Article]
+
+    @classmethod
+    def build(cls, news: Iterable[Article], locale_order: tuple[str, ...]) -> NewsIndex:
+        pages = [(article, article.page_for(locale_order)) for article in news]
+        dated = sorted(
+            ((article, page) for article, page in pages if 'date' in page.meta),
+            key=lambda article_page: article_page[1].meta['date'],
+            reverse=True,
+        )
+        by_basename: dict[str, Article] = {}
+        for article, page in pages:
+            by_basename.setdefault(splitext(basename(page.path))[0], article)
+        return cls(articles=[article for article, _ in dated], by_basename=by_basename)
+
+
+@dataclass(frozen=True)
+class NavigationArticle:
+    id: str
+    title: str
+    icon: str | None
+
+
+@dataclass(frozen=True)
+class NavigationCategory:
+    id: str
+    name: str
+    #: The visible articles, sorted by rank
+    articles: list[NavigationArticle]
+
+
+@dataclass(frozen=True)
+class Navigation:
+    """The content part of the navigation bar as seen in one locale order
+
+    It only lists categories with an index page having ``index`` set,
+    sorted by the rank of that page.
+    """
+    categories: list[NavigationCategory]
+    #: The rendered navigation, by locale and script root
+    _fragments: dict[tuple[str, str], Markup] = field(
+        default_factory=dict, repr=False, compare=False,
+    )
+
+    @classmethod
+    def build(cls, root: Category, locale_order: tuple[str, ...]) -> Navigation:
+        def meta(article: Article) -> dict:
+            return article.page_for(locale_order).meta
+
+        categories = []
+        for category in root.categories.values():
+            index = category._articles.get('index')
+            if index is None or not meta(index).get('index'):
+                continue
+            articles = sorted(
+                (article for article in category._articles.values()
+                 if article.id != 'index'),
+                key=lambda article: meta(article).get('rank', 100),
+            )
+            categories.append((meta(index).get('rank', 100), NavigationCategory(
+                id=category.id,
+                name=meta(index).get('name', ''),
+                articles=[
+                    NavigationArticle(article.id, meta(article)['title'],
+                                      meta(article).get('icon'))
+                    for article in articles
+                    if meta(article).get('title') and not meta(article).get('hidden', False)
+                ],
+            )))
+        categories.sort(key=lambda rank_category: rank_category[0])
+        return cls(categories=[category for _, category in categories])
+
+    def render(self) -> Markup:
+        """Render ``_navigation.html``, reusing earlier results
+
+        The result only depends on the locale and script root, because
+        the navigation does not contain anything user specific.
+        """
+        if current_app.jinja_env.auto_reload:
+            return self._render()
+        key = (str(get_locale()), request.script_root)
+        if (fragment := self._fragments.get(key)) is None:
+            fragment = self._fragments[key] = self._render()
+        return fragment
+
+    def _render(self) -> Markup:
+        # not `render_template`, this is part of whatever page is rendered
+        template = current_app.jinja_env.get_template("_navigation.html")
+        return Markup(template.render(navigation=self))
+
+
+@dataclass(frozen=True)
+class _Content:
+    """Everything loaded from one state of the content
+
+    It is replaced as a whole, so that a request never sees parts of
+    two different states.
+    """
+    #: The commit of the content repository the pages were loaded from
+    commit: str | None
+    #: Incremented whenever the content is replaced
+    generation: int
+    #: The pages, by path
+    pages: Mapping[str, Page]
+    root: Category
+    #: The news, by locale order
+    news_indexes: Mapping[tuple[str, ...], NewsIndex]
+    #: The navigation, by locale order
+    navigations: Mapping[tuple[str, ...], Navigation]
+    #: The search index, by locale
+    search_indexes: Mapping[str, SearchIndex]
+
+
 class CategorizedFlatPages:
     """The main interface to gather pages and categories
 
@@ -311,25 +483,48 @@ class CategorizedFlatPages:
     - Looping: E.g. In the navbar
     - get news → get_articles_of_category('news')
     - get static page → get_or_404()
+    - full-text search → search()
+
+    If ``CONTENT_BUNDLE_DIR`` is set, the parsed pages are stored there
+    in a :py:class:`~sipa.utils.content_bundle.ContentBundle` per
+    commit of the content repository, and loaded from it if possible.
+
+    :py:meth:`reload` builds a new category tree and then swaps it in,
+    so requests are served from the old tree in the meantime.  If the
+    content repository moved from one commit to another, only the pages
+    changed in between are parsed again.  The
+    loaded commit is published in the shared :py:data:`~sipa.utils.cache.cache`,
+    and every other worker sharing it reloads in the background once it
+    notices a different commit there.
     """
+
+    #: The key of the published commit in the shared cache
+    COMMIT_CACHE_KEY = "content-commit"
+
     def __init__(self):
         self.flat_pages = FlatPages()
-        self.root_category: Category | None = None
         self.app: Flask | None = None
+        self._default_locale: Locale | str | None = None
+        self._content: _Content | None = None
+        self._term_cache = TermCache()
+        self._reload_lock = threading.Lock()
+        #: The last published commit this worker reacted to
+        self._seen_commit: str | None = None
 
     def init_app(self, app: Flask):
         assert self.app is None, "Already initialized with an app"
         app.config.setdefault('FLATPAGES_LEGACY_META_PARSER', True)
+        app.config.setdefault('CONTENT_BUNDLE_DIR', None)
         self.app = app
         app.cf_pages = self  # type: ignore
+        app.cli.add_command(build_content_bundle_command)
+        reset_g_before_request(app, 'content_locale_order')
+        app.before_request(self._check_published_commit)
         self.flat_pages.init_app(app)
-        babel = get_babel(app)
-        self.root_category = Category(
-            parent=None,
-            id="<root>",
-            default_locale=babel.default_locale,
-        )
-        self._init_categories()
+        self._default_locale = get_babel(app).default_locale
+        commit = get_commit(app.config['FLATPAGES_ROOT'])
+        pages = {page.path: page for page in self._load_pages(commit)}
+        self._content = self._build_content(commit, pages, generation=0)
 
     @staticmethod
     def _require_initialized[T](field: T | None) -> T:
@@ -337,15 +532,39 @@ class CategorizedFlatPages:
             raise RuntimeError("CategorizedFlatPages was not initialized")
         return field
 
+    @property
+    def commit(self) -> str | None:
+        """The commit of the content repository the pages were loaded from"""
+        return self._content.commit if self._content is not None else None
+
+    @property
+    def generation(self) -> int:
+        """Incremented whenever the content is replaced"""
+        return self._content.generation if self._content is not None else 0
+
+    @property
+    def root_category(self) -> Category | None:
+        return self._content.root if self._content is not None else None
+
+    @property
+    def content_version(self) -> str:
+        """Identifies the loaded content, e.g. for cache keys
+
+        This is the commit if there is one, as it is the same in every
+        worker.  Otherwise, it is the worker-local :py:attr:`generation`.
+        """
+        content = self._require_initialized(self._content)
+        return content.commit or f"generation-{content.generation}"
+
     @property
     def categories(self):
         """Yield all categories as an iterable
         """
-        root = self._require_initialized(self.root_category)
+        root = self._require_initialized(self._content).root
         return sorted(root.categories.values(), key=attrgetter('rank'))
 
     def get(self, category_id, article_id):
-        root = self._require_initialized(self.root_category)
+        root = self._require_initialized(self._content).root
         if (category := root.categories.get(category_id)) is None:
             return None
         return category._articles.get(article_id)
@@ -353,7 +572,7 @@ class CategorizedFlatPages:
     def get_category(self, category_id):
         """Return the `Category` object from a given name (id)
         """
-        root = self._require_initialized(self.root_category)
+        root = self._require_initialized(self._content).root
         return root.categories.get(category_id)
 
     def get_articles_of_category(self, category_id):
@@ -367,6 +586,44 @@ class CategorizedFlatPages:
         return [article for article in category._articles.values()
                 if article.id != 'index']
 
+    def news_index(self, locale_order: tuple[str, ...] | None = None) -> NewsIndex:
+        """The news as seen in the given locale order
+
+        :param locale_order: Defaults to the order of the current request
+        """
+        if locale_order is None:
+            locale_order = request_locale_order()
+        content = self._require_initialized(self._content)
+        if (index := content.news_indexes.get(locale_order)) is None:
+            index = NewsIndex.build(_news_articles(content.root), locale_order)
+        return index
+
+    def navigation(self, locale_order: tuple[str, ...] | None = None) -> Navigation:
+        """The navigation as seen in the given locale order
+
+        :param locale_order: Defaults to the order of the current request
+        """
+        if locale_order is None:
+            locale_order = request_locale_order()
+        content = self._require_initialized(self._content)
+        if (navigation := content.navigations.get(locale_order)) is None:
+            navigation = Navigation.build(content.root, locale_order)
+        return navigation
+
+    def search(self, query: str, locale: str | None = None,
+               limit: int = 20) -> list[SearchResult]:
+        """Search the articles as seen in ``locale``
+
+        :param locale: Defaults to the preferred locale of the current
+            request, or the default locale
+        """
+        if locale is None:
+            locale = next(iter(request_locale_order()), str(self._default_locale))
+        content = self._require_initialized(self._content)
+        if (index := content.search_indexes.get(locale)) is None:
+            return []
+        return index.search(query, limit=limit)
+
     def get_or_404(self, category_id, article_id):
         """Fetch a static page"""
         page = self.get(category_id, article_id)
@@ -374,18 +631,242 @@ class CategorizedFlatPages:
             abort(404)
         return page
 
-    def _init_categories(self):
+    def _load_pages(self, commit: str | None) -> list[Page]:
+        """Load the pages from the bundle of ``commit``, or parse them
+
+        In the latter case, a bundle is written for the next time.
+        """
+        app = self._require_initialized(self.app)
+        bundle_dir = app.config['CONTENT_BUNDLE_DIR']
+        if not (bundle_dir and commit):
+            return list(self.flat_pages)
+
+        if (bundle := load_bundle(bundle_dir, commit)) is not None:
+            logger.debug("Loaded content bundle of %s", commit)
+            html_renderer = self._html_renderer()
+            return [record.to_page(html_renderer) for record in bundle.pages]
+
+        pages = list(self.flat_pages)
+        self._write_bundle(commit, pages)
+        return pages
+
+    def write_bundle(self) -> None:
+        """Write the bundle of the current commit, if bundles are enabled"""
+        self._write_bundle(self.commit, self.flat_pages)
+
+    def _write_bundle(self, commit: str | None, pages: Iterable[Page]) -> None:
+        app = self._require_initialized(self.app)
+        if not ((bundle_dir := app.config['CONTENT_BUNDLE_DIR']) and commit):
+            return
+        write_bundle(bundle_dir, ContentBundle(
+            commit=commit,
+            pages=[PageRecord.from_page(page) for page in pages],
+        ))
+        logger.info("Wrote content bundle of %s", commit)
+
+    def _html_renderer(self):
+        """The renderer :py:class:`FlatPages` would pass to a new page"""
+        renderer = self.flat_pages.config("html_renderer")
+        if not callable(renderer):
+            renderer = import_string(renderer)
+        return self.flat_pages._smart_html_renderer(renderer)
+
+    def _build_tree(self, pages: Iterable[Page]) -> Category:
+        """Build a new category tree from the given pages"""
+        root = Category(
+            parent=None,
+            id="<root>",
+            default_locale=self._require_initialized(self._default_locale),
+        )
         # TODO: Store categories, not articles
-        for page in self.flat_pages:
+        for page in pages:
             # get category + page name
             # plus, assert that there is nothing more to that.
             components = page.path.split('/')
-            parent = self._require_initialized(self.root_category)
+            parent = root
             for category_id in components[:-1]:
                 parent = parent.add_child_category(category_id)
             prefix = components[-1]
             parent.add_article(prefix, page)
+        return root
+
+    def reload(self) -> None:
+        """Load the pages of the checked out commit and swap them in
 
-    def reload(self):
-        self.flat_pages.reload()
-        self._init_categories()
+        Afterwards, the commit is published to the other workers.
+        """
+        with self._reload_lock:
+            self._reload()
+        self._publish_commit()
+
+    def reload_all_workers(self) -> None:
+        """Load the checked out commit in every worker
+
+        Workers sharing the cache with this one notice the published
+        commit by themselves.  Otherwise, uwsgi is told to restart all
+        workers, unless this is not running under uwsgi.
+        """
+        app = self._require_initialized(self.app)
+        if not app.extensions['cache'].shared:
+            try:
+                import uwsgi
+            except ImportError:
+                pass
+            else:
+                logger.debug("Cache is not shared between workers, reloading uwsgi")
+                uwsgi.reload()
+                return
+        self.reload()
+
+    def reload_in_background(self) -> bool:
+        """Like :py:meth:`reload`, but in a thread, and without publishing
+
+        Does nothing if a reload is already running.
+
+        :returns: Whether a reload was started
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self._reload()
+            except Exception:
+                logger.exception("Reloading the content failed")
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=run, name="content-reload", daemon=True).start()
+        return True
+
+    def _reload(self) -> None:
+        app = self._require_initialized(self.app)
+        current = self._require_initialized(self._content)
+        root_dir = app.config['FLATPAGES_ROOT']
+        commit = get_commit(root_dir)
+
+        changed = (
+            changed_files(root_dir, current.commit, commit)
+            if current.commit is not None and commit is not None
+            else None
+        )
+        if changed is None:
+            self.flat_pages.reload()
+            pages = {page.path: page for page in self._load_pages(commit)}
+        else:
+            pages = self._update_pages(current.pages, changed)
+            self._write_bundle(commit, pages.values())
+
+        self._content = self._build_content(commit, pages, current.generation + 1)
+        logger.info("Loaded content of commit %s (generation %d)",
+                    commit, current.generation + 1)
+
+    def _build_content(self, commit: str | None, pages: dict[str, Page],
+                       generation: int) -> _Content:
+        root = self._build_tree(pages.values())
+        return _Content(
+            commit=commit,
+            generation=generation,
+            pages=pages,
+            root=root,
+            news_indexes=self._build_news_indexes(root),
+            navigations=self._build_navigations(root),
+            search_indexes=self._build_search_indexes(root),
+        )
+
+    @staticmethod
+    def _build_news_indexes(root: Category) -> dict[tuple[str, ...], NewsIndex]:
+        news = _news_articles(root)
+        return {order: NewsIndex.build(news, order) for order in all_content_locale_orders()}
+
+    @staticmethod
+    def _build_navigations(root: Category) -> dict[tuple[str, ...], Navigation]:
+        return {order: Navigation.build(root, order) for order in all_content_locale_orders()}
+
+    def _build_search_indexes(self, root: Category) -> dict[str, SearchIndex]:
+        return {
+            str(locale): SearchIndex.build(root, str(locale), self._term_cache)
+            for locale in possible_locales()
+        }
+
+    def _update_pages(self, pages: Mapping[str, Page],
+                      changed_paths: Iterable[str]) -> dict[str, Page]:
+        """Return a copy of ``pages`` with the changed files re-read
+
+        :param changed_paths: The paths of changed files, relative to
+            ``FLATPAGES_ROOT``.  Files which do not exist anymore are
+            dropped.
+        """
+        root_dir = self.flat_pages.root
+        extensions = self._page_extensions()
+        pages = dict(pages)
+        for file_path in changed_paths:
+            if not (extension := next((e for e in extensions if file_path.endswith(e)), None)):
+                continue
+            path = file_path.removesuffix(extension)
+            # as `FlatPages` names the pages it finds
+            if self.flat_pages.config("case_insensitive"):
+                path = path.lower()
+            full_name = os.path.join(root_dir, *file_path.split("/"))
+            if not os.path.isfile(full_name):
+                logger.debug("Dropping page %s", path)
+                pages.pop(path, None)
+                continue
+            logger.debug("Re-reading page %s", path)
+            folder = os.path.dirname(file_path).replace("/", os.sep)
+            # what `FlatPages` calls for every file it finds, so the page
+            # is parsed exactly the same way
+            pages[path] = self.flat_pages._load_file(path, full_name, folder)
+        return pages
+
+    def _page_extensions(self) -> tuple[str, ...]:
+        extension = self.flat_pages.config("extension")
+        if isinstance(extension, str):
+            return tuple(extension.split(","))
+        return tuple(extension)
+
+    def _publish_commit(self) -> None:
+        if self.commit is None:
+            return
+        shared_cache = self._require_initialized(self.app).extensions['cache']
+        self._seen_commit = self.commit
+        shared_cache.set(self.COMMIT_CACHE_KEY, self.commit, ttl=_PUBLISHED_COMMIT_TTL)
+
+    def _check_published_commit(self) -> None:
+        """Reload in the background if another worker published a new commit
+
+        Every published commit is only reacted to once, so that a commit
+        this worker cannot see (yet) does not lead to repeated reloads.
+        If a reload is already running, it may have read an older commit,
+        so the commit is reacted to again on a later request.
+        """
+        published = cache.get(self.COMMIT_CACHE_KEY, None)
+        if published is None or published in (self.commit, self._seen_commit):
+            return
+        if self.reload_in_background():
+            logger.info("Content commit %s was published, reloading", published)
+            self._seen_commit = published
+
+
+def _news_articles(root: Category) -> list[Article]:
+    if (category := root.categories.get('news')) is None:
+        return []
+    return [article for article in category._articles.values() if article.id != 'index']
+
+
+# A worker may not get any request for a long time, and must still
+# notice the published commit then
+_PUBLISHED_COMMIT_TTL = 30 * 24 * 60 * 60
+
+
+@click.command("build-content-bundle")
+@with_appcontext
+def build_content_bundle_command():
+    """Parse the content pages and write the bundle of the current commit."""
+    cf_pages: CategorizedFlatPages = current_app.cf_pages  # type: ignore
+    if not (current_app.config['CONTENT_BUNDLE_DIR'] and cf_pages.commit):
+        raise click.ClickException(
+            "CONTENT_BUNDLE_DIR must be set, and FLATPAGES_ROOT must be a git repository"
+        )
+    cf_pages.flat_pages.reload()
+    cf_pages.write_bundle()
@@ -25,14 +25,18 @@ from sipa.base import IntegerConverter, login_manager
 from sipa.blueprints.usersuite import get_attribute_endpoint
 from sipa.defaults import DEFAULT_CONFIG
 from sipa.flatpages import CategorizedFlatPages
+from sipa.mail import init_mail_spool
 from sipa.model import AVAILABLE_DATASOURCES
 from sipa.model.misc import should_display_traffic_data
 from sipa.session import SeparateLocaleCookieSessionInterface
 from sipa.utils import url_self
+from sipa.utils.cache import init_cache
 from sipa.utils.babel_utils import get_weekday
 from sipa.utils.csp import ensure_items, NonceInfo
 from sipa.utils.git_utils import init_repo, update_repo
 from sipa.utils.graph_utils import generate_traffic_chart, provide_render_function
+from sipa.utils.refresher import init_refresher
+from sipa.utils.response_cache import init_response_cache
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())  # for before logging is configured
@@ -64,6 +68,10 @@ def init_app(app: Flask, config: dict[str, t.Any] | None = None) -> Flask:
     app.before_request(setup_request_locale_context)
     app.after_request(ensure_csp)
     app.session_interface = SeparateLocaleCookieSessionInterface()
+    init_cache(app)
+    init_response_cache(app)
+    init_mail_spool(app)
+    init_refresher(app)
     cf_pages = CategorizedFlatPages()
     cf_pages.init_app(app)
     backends = Backends(available_datasources=AVAILABLE_DATASOURCES)
@@ -200,12 +208,10 @@ def try_register_uwsgi_timer(app):
             logger.debug("Updating git repository at %s", flatpages_root)
             hasToReload = update_repo(flatpages_root)
             if hasToReload:
-                logger.debug("Reloading flatpages and uwsgi", extra={'data': {
+                logger.debug("Reloading flatpages", extra={'data': {
                     'uwsgi.numproc': uwsgi.numproc,
-                    'uwsgi.opt': uwsgi.opt,
-                    'uwsgi.applications': uwsgi.applications,
                 }})
-                uwsgi.reload()
+                app.cf_pages.reload_all_workers()
 
         logger.debug("Registered repo update to uwsgi signal")
 
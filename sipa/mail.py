@@ -9,20 +9,31 @@ On the layer below, some intermediate functions are introduced which
 are needed to compose and send the mails.  The core is
 :py:func:`send_complex_mail`, which calls :py:func:`send_mail`
 prepending optional information to the title and body
+
+At the bottom, an :py:class:`SMTPTransport` holds the connections to
+the mail server: the SSL context is created once, and with
+``MAILSERVER_POOL_SIZE`` greater than 0, connections are kept open
+after sending and reused by the next mail, saving the TLS handshake
+and login.
 """
+from __future__ import annotations
 
 import logging
 import smtplib
+import sqlite3
 import ssl
 import textwrap
+import threading
+import time
+import typing as t
 from email.mime.text import MIMEText
 from email.utils import formatdate, make_msgid
-from typing import Any
 
-from flask import current_app
+from flask import Flask, current_app
 
 from sipa.backends.extension import backends
 from sipa.model.user import BaseUser
+from sipa.utils.mail_spool import MailSender, MailSpool
 
 logger = logging.getLogger(__name__)
 
@@ -76,50 +87,27 @@ def send_mail(author: str, recipient: str, subject: str, message: str,
     mail['Subject'] = subject
     mail['Date'] = formatdate(localtime=True)
 
+    if current_app.config.get('MAIL_SPOOL_PATH') and _enqueue(sender, recipient, mail):
+        logger.info('Queued mail from usersuite', extra={
+            'tags': {'from': author, 'to': recipient},
+            'data': {'subject': subject, 'message': message}
+        })
+        return True
+
     mailserver_host = current_app.config['MAILSERVER_HOST']
     mailserver_port = current_app.config['MAILSERVER_PORT']
-    mailserver_user = current_app.config['MAILSERVER_USER']
-    mailserver_password = current_app.config['MAILSERVER_PASSWORD']
-
-    mailserver_ssl = current_app.config['MAILSERVER_SSL']
-    use_ssl = mailserver_ssl == 'ssl'
-    use_starttls = mailserver_ssl == 'starttls'
-
-    if use_ssl or use_starttls:
-        try:
-            ssl_context = ssl.create_default_context(
-                cafile=current_app.config['MAILSERVER_SSL_CA_FILE'],
-                cadata=current_app.config['MAILSERVER_SSL_CA_DATA'])
-
-            if current_app.config['MAILSERVER_SSL_VERIFY']:
-                ssl_context.verify_mode = ssl.VerifyMode.CERT_REQUIRED
-                ssl_context.check_hostname = True
-            else:
-                ssl_context.check_hostname = False
-                ssl_context.verify_mode = ssl.VerifyMode.CERT_NONE
-        except ssl.SSLError as e:
-            # smtp.connect failed to connect
-            logger.critical('Unable to create ssl context', extra={
-                'trace': True,
-                'data': {'exception_arguments': e.args}
-            })
-            return False
 
     try:
-        if use_ssl:
-            smtp = smtplib.SMTP_SSL(host=mailserver_host, port=mailserver_port,
-                                    context=ssl_context)
-        else:
-            smtp = smtplib.SMTP(host=mailserver_host, port=mailserver_port)
-
-        if use_starttls:
-            smtp.starttls(context=ssl_context)
-
-        if mailserver_user:
-            smtp.login(mailserver_user, mailserver_password)
+        transport = get_transport(current_app.config)
+    except ssl.SSLError as e:
+        logger.critical('Unable to create ssl context', extra={
+            'trace': True,
+            'data': {'exception_arguments': e.args}
+        })
+        return False
 
-        smtp.sendmail(from_addr=sender, to_addrs=recipient, msg=mail.as_string())
-        smtp.close()
+    try:
+        transport.send(from_addr=sender, to_addrs=recipient, msg=mail.as_string())
     except OSError as e:
         # smtp.connect failed to connect
         logger.critical('Unable to connect to SMTP server', extra={
@@ -137,6 +125,47 @@ def send_mail(author: str, recipient: str, subject: str, message: str,
         return True
 
 
+def _enqueue(sender: str, recipient: str, mail: MIMEText) -> bool:
+    """Put a mail into the spool of the current app
+
+    :returns: Whether that succeeded; if not, the mail should be sent
+        directly
+    """
+    mail_sender: MailSender = current_app.extensions['mail_sender']
+    try:
+        mail_sender.spool.enqueue(sender, recipient, mail.as_string())
+    except sqlite3.Error:
+        logger.exception("Unable to spool mail, sending it directly")
+        return False
+    mail_sender.ensure_running()
+    mail_sender.wake_up()
+    return True
+
+
+def init_mail_spool(app: Flask) -> None:
+    """Deliver mails in the background if ``MAIL_SPOOL_PATH`` is set
+
+    :py:func:`send_mail` then only stores mails in a
+    :py:class:`~sipa.utils.mail_spool.MailSpool` at that path.
+    """
+    if not (path := app.config.get('MAIL_SPOOL_PATH')):
+        return
+    config = app.config
+    spool = MailSpool(
+        path,
+        max_attempts=config['MAIL_SPOOL_MAX_ATTEMPTS'],
+        retry_delay=config['MAIL_SPOOL_RETRY_DELAY'],
+    )
+
+    def send(from_addr: str, to_addrs: str, msg: str) -> None:
+        get_transport(config).send(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+
+    mail_sender = MailSender(spool, send)
+    app.extensions['mail_sender'] = mail_sender
+    # deliver what is left from before a restart
+    app.before_request(mail_sender.ensure_running)
+
+
 def send_contact_mail(author: str, subject: str, message: str,
                       name: str, dormitory_name: str) -> bool:
     """Compose a mail for anonymous contacting.
@@ -230,7 +259,7 @@ def send_usersuite_contact_mail(
 
 
 def send_complex_mail(subject: str, message: str, tag: str = "",
-                      category: str = "", header: dict[str, Any] | None = None,
+                      category: str = "", header: dict[str, t.Any] | None = None,
                       **kwargs) -> bool:
     """Send a mail with context information in subject and body.
 
@@ -276,7 +305,7 @@ def compose_subject(raw_subject: str, tag: str = "", category: str = "") -> str:
     return subject
 
 
-def compose_body(message: str, header: dict[str, Any] | None = None):
+def compose_body(message: str, header: dict[str, t.Any] | None = None):
     """Prepend additional information to a message.
 
     :param message:
@@ -291,3 +320,172 @@ def compose_body(message: str, header: dict[str, Any] | None = None):
     serialized_header = "\n".join(f"{k}: {v}" for k, v in header.items())
 
     return f"{serialized_header}\n\n{message}"
+
+
+class SMTPConfig(t.NamedTuple):
+    host: str
+    port: int
+    #: ``None``, ``"ssl"`` or ``"starttls"``
+    ssl: str | None = None
+    ssl_verify: bool = False
+    ssl_ca_file: str | None = None
+    ssl_ca_data: str | None = None
+    user: str | None = None
+    password: str | None = None
+
+    @classmethod
+    def from_config(cls, config: t.Mapping[str, t.Any]) -> SMTPConfig:
+        return cls(
+            host=config['MAILSERVER_HOST'],
+            port=config['MAILSERVER_PORT'],
+            ssl=config['MAILSERVER_SSL'],
+            ssl_verify=config['MAILSERVER_SSL_VERIFY'],
+            ssl_ca_file=config['MAILSERVER_SSL_CA_FILE'],
+            ssl_ca_data=config['MAILSERVER_SSL_CA_DATA'],
+            user=config['MAILSERVER_USER'],
+            password=config['MAILSERVER_PASSWORD'],
+        )
+
+
+def create_ssl_context(config: SMTPConfig) -> ssl.SSLContext:
+    """:raises ssl.SSLError: if the CA data is invalid"""
+    context = ssl.create_default_context(cafile=config.ssl_ca_file, cadata=config.ssl_ca_data)
+    if config.ssl_verify:
+        context.verify_mode = ssl.VerifyMode.CERT_REQUIRED
+        context.check_hostname = True
+    else:
+        context.check_hostname = False
+        context.verify_mode = ssl.VerifyMode.CERT_NONE
+    return context
+
+
+class _Idle(t.NamedTuple):
+    smtp: smtplib.SMTP
+    since: float
+
+
+class SMTPTransport:
+    """Send mails over (possibly pooled) connections to one server
+
+    Up to ``pool_size`` connections are kept after sending.  A kept
+    connection is closed once it was idle for ``idle_timeout`` seconds,
+    and checked with a ``NOOP`` before it is reused.  If sending over a
+    reused connection fails because the server closed it, the message
+    is sent once more over a new connection.
+
+    :raises ssl.SSLError: if the SSL context cannot be created
+    """
+
+    def __init__(self, config: SMTPConfig, pool_size: int = 0, idle_timeout: float = 60):
+        self.config = config
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._ssl_context = create_ssl_context(config) if config.ssl else None
+        self._idle: list[_Idle] = []
+        self._lock = threading.Lock()
+
+    def send(self, from_addr: str, to_addrs: str | list[str], msg: str) -> None:
+        """Send a message
+
+        :raises OSError: if the message could not be sent, this
+            includes :py:class:`smtplib.SMTPException`
+        """
+        smtp, reused = self._acquire()
+        try:
+            smtp.sendmail(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+        except smtplib.SMTPServerDisconnected:
+            self._discard(smtp)
+            if not reused:
+                raise
+            logger.info("Pooled SMTP connection was closed by the server, reconnecting")
+            smtp = self._connect()
+            try:
+                smtp.sendmail(from_addr=from_addr, to_addrs=to_addrs, msg=msg)
+            except BaseException:
+                self._discard(smtp)
+                raise
+        except BaseException:
+            self._discard(smtp)
+            raise
+        self._release(smtp)
+
+    def close(self) -> None:
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for entry in idle:
+            self._discard(entry.smtp)
+
+    def _acquire(self) -> tuple[smtplib.SMTP, bool]:
+        """A healthy idle connection, or a new one
+
+        :returns: the connection and whether it was reused
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                smtp, since = self._idle.pop()
+            if time.monotonic() - since > self.idle_timeout:
+                self._discard(smtp)
+                continue
+            try:
+                if smtp.noop()[0] == 250:
+                    return smtp, True
+            except OSError:
+                pass
+            self._discard(smtp)
+        return self._connect(), False
+
+    def _connect(self) -> smtplib.SMTP:
+        config = self.config
+        if config.ssl == 'ssl':
+            smtp: smtplib.SMTP = smtplib.SMTP_SSL(host=config.host, port=config.port,
+                                                  context=self._ssl_context)
+        else:
+            smtp = smtplib.SMTP(host=config.host, port=config.port)
+        try:
+            if config.ssl == 'starttls':
+                smtp.starttls(context=self._ssl_context)
+            if config.user:
+                smtp.login(config.user, config.password)
+        except BaseException:
+            self._discard(smtp)
+            raise
+        return smtp
+
+    def _release(self, smtp: smtplib.SMTP) -> None:
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(_Idle(smtp, time.monotonic()))
+                return
+        self._discard(smtp)
+
+    @staticmethod
+    def _discard(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.close()
+        except OSError:
+            pass
+
+
+_transports: dict[tuple[SMTPConfig, int, float], SMTPTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(config: t.Mapping[str, t.Any]) -> SMTPTransport:
+    """The transport for the mail server of an app config
+
+    Transports are shared between all users of the same settings.
+    """
+    key = (
+        SMTPConfig.from_config(config),
+        config.get('MAILSERVER_POOL_SIZE', 0),
+        config.get('MAILSERVER_POOL_IDLE_TIMEOUT', 60),
+    )
+    with _transports_lock:
+        if (transport := _transports.get(key)) is None:
+            transport = _transports[key] = SMTPTransport(
+                key[0], pool_size=key[1], idle_timeout=key[2],
+            )
+    return transport
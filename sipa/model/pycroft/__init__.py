@@ -3,7 +3,8 @@ from ipaddress import IPv4Network
 from sipa.backends import DataSource, Dormitory
 from sipa.backends.exceptions import InvalidConfiguration
 from sipa.backends.datasource import SubnetCollection
-from . import user, api, userdb
+from sipa.utils.circuit_breaker import CircuitBreaker
+from . import user, api, userdb, cache
 
 
 def init_pycroft_api(app):
@@ -11,17 +12,41 @@ def init_pycroft_api(app):
         app.extensions['pycroft_api'] = api.PycroftApi(
             endpoint=app.config['PYCROFT_ENDPOINT'],
             api_key=app.config['PYCROFT_API_KEY'],
+            timeout=_timeout_spec(app.config['PYCROFT_TIMEOUT']),
+            pool_size=app.config['PYCROFT_POOL_SIZE'],
+            circuit_breaker=CircuitBreaker(
+                name="pycroft",
+                failure_rate=app.config['PYCROFT_BREAKER_FAILURE_RATE'],
+                window=app.config['PYCROFT_BREAKER_WINDOW'],
+                min_calls=app.config['PYCROFT_BREAKER_MIN_CALLS'],
+                reset_timeout=app.config['PYCROFT_BREAKER_RESET_TIMEOUT'],
+            ),
         )
     except KeyError as exception:
         raise InvalidConfiguration(*exception.args) from exception
 
 
+def _timeout_spec(timeout) -> api.TimeoutSpec:
+    # a `(connect, read)` pair set via the environment arrives as a list
+    return tuple(timeout) if isinstance(timeout, list) else timeout
+
+
+def init_user_cache(app):
+    app.extensions['pycroft_user_cache'] = cache.UserCache(
+        backend=app.extensions['cache'],
+        ttl=app.config['PYCROFT_USER_CACHE_TTL'],
+        stale_ttl=app.config['PYCROFT_STALE_USER_TTL'],
+        stale_ip_ttl=app.config['PYCROFT_STALE_IP_TTL'],
+    )
+
+
 def init_userdb(app):
     userdb.register_userdb_extension(app)
 
 
 def init_app(app):
     init_pycroft_api(app)
+    init_user_cache(app)
     init_userdb(app)
 
 
@@ -1,6 +1,7 @@
 import logging
+import threading
 import typing as t
-from collections.abc import Callable
+from collections.abc import Callable, Collection
 from dataclasses import dataclass
 from datetime import date
 from functools import partial
@@ -8,10 +9,13 @@ from typing import Any
 
 import requests
 import requests.auth
-from requests import ConnectionError, HTTPError
+from requests import ConnectionError, HTTPError, JSONDecodeError, RequestException, Timeout
+from requests.adapters import HTTPAdapter
 
 from sipa.backends.exceptions import InvalidConfiguration
 from sipa.utils import dataclass_from_dict
+from sipa.utils.circuit_breaker import CircuitBreaker
+from sipa.utils.single_flight import SingleFlight
 from .exc import PycroftBackendError
 
 logger = logging.getLogger(__name__)
@@ -53,21 +57,75 @@ class PycroftAuthorization(requests.auth.AuthBase):
         return r
 
 
+def _fields_param(fields: Collection[str] | None) -> dict[str, str]:
+    return {'fields': ",".join(fields)} if fields is not None else {}
+
+
+#: ``(connect, read)`` timeout in seconds, see :py:func:`requests.request`
+type TimeoutSpec = float | tuple[float, float]
+
+
 class PycroftApi:
-    def __init__(self, endpoint: str, api_key: str):
+    """A client for the pycroft API
+
+    Every thread uses its own :py:class:`requests.Session`, but all of
+    them share one connection pool of size ``pool_size``, so that
+    connections are kept alive across requests.  Concurrent identical
+    ``GET`` requests are coalesced into one, see :py:class:`SingleFlight`.
+
+    :param timeout: The timeout of every API call.  The calls of one
+        request together should stay below uwsgi's ``harakiri``
+        timeout, so that a hanging pycroft results in a
+        :py:class:`PycroftBackendError` instead of a killed worker.
+    :param circuit_breaker: If given, calls fail immediately with a
+        :py:class:`PycroftBackendError` while it is open.  Timeouts,
+        connection errors and server errors count as failures.
+    """
+
+    def __init__(self, endpoint: str, api_key: str,
+                 timeout: TimeoutSpec = (1, 2.5), pool_size: int = 10,
+                 circuit_breaker: CircuitBreaker | None = None):
         if not endpoint.endswith("/"):
             raise InvalidConfiguration("API endpoint must end with a '/'")
         self._endpoint = endpoint
-        self.session = requests.Session()
-        self.session.auth = PycroftAuthorization(api_key)
-
-    def get_user(self, username: str) -> tuple[int, dict]:
-        return self.get(f'user/{username}')
+        self._auth = PycroftAuthorization(api_key)
+        self._timeout = timeout
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._local = threading.local()
+        self.circuit_breaker = circuit_breaker
+        self._single_flight = SingleFlight()
+
+    @property
+    def session(self) -> requests.Session:
+        """The session of the current thread"""
+        try:
+            return self._local.session
+        except AttributeError:
+            session = requests.Session()
+            session.auth = self._auth
+            session.mount(self._endpoint, self._adapter)
+            self._local.session = session
+            return session
+
+    def get_user(
+        self, username: str, fields: Collection[str] | None = None
+    ) -> tuple[int, dict]:
+        """Look up a user
+
+        :param fields: If given, only these fields of the user are
+            requested.  The API may return more than that.
+        """
+        return self.get(f'user/{username}', params=_fields_param(fields))
 
-    def get_user_from_ip(self, ip):
-        return self.get("user/from-ip", params={"ip": ip})
+    def get_user_from_ip(self, ip, fields: Collection[str] | None = None):
+        return self.get("user/from-ip", params={"ip": ip, **_fields_param(fields)})
 
     def authenticate(self, username, password):
+        """Check the credentials of a user
+
+        The response contains at least the ``id`` of the user, and
+        possibly the whole user as returned by :py:meth:`get_user`.
+        """
         return self.post('user/authenticate',
                          data={'login': username, 'password': password})
 
@@ -205,7 +263,8 @@ class PycroftApi:
             return
 
     def resend_confirm_email(self, user_id: int) -> bool:
-        status, _ = self.get("register/confirm", params={'user_id': user_id})
+        # sends a mail, so every call has to reach pycroft
+        status, _ = self.get("register/confirm", params={'user_id': user_id}, coalesce=False)
         return status == 200
 
     def confirm_email(self, token: str):
@@ -231,37 +290,87 @@ class PycroftApi:
 
         return result
 
-    def get(self, url: t.LiteralString, params=None):
-        request_function = partial(self.session.get, params=params or {})
+    def get(self, url: t.LiteralString, params=None, coalesce: bool = True):
+        """Send a ``GET`` request
+
+        :param coalesce: Whether to share the response with concurrent
+            identical requests.  Disable this for requests with side
+            effects.
+        """
+        params = params or {}
+        if not coalesce:
+            return self._get(url, params)
+        # not every parameter value is hashable, but all of them have a stable repr
+        key = (url, repr(sorted(params.items())))
+        return self._single_flight.do(key, partial(self._get, url, params))
+
+    def _get(self, url: t.LiteralString, params: dict):
+        request_function = partial(self.session.get, params=params,
+                                   timeout=self._timeout)
         return self._do_api_call(request_function, url)
 
     def post(self, url: t.LiteralString, data=None):
-        request_function = partial(self.session.post, data=data or {})
+        request_function = partial(self.session.post, data=data or {},
+                                   timeout=self._timeout)
         return self._do_api_call(request_function, url)
 
     def delete(self, url: t.LiteralString, data=None):
-        request_function = partial(self.session.delete, data=data or {})
+        request_function = partial(self.session.delete, data=data or {},
+                                   timeout=self._timeout)
         return self._do_api_call(request_function, url)
 
     def patch(self, url: t.LiteralString, data=None):
-        request_function = partial(self.session.patch, data=data or {})
+        request_function = partial(self.session.patch, data=data or {},
+                                   timeout=self._timeout)
         return self._do_api_call(request_function, url)
 
     def _do_api_call(
         self, request_function: Callable, url: t.LiteralString
     ) -> tuple[int, Any]:
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow():
+            raise PycroftBackendError("Pycroft API unavailable (circuit open)")
+
         try:
             response = request_function(self._endpoint + url)
+        except Timeout as e:
+            logger.error("Pycroft API call timed out",
+                         extra={'data': {'endpoint': self._endpoint + url}})
+            self._record_failure()
+            raise PycroftBackendError("Pycroft API timed out") from e
         except ConnectionError as e:
             logger.error("Caught a ConnectionError when accessing Pycroft API",
                          extra={'data': {'endpoint': self._endpoint + url}})
+            self._record_failure()
             raise PycroftBackendError("Pycroft API unreachable") from e
+        except RequestException as e:
+            logger.error("Pycroft API call failed",
+                         extra={'data': {'endpoint': self._endpoint + url}})
+            # also ends a half-open probe, which would block the circuit otherwise
+            self._record_failure()
+            raise PycroftBackendError("Pycroft API call failed") from e
 
         if response.status_code not in [200, *range(400, 500)]:
             try:
                 response.raise_for_status()
             except HTTPError as e:
+                self._record_failure()
                 raise PycroftBackendError(f"Pycroft API returned status"
                                           f" {response.status_code}") from e
 
-        return response.status_code, response.json()
+        try:
+            result = response.json()
+        except JSONDecodeError as e:
+            logger.error("Pycroft API returned invalid JSON",
+                         extra={'data': {'endpoint': self._endpoint + url,
+                                         'status': response.status_code}})
+            self._record_failure()
+            raise PycroftBackendError("Pycroft API returned invalid JSON") from e
+
+        if breaker is not None:
+            breaker.record_success()
+        return response.status_code, result
+
+    def _record_failure(self) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure()
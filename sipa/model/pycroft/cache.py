@@ -0,0 +1,91 @@
+from sipa.utils.cache import CacheBackend, MISSING
+from .schema import UserData
+
+
+class UserCache:
+    """A TTL cache of :class:`UserData` keyed by user id.
+
+    The entries are stored in the given :py:class:`CacheBackend`, so
+    depending on the backend they are shared between workers.
+    A ``ttl`` of ``0`` disables the cache.
+
+    Independently, the last known data of every user is kept for
+    ``stale_ttl`` seconds, to be shown when pycroft is unavailable.
+    It is not dropped by :py:meth:`invalidate`.  Which user an ip
+    belonged to is only kept for ``stale_ip_ttl`` seconds, because the
+    ip may be handed to someone else in the meantime.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, stale_ttl: float = 0,
+                 stale_ip_ttl: float = 0):
+        self._backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_ip_ttl = min(stale_ip_ttl, stale_ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def _key(user_id: int | str) -> str:
+        return f"pycroft-user:{user_id}"
+
+    @staticmethod
+    def _stale_key(user_id: int | str) -> str:
+        return f"pycroft-user-stale:{user_id}"
+
+    @staticmethod
+    def _stale_ip_key(ip: str) -> str:
+        return f"pycroft-user-stale-ip:{ip}"
+
+    def get(self, user_id: int | str) -> UserData | None:
+        """Return a copy of the cached user data, if present."""
+        if not self.enabled:
+            return None
+        if (user_data := self._backend.get(self._key(user_id))) is MISSING:
+            return None
+        # a copy, so that in-place modifications of one `User` don't leak
+        return user_data.model_copy()
+
+    def set(self, user_data: UserData) -> None:
+        # a copy, so that later modifications of the `User` don't leak,
+        # as an in-process backend would store a reference
+        user_data = user_data.model_copy(deep=True)
+        if self.stale_ttl > 0:
+            self._backend.set(self._stale_key(user_data.id), user_data, self.stale_ttl)
+        if not self.enabled:
+            return
+        self._backend.set(self._key(user_data.id), user_data, self.ttl)
+
+    def set_from_ip(self, ip: str, user_data: UserData) -> None:
+        """Like :py:meth:`set`, and remember that ``ip`` belongs to the user."""
+        self.set(user_data)
+        if self.stale_ip_ttl > 0:
+            self._backend.set(self._stale_ip_key(ip), user_data.id, self.stale_ip_ttl)
+
+    def forget_ip(self, ip: str) -> None:
+        """Forget which user ``ip`` belonged to"""
+        if self.stale_ip_ttl > 0:
+            self._backend.delete(self._stale_ip_key(ip))
+
+    def get_stale(self, user_id: int | str) -> UserData | None:
+        """Return a copy of the last known user data, if present."""
+        if self.stale_ttl <= 0:
+            return None
+        if (user_data := self._backend.get(self._stale_key(user_id))) is MISSING:
+            return None
+        return user_data.model_copy()
+
+    def get_stale_from_ip(self, ip: str) -> UserData | None:
+        """Return the last known data of the user ``ip`` belonged to."""
+        if self.stale_ip_ttl <= 0:
+            return None
+        if (user_id := self._backend.get(self._stale_ip_key(ip))) is MISSING:
+            return None
+        return self.get_stale(user_id)
+
+    def invalidate(self, user_id: int | str) -> None:
+        if not self.enabled:
+            return
+        self._backend.delete(self._key(user_id))
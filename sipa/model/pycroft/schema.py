@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import typing as t
+from dataclasses import dataclass
 from datetime import date
 from decimal import Decimal
 
@@ -9,6 +11,11 @@ from sipa.model.mspk_client import MPSKClientEntry
 
 
 class UserData(BaseModel):
+    """A user as returned by ``user/<id>``
+
+    The history sections (:py:data:`HISTORY_FIELDS`) are ``None`` if they
+    have not been requested, see :py:meth:`PycroftApi.get_user`.
+    """
     id: int
     user_id: str
     login: str
@@ -19,10 +26,10 @@ class UserData(BaseModel):
     mail_forwarded: bool
     mail_confirmed: bool
     properties: list[str]
-    traffic_history: list[TrafficHistoryEntry]
+    traffic_history: list[TrafficHistoryEntry] | None = None
     interfaces: list[Interface]
     finance_balance: Decimal
-    finance_history: list[FinanceHistoryEntry]
+    finance_history: list[FinanceHistoryEntry] | None = None
     last_finance_update: date
 
     # TODO introduce properties once they can be excluded
@@ -34,6 +41,19 @@ class UserData(BaseModel):
     mpsk_clients: list[MPSKClientEntry]
 
 
+class UserHistories(BaseModel):
+    traffic_history: list[TrafficHistoryEntry]
+    finance_history: list[FinanceHistoryEntry]
+
+
+#: The expensive parts of :py:class:`UserData`, which are loaded on demand
+HISTORY_FIELDS: tuple[str, ...] = tuple(UserHistories.model_fields)
+#: The parts of :py:class:`UserData` loaded with every lookup
+BASE_FIELDS: tuple[str, ...] = tuple(
+    f for f in UserData.model_fields if f not in HISTORY_FIELDS
+)
+
+
 class UserStatus(BaseModel):
     member: bool
     traffic_exceeded: bool
@@ -48,15 +68,80 @@ class Interface(BaseModel):
     ips: list[str]
 
 
-class TrafficHistoryEntry(BaseModel):
+# The history entries are plain dataclasses, because there can be
+# thousands of them, and pydantic models are much slower to create.
+
+@dataclass(slots=True)
+class TrafficHistoryEntry:
     timestamp: str
     ingress: int | None
     egress: int | None
 
 
-class FinanceHistoryEntry(BaseModel):
+@dataclass(slots=True)
+class FinanceHistoryEntry:
     valid_on: str
     amount: Decimal
     description: str
 
 
+def decode_user_data(payload: dict[str, t.Any], trusted: bool = False) -> UserData:
+    """Parse a ``user/<id>`` response
+
+    With ``trusted``, the histories are converted without validation,
+    assuming they have the right shape.  This is considerably faster
+    for long histories.
+
+    :raises ValueError: if the payload is malformed
+    """
+    if not trusted:
+        return UserData.model_validate(payload)
+
+    user_data = UserData.model_validate(
+        {k: v for k, v in payload.items() if k not in HISTORY_FIELDS}
+    )
+    if (traffic := payload.get("traffic_history")) is not None:
+        user_data.traffic_history = _decode_traffic_history(traffic)
+    if (finance := payload.get("finance_history")) is not None:
+        user_data.finance_history = _decode_finance_history(finance)
+    return user_data
+
+
+def decode_histories(payload: dict[str, t.Any], trusted: bool = False) -> UserHistories:
+    """Parse the :py:data:`HISTORY_FIELDS` of a ``user/<id>`` response
+
+    See :py:func:`decode_user_data`.
+    """
+    if not trusted:
+        return UserHistories.model_validate(payload)
+
+    try:
+        return UserHistories.model_construct(
+            traffic_history=_decode_traffic_history(payload["traffic_history"]),
+            finance_history=_decode_finance_history(payload["finance_history"]),
+        )
+    except KeyError as e:
+        raise ValueError(f"Missing field {e}") from e
+
+
+def _decode_traffic_history(entries: list[dict[str, t.Any]]) -> list[TrafficHistoryEntry]:
+    try:
+        return [TrafficHistoryEntry(e["timestamp"], e["ingress"], e["egress"])
+                for e in entries]
+    except (KeyError, TypeError) as e:
+        raise ValueError("Malformed traffic history") from e
+
+
+def _decode_finance_history(entries: list[dict[str, t.Any]]) -> list[FinanceHistoryEntry]:
+    try:
+        return [FinanceHistoryEntry(e["valid_on"], _decimal(e["amount"]), e["description"])
+                for e in entries]
+    except (KeyError, TypeError, ArithmeticError) as e:
+        raise ValueError("Malformed finance history") from e
+
+
+def _decimal(value: str | int | float) -> Decimal:
+    # like pydantic, convert floats via their shortest representation
+    return Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+
+
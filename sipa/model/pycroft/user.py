@@ -2,9 +2,9 @@ from __future__ import annotations
 
 import logging
 import typing as t
+from collections.abc import Callable
 from datetime import date
-
-from pydantic import ValidationError
+from functools import wraps
 
 from sipa.model.user import BaseUser
 from sipa.model.finance import BaseFinanceInformation
@@ -21,8 +21,16 @@ from sipa.model.exceptions import UserNotFound, PasswordInvalid, \
     ContinuationNotPossible, SubnetFull, UserNotContactableError, TokenNotFound, LoginNotAllowed, \
     MaximumNumberMPSKClients, NoWiFiPasswordGenerated
 from .api import PycroftApi
+from .cache import UserCache
 from .exc import PycroftBackendError
-from .schema import UserData, UserStatus
+from .schema import (
+    UserData,
+    UserStatus,
+    BASE_FIELDS,
+    HISTORY_FIELDS,
+    decode_user_data,
+    decode_histories,
+)
 from .userdb import UserDB
 
 from flask_login import AnonymousUserMixin
@@ -40,35 +48,93 @@ api: PycroftApi = t.cast(
     LocalProxy(lambda: current_app.extensions['pycroft_api'])
 )
 
+user_cache: UserCache = t.cast(
+    UserCache,
+    LocalProxy(lambda: current_app.extensions['pycroft_user_cache'])
+)
+
+
+def invalidates_cache[**P, R](
+    method: Callable[t.Concatenate[User, P], R]
+) -> Callable[t.Concatenate[User, P], R]:
+    """Drop the user's :py:data:`user_cache` entry after calling ``method``
+
+    This is meant for methods changing the user on pycroft's side.
+    The entry is dropped even if the call fails, because we cannot
+    know whether the change went through.
+    """
+    @wraps(method)
+    def wrapper(self: User, *args: P.args, **kwargs: P.kwargs) -> R:
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            user_cache.invalidate(self.user_data.id)
+
+    return wrapper
+
+
+def _trusted_decoding() -> bool:
+    return current_app.config.get('PYCROFT_TRUSTED_DECODING', False)
+
 
 class User(BaseUser):
+    """A pycroft user
+
+    Lookups only request the :py:data:`BASE_FIELDS` of a user.  The
+    histories are requested once :py:attr:`traffic_history` or
+    :py:attr:`finance_information` is accessed.
+    """
     user_data: UserData
 
-    def __init__(self, user_data: dict):
+    def __init__(self, user_data: dict | UserData, stale: bool = False):
         try:
-            self.user_data: UserData = UserData.model_validate(user_data)
-            self._userdb: UserDB = UserDB(self)
-        except ValidationError as e:
+            self.user_data: UserData = (
+                user_data if isinstance(user_data, UserData)
+                else decode_user_data(user_data, trusted=_trusted_decoding())
+            )
+        except ValueError as e:
             raise PycroftBackendError("Error when parsing user lookup response") from e
+        self._userdb: UserDB = UserDB(self)
         super().__init__(uid=str(self.user_data.id))
+        self.stale = stale
 
     @classmethod
     def get(cls, username):
-        status, user_data = api.get_user(username)
+        if (user_data := user_cache.get(username)) is not None:
+            return cls(user_data)
+
+        try:
+            status, user_data = api.get_user(username, fields=BASE_FIELDS)
+        except PycroftBackendError:
+            if (stale_data := user_cache.get_stale(username)) is None:
+                raise
+            logger.warning("Pycroft unavailable, using stale data of user %s", username)
+            return cls(stale_data, stale=True)
 
         if status != 200:
             raise UserNotFound
 
-        return cls(user_data)
+        user = cls(user_data)
+        user_cache.set(user.user_data)
+        return user
 
     @classmethod
     def from_ip(cls, ip):
-        status, user_data = api.get_user_from_ip(ip)
+        try:
+            status, user_data = api.get_user_from_ip(ip, fields=BASE_FIELDS)
+        except PycroftBackendError:
+            if (stale_data := user_cache.get_stale_from_ip(ip)) is None:
+                raise
+            logger.warning("Pycroft unavailable, using stale data of the user behind %s", ip)
+            return cls(stale_data, stale=True)
 
         if status != 200:
+            user_cache.forget_ip(ip)
             return AnonymousUserMixin()
 
-        return cls(user_data)
+        user = cls(user_data)
+        user_cache.set_from_ip(ip, user.user_data)
+        return user
 
     def re_authenticate(self, password):
         self.authenticate(self.user_data.login, password)
@@ -80,7 +146,14 @@ class User(BaseUser):
         if status != 200:
             raise PasswordInvalid
 
-        user = cls.get(result['id'])
+        if result.keys() >= set(BASE_FIELDS):
+            # the user came along, which saves us the lookup
+            user = cls(result)
+            user_cache.set(user.user_data)
+        else:
+            # don't let a stale entry survive a fresh login
+            user_cache.invalidate(result['id'])
+            user = cls.get(result['id'])
 
         if not user.has_property('sipa_login'):
             raise LoginNotAllowed
@@ -95,10 +168,39 @@ class User(BaseUser):
         if status != 200:
             raise PasswordInvalid
 
+    def _load_histories(self) -> None:
+        """Fetch the :py:data:`HISTORY_FIELDS` if they are missing"""
+        data = self.user_data
+        if data.traffic_history is not None and data.finance_history is not None:
+            return
+
+        try:
+            status, result = api.get_user(str(data.id), fields=HISTORY_FIELDS)
+        except PycroftBackendError:
+            if not self.stale:
+                raise
+            # we are showing outdated data anyway, so show it without histories
+            data.traffic_history = data.traffic_history or []
+            data.finance_history = data.finance_history or []
+            return
+
+        if status != 200:
+            raise UserNotFound
+        try:
+            histories = decode_histories(result, trusted=_trusted_decoding())
+        except ValueError as e:
+            raise PycroftBackendError("Error when parsing user lookup response") from e
+
+        data.traffic_history = histories.traffic_history
+        data.finance_history = histories.finance_history
+        if not self.stale:
+            user_cache.set(data)
+
     # TODO just pass through `list[TrafficHistoryEntry]` and move presentation
     # to the blueprint
     @property
     def traffic_history(self):
+        self._load_histories()
         return [{
             'day': (d.weekday() if (d := parse_date(entry.timestamp)) else None),
             'input': to_kib(entry.ingress),
@@ -136,6 +238,7 @@ class User(BaseUser):
             capabilities=Capabilities.edit_if(len(self.user_data.interfaces) <= 1),
         )
 
+    @invalidates_cache
     def change_mac_address(self, new_mac, host_name, password):
         assert len(self.user_data.interfaces) == 1
 
@@ -166,6 +269,7 @@ class User(BaseUser):
             capabilities=Capabilities.edit_if(can_edit),
         )
 
+    @invalidates_cache
     def activate_network_access(self, password, mac, birthdate, host_name):
         status, _ = api.activate_network_access(self.user_data.id, password, mac,
                                                      birthdate, host_name)
@@ -179,6 +283,7 @@ class User(BaseUser):
         elif status == 422:
             raise SubnetFull
 
+    @invalidates_cache
     def terminate_membership(self, end_date):
         status, _ = api.terminate_membership(self.user_data.id, end_date)
 
@@ -195,6 +300,7 @@ class User(BaseUser):
         else:
             raise UnknownError
 
+    @invalidates_cache
     def continue_membership(self):
         status, _ = api.continue_membership(self.user_data.id)
 
@@ -211,6 +317,7 @@ class User(BaseUser):
             capabilities=Capabilities.edit_if(self.has_property("mail")),
         )
 
+    @invalidates_cache
     def change_mail(self, password: str, new_mail: str, mail_forwarded: bool):
         status, _ = api.change_mail(
             self.user_data.id,
@@ -301,10 +408,13 @@ class User(BaseUser):
 
     @property
     def finance_information(self) -> FinanceInformation:
+        self._load_histories()
+        history = self.user_data.finance_history
+        assert history is not None
         return FinanceInformation(
             balance=self.user_data.finance_balance,
             transactions=((parse_date(t.valid_on), t.amount, t.description) for t in
-                          self.user_data.finance_history),
+                          history),
             last_update=self.user_data.last_finance_update
         )
 
@@ -337,6 +447,7 @@ class User(BaseUser):
             capabilities=Capabilities(edit=True, displayable=False),
         )
 
+    @invalidates_cache
     def change_mpsk_clients(self, mac, name, mpsk_id, password: str):
         status, _ = api.change_mpsk(
             user_id=self.user_data.id,
@@ -353,6 +464,7 @@ class User(BaseUser):
         elif status == 422:
             raise ValueError
 
+    @invalidates_cache
     def add_mpsk_client(self, name, mac, password):
         status, response = api.add_mpsk(
             self.user_data.id,
@@ -373,6 +485,7 @@ class User(BaseUser):
         else:
             raise ValueError(f"Invalid response from {response}")
 
+    @invalidates_cache
     def delete_mpsk_client(self, mpsk_id, password):
         status, _ = api.delete_mpsk(
             self.user_data.id,
@@ -428,6 +541,7 @@ class User(BaseUser):
             capabilities=Capabilities(edit=True, copyable=True),
         )
 
+    @invalidates_cache
     def reset_wifi_password(self):
         status, result = api.reset_wifi_password(self.user_data.id)
 
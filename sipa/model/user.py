@@ -67,6 +67,10 @@ class BaseUser(AuthenticatedUserMixin, metaclass=ABCMeta):
 
     datasource = None
 
+    #: Whether the data shown is possibly outdated, because the backend
+    #: could not be reached
+    stale = False
+
     def get_id(self) -> str:
         """This method is Required by flask-login."""
         return self.uid
@@ -0,0 +1,182 @@
+"""
+Full-text search over the content pages
+
+For every possible locale, a :py:class:`SearchIndex` maps the terms of
+the articles (as shown in that locale) to the articles containing them.
+The indexes are built by :py:class:`~sipa.flatpages.CategorizedFlatPages`
+whenever the content is (re)loaded, so queries never look at markdown.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import typing as t
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from html import unescape
+from os.path import basename, splitext
+from weakref import WeakKeyDictionary
+
+from flask_flatpages import Page
+
+if t.TYPE_CHECKING:
+    from sipa.flatpages import Category
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_TAG = re.compile(r"<[^>]+>")
+
+STOPWORDS: dict[str, frozenset[str]] = {
+    'de': frozenset(
+        "aber als am an auch auf aus bei bin bis da das dass dem den der des die"
+        " du ein eine einem einen einer eines er es für hat ich ihr im in ist"
+        " ja mit nach nicht noch oder sich sie sind so um und von vor wie wir"
+        " wird zu zum zur".split()
+    ),
+    'en': frozenset(
+        "a an and are as at be by can do for from has have i if in is it its"
+        " not of on or that the this to was we with you your".split()
+    ),
+}
+
+#: How much more a term in the title counts than one in the text
+TITLE_WEIGHT = 5
+#: How much less a term counts if it only matches as a prefix
+PREFIX_WEIGHT = 0.5
+SUMMARY_LENGTH = 200
+
+
+def tokenize(text: str, locale: str) -> list[str]:
+    """Split ``text`` into lowercase terms, without stopwords"""
+    stopwords = STOPWORDS.get(locale, frozenset())
+    return [term for term in _WORD.findall(text.casefold())
+            if len(term) > 1 and term not in stopwords]
+
+
+def plain_text(html: str) -> str:
+    return " ".join(unescape(_TAG.sub(" ", html)).split())
+
+
+def summarize(text: str) -> str:
+    if len(text) <= SUMMARY_LENGTH:
+        return text
+    return text[:SUMMARY_LENGTH].rsplit(" ", 1)[0] + "…"
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    title: str
+    summary: str
+    #: The endpoint and its values showing the article
+    endpoint: str
+    values: dict[str, str]
+
+
+class _PageTerms(t.NamedTuple):
+    summary: str
+    terms: Counter[str]
+
+
+class TermCache:
+    """The terms of every page, kept as long as the page is in use
+
+    This way, only pages which changed on a reload are tokenized again.
+    """
+
+    def __init__(self):
+        self._entries: WeakKeyDictionary[Page, dict[str, _PageTerms]] = WeakKeyDictionary()
+
+    def get(self, page: Page, locale: str) -> _PageTerms:
+        by_locale = self._entries.setdefault(page, {})
+        if (entry := by_locale.get(locale)) is None:
+            text = plain_text(page.html)
+            terms = Counter(tokenize(text, locale))
+            for term in tokenize(page.meta['title'], locale):
+                terms[term] += TITLE_WEIGHT
+            entry = by_locale[locale] = _PageTerms(summarize(text), terms)
+        return entry
+
+
+class SearchIndex:
+    """An inverted index of the articles as seen in one locale"""
+
+    def __init__(self, documents: t.Iterable[tuple[SearchResult, Counter[str]]], locale: str):
+        self.locale = locale
+        self._results: list[SearchResult] = []
+        #: term → document number → weight
+        self._postings: dict[str, dict[int, int]] = {}
+        for number, (result, terms) in enumerate(documents):
+            self._results.append(result)
+            for term, count in terms.items():
+                self._postings.setdefault(term, {})[number] = count
+        #: Sorted, to find the terms with a given prefix by bisection
+        self._terms = sorted(self._postings)
+
+    @classmethod
+    def build(cls, root: Category, locale: str, term_cache: TermCache) -> SearchIndex:
+        """Index every listed article of ``root`` in ``locale``
+
+        Articles which are hidden, restricted or only link elsewhere are
+        left out, as are the category indexes and pages failing to
+        render.
+        """
+        documents = []
+        for category in root.categories.values():
+            for article in category._articles.values():
+                page = article.page_for((locale,))
+                meta = page.meta
+                if (article.id == 'index' or meta.get('hidden', False)
+                        or meta.get('restricted', False) or meta.get('link')):
+                    continue
+                if category.id == 'news':
+                    endpoint = 'news.show_news'
+                    values = {'filename': splitext(basename(page.path))[0]}
+                else:
+                    endpoint = 'pages.show'
+                    values = {'category_id': category.id, 'article_id': article.id}
+                try:
+                    summary, terms = term_cache.get(page, locale)
+                except Exception:
+                    # one broken page should not take the search down with it
+                    logger.exception("Could not index %s", page.path)
+                    continue
+                result = SearchResult(title=meta['title'], summary=summary,
+                                      endpoint=endpoint, values=values)
+                documents.append((result, terms))
+        return cls(documents, locale)
+
+    def _matches(self, term: str) -> dict[int, float]:
+        """The weight of ``term`` in every document containing it
+
+        Terms merely starting with ``term`` count with :py:data:`PREFIX_WEIGHT`.
+        """
+        weights: dict[int, float] = dict(self._postings.get(term, {}))
+        # by index, as slicing would copy the rest of the terms
+        for index in range(bisect_left(self._terms, term), len(self._terms)):
+            other = self._terms[index]
+            if not other.startswith(term):
+                break
+            if other == term:
+                continue
+            for number, count in self._postings[other].items():
+                weights[number] = max(weights.get(number, 0), count * PREFIX_WEIGHT)
+        return weights
+
+    def search(self, query: str, limit: int = 20) -> list[SearchResult]:
+        """The articles containing every term of ``query``, best first"""
+        scores: dict[int, float] | None = None
+        for term in tokenize(query, self.locale):
+            matches = self._matches(term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {number: score + matches[number]
+                          for number, score in scores.items() if number in matches}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        best = sorted(scores, key=lambda number: (-scores[number], number))
+        return [self._results[number] for number in best[:limit]]
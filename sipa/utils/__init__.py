@@ -17,13 +17,14 @@ import icalendar
 import markdown
 import recurring_ical_events
 import requests
-from cachetools import TTLCache, cached
 from dateutil.relativedelta import relativedelta
 from flask import flash, redirect, request, url_for
 from flask_login import current_user
 from icalendar import Calendar
 from werkzeug.http import parse_date as parse_datetime
 
+from .refresher import background_feed
+
 from flask.globals import current_app
 
 logger = logging.getLogger(__name__)
@@ -36,6 +37,8 @@ def get_bustimes(stopname, count=10):
 
     :param stopname: Requested stop.
     :param count: Limit the entries for the stop.
+    :returns: A list of departures, or ``None`` if the API could not be
+        queried.
     """
     conn = http.client.HTTPConnection('widgets.vvo-online.de', timeout=1)
 
@@ -45,40 +48,47 @@ def get_bustimes(stopname, count=10):
             'GET',
             f'/abfahrtsmonitor/Abfahrten.do?ort=Dresden&hst={stopname}'
         )
-        response = conn.getresponse()
-    except OSError:
+        response_data = json.loads(conn.getresponse().read().decode())
+    except (OSError, ValueError):
         return None
+    finally:
+        conn.close()
 
-    response_data = json.loads(response.read().decode())
-
-    return ({
+    # a list, so that the result can be cached
+    return [{
         'line': i[0],
         'dest': i[1],
         'minutes_left': int(i[2]) if i[2] else 0,
-    } for i in response_data)
+    } for i in response_data[:count]]
 # TODO: check whether this is the correct format
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=2 * 60))
-def try_fetch_hotline_availability(uri: str) -> bool:
+def try_fetch_hotline_availability(uri: str) -> bool | None:
     """Determines whether there are agents logged in to anwser calls to our
     support hotline.
+
+    :returns: ``None`` if the PBX could not be reached
     """
-    if not (r := requests.get(uri)):
+    try:
+        r = requests.get(uri, timeout=2)
+    except requests.exceptions.RequestException:
+        logger.exception("Error when fetching hotline availability at %s", uri)
+        return None
+    if not r:
         return False
 
     return r.text == "AVAILABLE"
 
 
+@background_feed(interval=2 * 60, default=lambda: False, max_age=10 * 60)
 def support_hotline_available():
     return try_fetch_hotline_availability(current_app.config["PBX_URI"])
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=300))
 def try_fetch_calendar(url: str) -> Calendar | None:
     """Fetch an ICAL calendar from a given URL."""
     try:
-        response = requests.get(url, timeout=1)
+        response = requests.get(url, timeout=5)
     except requests.exceptions.RequestException:
         logger.exception("Error when fetching calendar at %s", url)
         return
@@ -123,11 +133,11 @@ def events_from_calendar(calendar: icalendar.Calendar) -> list[Event]:
     )
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=300))
+@background_feed(interval=300, default=list, max_age=24 * 60 * 60)
 def meetingcal():
     """Returns the calendar events got form the url in the config"""
     if not (calendar := try_fetch_calendar(current_app.config['MEETINGS_ICAL_URL'])):
-        return []
+        return None
 
     events = events_from_calendar(calendar)
     next_meetings = [
@@ -145,12 +155,17 @@ def meetingcal():
     return next_meetings
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=300))
+def _offices():
+    return {item.pop("name"): item for item in deepcopy(current_app.config["CONTACT_ADDRESSES"])}
+
+
+@background_feed(interval=300, default=_offices, max_age=24 * 60 * 60)
 def support_cal():
     """Returns the list of offices with next opening times within a month."""
-    offices = {item.pop("name"): item for item in deepcopy(current_app.config["CONTACT_ADDRESSES"])}
     if not (calendar := try_fetch_calendar(current_app.config["SUPPORT_ICAL_URL"])):
-        return offices
+        return None
+
+    offices = _offices()
 
     for office in offices:
         offices[office]["next"] = [
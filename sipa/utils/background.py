@@ -0,0 +1,60 @@
+"""
+Periodic work in a thread of each worker
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import typing as t
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundThread:
+    """Call ``target`` in a daemon thread, every ``interval`` seconds
+
+    Exceptions raised by ``target`` are logged, and it is called again
+    after the next interval.
+    """
+
+    def __init__(self, name: str, target: Callable[[], t.Any], interval: float):
+        self.name = name
+        self.target = target
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+
+    def ensure_running(self) -> None:
+        """Start the thread, unless it already runs in this process
+
+        Threads do not survive a fork, so this is called per request
+        instead of at startup.
+        """
+        if self.running():
+            return
+        with self._start_lock:
+            if self.running():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def running(self) -> bool:
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def wake_up(self) -> None:
+        """Call ``target`` now instead of after the interval"""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.target()
+            except Exception:
+                logger.exception("Background thread %s failed", self.name)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -0,0 +1,211 @@
+"""
+Caches which can be shared between the workers of a node
+
+Every cache is accessed through a :py:class:`CacheBackend`.  Which
+backend is used is determined by the ``CACHE_BACKEND`` config key:
+
+* ``"simple"``: a bounded in-process cache, private to each worker.
+* ``"uwsgi"``: uwsgi's `caching framework
+  <https://uwsgi-docs.readthedocs.io/en/latest/Caching.html>`_, which is
+  shared between all workers of a uwsgi instance.  Values are pickled.
+  The cache named by ``CACHE_UWSGI_NAME`` must be configured in the
+  ``uwsgi.ini``.
+* ``"auto"`` (the default): ``"uwsgi"`` when running under uwsgi with
+  that cache configured, ``"simple"`` otherwise.
+
+The backend of the current app is available as :py:data:`cache`.
+"""
+from __future__ import annotations
+
+import logging
+import pickle
+import threading
+import typing as t
+from abc import ABC, abstractmethod
+
+from cachetools import TLRUCache
+from flask import Flask, current_app, g
+from werkzeug.local import LocalProxy
+
+logger = logging.getLogger(__name__)
+
+
+class _Missing:
+    def __repr__(self):
+        return "<MISSING>"
+
+
+#: Returned by :py:meth:`CacheBackend.get` if no value is present
+MISSING: t.Any = _Missing()
+
+
+class CacheBackend(ABC):
+    """A key-value store whose entries expire after a given TTL"""
+
+    #: Whether the entries are shared between the workers
+    shared: t.ClassVar[bool] = False
+
+    @abstractmethod
+    def get(self, key: str, default: t.Any = MISSING) -> t.Any:
+        """Return the value stored at ``key`` or ``default``."""
+
+    @abstractmethod
+    def set(self, key: str, value: t.Any, ttl: float) -> None:
+        """Store ``value`` at ``key`` for ``ttl`` seconds."""
+
+    @abstractmethod
+    def add(self, key: str, value: t.Any, ttl: float) -> bool:
+        """Store ``value`` at ``key`` for ``ttl`` seconds, unless a
+        value is already present.
+
+        :returns: Whether ``value`` was stored
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+
+class _Entry(t.NamedTuple):
+    value: t.Any
+    ttl: float
+
+
+class SimpleCache(CacheBackend):
+    """A thread-safe in-process cache with per-entry TTLs"""
+
+    def __init__(self, maxsize: int):
+        self._cache: TLRUCache[str, _Entry] = TLRUCache(
+            maxsize=maxsize,
+            ttu=lambda _key, entry, now: now + entry.ttl,
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: t.Any = MISSING) -> t.Any:
+        with self._lock:
+            entry = self._cache.get(key)
+        return entry.value if entry is not None else default
+
+    def set(self, key: str, value: t.Any, ttl: float) -> None:
+        with self._lock:
+            self._cache[key] = _Entry(value, ttl)
+
+    def add(self, key: str, value: t.Any, ttl: float) -> bool:
+        with self._lock:
+            if key in self._cache:
+                return False
+            self._cache[key] = _Entry(value, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class UwsgiCache(CacheBackend):
+    """A cache backed by uwsgi's caching framework
+
+    Values are pickled, so they must not exceed the configured size of
+    the uwsgi cache.  If storing fails, this is logged and otherwise
+    ignored.
+    """
+
+    shared = True
+
+    def __init__(self, name: str):
+        import uwsgi
+        self._uwsgi = uwsgi
+        self.name = name
+
+    def get(self, key: str, default: t.Any = MISSING) -> t.Any:
+        if (raw := self._uwsgi.cache_get(key, self.name)) is None:
+            return default
+        try:
+            return pickle.loads(raw)
+        except Exception:
+            logger.exception("Could not unpickle cache entry %r", key)
+            return default
+
+    def set(self, key: str, value: t.Any, ttl: float) -> None:
+        # uwsgi expects whole seconds, and 0 means “never expires”
+        expires = max(int(ttl), 1)
+        if not self._uwsgi.cache_update(key, pickle.dumps(value), expires, self.name):
+            logger.warning("Could not store %r in uwsgi cache %r", key, self.name)
+
+    def add(self, key: str, value: t.Any, ttl: float) -> bool:
+        # unlike `cache_update`, this fails if the key is present
+        return bool(self._uwsgi.cache_set(key, pickle.dumps(value), max(int(ttl), 1),
+                                          self.name))
+
+    def delete(self, key: str) -> None:
+        self._uwsgi.cache_del(key, self.name)
+
+    def clear(self) -> None:
+        self._uwsgi.cache_clear(self.name)
+
+    def exists(self) -> bool:
+        """Whether uwsgi has a cache of this name
+
+        uwsgi does not tell a missing cache from a missing key, so a
+        marker entry is stored on the first call.
+        """
+        key = "sipa:cache-probe"
+        return bool(self._uwsgi.cache_exists(key, self.name)
+                    or self._uwsgi.cache_update(key, b"", 0, self.name))
+
+
+def _uwsgi_cache(name: str, warn: bool) -> UwsgiCache | None:
+    """The uwsgi cache ``name``, if running under uwsgi and it exists"""
+    try:
+        cache = UwsgiCache(name=name)
+    except ImportError:
+        if warn:
+            logger.warning("uwsgi package not found, falling back to simple cache")
+        return None
+    if not cache.exists():
+        logger.warning("uwsgi cache %r not found, falling back to simple cache", name)
+        return None
+    return cache
+
+
+def make_cache_backend(config: t.Mapping[str, t.Any]) -> CacheBackend:
+    """Create the cache backend as selected by ``CACHE_BACKEND``"""
+    match config['CACHE_BACKEND']:
+        case "simple":
+            pass
+        case "auto" | "uwsgi" as backend:
+            if cache := _uwsgi_cache(config['CACHE_UWSGI_NAME'], warn=backend == "uwsgi"):
+                return cache
+        case other:
+            raise ValueError(f"Unknown cache backend {other!r}")
+    return SimpleCache(maxsize=config['CACHE_SIMPLE_SIZE'])
+
+
+def reset_g_before_request(app: Flask, *names: str) -> None:
+    """Drop the values memoized on :py:data:`flask.g` as ``names``
+    before every request of ``app``
+
+    `g` outlives a request if an app context has been pushed
+    beforehand, so the values would otherwise leak into the next one.
+    """
+    def reset() -> None:
+        for name in names:
+            g.pop(name, None)
+
+    app.before_request(reset)
+
+
+def init_cache(app: Flask):
+    app.extensions['cache'] = make_cache_backend(app.config)
+
+
+cache: CacheBackend = t.cast(CacheBackend, LocalProxy(lambda: current_app.extensions['cache']))
+
@@ -0,0 +1,87 @@
+"""
+A circuit breaker to stop calling a service which is failing
+"""
+import logging
+import threading
+import time
+from collections import deque
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    #: Calls pass, and their outcome is recorded
+    CLOSED = "closed"
+    #: Calls are rejected until ``reset_timeout`` has passed
+    OPEN = "open"
+    #: A single trial call is let through to probe the service
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Reject calls to a service after too many of them failed
+
+    The outcome of the last ``window`` calls is remembered.  Once at
+    least ``min_calls`` of them have been recorded and the share of
+    failures reaches ``failure_rate``, the circuit opens, and
+    :py:meth:`allow` returns ``False`` for ``reset_timeout`` seconds.
+    After that, one trial call is allowed: if it succeeds, the circuit
+    closes again, otherwise it stays open for another
+    ``reset_timeout``.
+
+    The state is local to the process.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20,
+                 min_calls: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        with self._lock:
+            match self._state:
+                case CircuitState.CLOSED:
+                    return True
+                case CircuitState.OPEN if time.monotonic() - self._opened_at >= self.reset_timeout:
+                    logger.info("Circuit %s half-open, probing", self.name)
+                    self._state = CircuitState.HALF_OPEN
+                    return True
+                case _:
+                    return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                logger.info("Circuit %s closed", self.name)
+                self._state = CircuitState.CLOSED
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self._state is CircuitState.CLOSED
+                    and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def _open(self) -> None:
+        logger.warning("Circuit %s opened", self.name)
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
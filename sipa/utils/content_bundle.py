@@ -0,0 +1,128 @@
+"""
+Snapshots of the parsed content pages
+
+Reading every page from ``FLATPAGES_ROOT``, parsing its meta section
+and rendering its markdown is what makes starting a worker slow.  A
+:py:class:`ContentBundle` stores the result of that in a single file,
+keyed by the commit of the content repository.  This way, the parsing
+is only done once per commit by whoever comes first, and every other
+worker just unpickles the bundle.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import tempfile
+import typing as t
+from dataclasses import dataclass, field
+
+import git
+from flask_flatpages import Page
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
+from yaml import YAMLError
+
+logger = logging.getLogger(__name__)
+
+#: Bumped whenever the layout of :py:class:`PageRecord` changes
+BUNDLE_FORMAT = 2
+
+
+@dataclass(frozen=True)
+class PageRecord:
+    """Everything needed to recreate a :py:class:`~flask_flatpages.Page`"""
+    path: str
+    folder: str
+    meta_source: str
+    body: str
+    #: ``None`` if the meta section could not be parsed
+    meta: dict[str, t.Any] | None
+    #: ``None`` if the page could not be rendered
+    html: str | None
+
+    @classmethod
+    def from_page(cls, page: Page) -> PageRecord:
+        """Create the record of a page, parsing and rendering it if necessary"""
+        try:
+            meta = page.meta
+        except (YAMLError, ValueError):
+            meta = None
+        try:
+            # the rendering does not depend on the request, see `link_patch`
+            html = page.html
+        except Exception:
+            logger.exception("Could not render page %s", page.path)
+            html = None
+        return cls(path=page.path, folder=page.folder, meta_source=page._meta,
+                   body=page.body, meta=meta, html=html)
+
+    def to_page(self, html_renderer: t.Callable[[Page], str]) -> Page:
+        page = Page(self.path, self.meta_source, self.body, html_renderer, self.folder)
+        if self.meta is not None:
+            page.meta = self.meta
+        if self.html is not None:
+            page.html = self.html
+        return page
+
+
+@dataclass
+class ContentBundle:
+    commit: str
+    pages: list[PageRecord] = field(default_factory=list)
+    format: int = BUNDLE_FORMAT
+
+
+def get_commit(repo_dir: str) -> str | None:
+    """The commit checked out in ``repo_dir``, if it is a git repository"""
+    try:
+        return git.Repo(repo_dir).head.commit.hexsha
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
+    except ValueError:
+        # a repository without any commits
+        return None
+
+
+def bundle_path(bundle_dir: str, commit: str) -> str:
+    return os.path.join(bundle_dir, f"content-{commit}.pickle")
+
+
+def load_bundle(bundle_dir: str, commit: str) -> ContentBundle | None:
+    """Load the bundle of ``commit``, if there is a usable one"""
+    path = bundle_path(bundle_dir, commit)
+    try:
+        with open(path, "rb") as f:
+            bundle = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.exception("Could not load content bundle %s", path)
+        return None
+
+    if not isinstance(bundle, ContentBundle) or bundle.format != BUNDLE_FORMAT \
+            or bundle.commit != commit:
+        logger.warning("Ignoring outdated content bundle %s", path)
+        return None
+    return bundle
+
+
+def write_bundle(bundle_dir: str, bundle: ContentBundle) -> None:
+    """Store ``bundle`` in ``bundle_dir``
+
+    The file is replaced atomically, so concurrent readers see either
+    the old or the new bundle.  Failing to write is logged, but not
+    raised, as the bundle is only an optimization.
+    """
+    try:
+        os.makedirs(bundle_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=bundle_dir, delete=False) as f:
+            pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        logger.exception("Could not write content bundle to %s", bundle_dir)
+        return
+
+    try:
+        os.replace(f.name, bundle_path(bundle_dir, bundle.commit))
+    except OSError:
+        logger.exception("Could not write content bundle to %s", bundle_dir)
+        os.unlink(f.name)
@@ -4,7 +4,7 @@ from subprocess import call
 
 import git
 from flask_babel import format_datetime
-from git.exc import (GitCommandError, InvalidGitRepositoryError,
+from git.exc import (BadName, GitCommandError, InvalidGitRepositoryError,
                      NoSuchPathError, CacheError)
 
 logger = getLogger(__name__)
@@ -40,23 +40,44 @@ def init_repo(repo_dir, repo_url):
     logger.info("Initialized git repository %s in %s", repo_url, repo_dir)
 
 
-def update_repo(repo_dir):
+def update_repo(repo_dir) -> bool:
+    """Reset ``repo_dir`` to the fetched ``origin/master``
+
+    :return: Whether another commit is checked out now
+    """
     repo = git.Repo.init(repo_dir)
 
     try:
-        if repo.commit().hexsha != repo.remote().fetch()[0].commit.hexsha:
-            origin = repo.remote()
-            origin.fetch()
-            repo.git.reset('--hard', 'origin/master')
-            return True
-        else:
+        if repo.commit().hexsha == repo.remote().fetch()[0].commit.hexsha:
             return False
+        origin = repo.remote()
+        origin.fetch()
+        repo.git.reset('--hard', 'origin/master')
     except GitCommandError:
         logger.error("Git fetch failed", extra={'data': {'repo_dir': repo_dir}})
-    else:
-        logger.info("Fetched git repository", extra={'data': {
-            'repo_dir': repo_dir
-        }})
+        return False
+    logger.info("Fetched git repository", extra={'data': {
+        'repo_dir': repo_dir
+    }})
+    return True
+
+
+def changed_files(repo_dir: str, old_commit: str, new_commit: str) -> set[str] | None:
+    """The paths of the files added, changed or removed between two commits
+
+    Both sides of renames are included.
+
+    :return: The paths relative to the repository root, or ``None`` if
+        the diff could not be computed (e.g. because ``old_commit`` is
+        gone after a force push).
+    """
+    try:
+        diff = git.Repo(repo_dir).commit(old_commit).diff(new_commit)
+    except (InvalidGitRepositoryError, NoSuchPathError, BadName, ValueError,
+            GitCommandError):
+        logger.warning("Could not diff %s..%s in %s", old_commit, new_commit, repo_dir)
+        return None
+    return {path for d in diff for path in (d.a_path, d.b_path) if path is not None}
 
 
 def get_repo_active_branch(repo_dir: str) -> str:
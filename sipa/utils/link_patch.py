@@ -1,25 +1,39 @@
 import re
 
-from flask import request
+from flask import request, has_request_context
 from markdown import Markdown
 from markdown.extensions import Extension
 from markdown.postprocessors import Postprocessor
 
+#: Put in front of absolute links instead of the script root, so that the
+#: rendered HTML does not depend on the request.
+#: See :py:func:`resolve_script_root`.
+SCRIPT_ROOT_PLACEHOLDER = "%%sipa:script_root%%"
+
 
 def absolute_path_replacer(match):
-    """Correct the url in a regex match prepending the absolute path"""
+    """Prepend the script root placeholder to the url in a regex match"""
     assert len(match.groups()) == 2
 
-    prefix = request.script_root
-    if prefix.endswith("/"):
-        prefix = prefix[:-1]
+    return f'{match.group(1)}="{SCRIPT_ROOT_PLACEHOLDER}{match.group(2)}"'
+
 
-    return f'{match.group(1)}="{prefix + match.group(2)}"'
+def resolve_script_root(html: str, script_root: str | None = None) -> str:
+    """Replace the placeholders in rendered markdown by the script root
+
+    :param script_root: Defaults to the one of the current request, if any
+    """
+    if script_root is None:
+        script_root = request.script_root if has_request_context() else ""
+    return html.replace(SCRIPT_ROOT_PLACEHOLDER, script_root.removesuffix("/"))
 
 
 class LinkPostprocessor(Postprocessor):
     """A postprocessor fixing absolute links in the HTML result of a markdown render.
 
+    The links are prefixed with :py:data:`SCRIPT_ROOT_PLACEHOLDER`, which
+    has to be replaced using :py:func:`resolve_script_root` before serving the HTML.
+
     This needs to be a postprocessor compared to a treeprocessor, because
     the link may be in a pure HTML block.  Those blocks however are processed by means
     of the [`MarkdownInHtmlExtension`](https://python-markdown.github.io/extensions/md_in_html/),
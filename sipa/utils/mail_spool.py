@@ -0,0 +1,164 @@
+"""
+A durable queue of outgoing mails
+
+Mails are stored in a :py:class:`MailSpool`, a SQLite database which
+can be shared by all workers of a node, and delivered by a
+:py:class:`MailSender` thread in the background.  A mail which could
+not be delivered is retried with exponential backoff, until it failed
+``max_attempts`` times.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import time
+import typing as t
+from collections.abc import Callable
+from contextlib import closing
+
+from sipa.utils.background import BackgroundThread
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mails (
+    id INTEGER PRIMARY KEY,
+    from_addr TEXT NOT NULL,
+    to_addrs TEXT NOT NULL,
+    msg TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS mails_due ON mails (failed, next_attempt);
+"""
+
+
+class SpooledMail(t.NamedTuple):
+    id: int
+    from_addr: str
+    to_addrs: str
+    msg: str
+    attempts: int
+
+
+class MailSpool:
+    """The mails waiting to be delivered
+
+    Mails being delivered are leased for ``lease`` seconds, so that
+    several senders can share a spool.  If a sender dies while
+    delivering, the mail is delivered again once the lease expired.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 10, retry_delay: float = 30,
+                 max_retry_delay: float = 3600, lease: float = 300):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lease = lease
+        if dirname := os.path.dirname(path):
+            os.makedirs(dirname, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> closing[sqlite3.Connection]:
+        # autocommit mode, transactions are begun explicitly
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return closing(connection)
+
+    def enqueue(self, from_addr: str, to_addrs: str, msg: str) -> int:
+        """Store a mail for delivery, returning its id"""
+        now = time.time()
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO mails (from_addr, to_addrs, msg, created, next_attempt)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (from_addr, to_addrs, msg, now, now),
+            )
+        return t.cast(int, cursor.lastrowid)
+
+    def claim_due(self, limit: int = 10) -> list[SpooledMail]:
+        """Lease up to ``limit`` mails due for delivery"""
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                mails = [SpooledMail(*row) for row in connection.execute(
+                    "SELECT id, from_addr, to_addrs, msg, attempts FROM mails"
+                    " WHERE failed = 0 AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                    (now, limit),
+                )]
+                connection.executemany(
+                    "UPDATE mails SET next_attempt = ? WHERE id = ?",
+                    [(now + self.lease, mail.id) for mail in mails],
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return mails
+
+    def delivered(self, mail: SpooledMail) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM mails WHERE id = ?", (mail.id,))
+
+    def attempt_failed(self, mail: SpooledMail, error: str) -> bool:
+        """Schedule the next attempt, if any
+
+        :returns: Whether the mail will be retried
+        """
+        attempts = mail.attempts + 1
+        retry = attempts < self.max_attempts
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE mails SET attempts = ?, next_attempt = ?, last_error = ?, failed = ?"
+                " WHERE id = ?",
+                (attempts, time.time() + delay, error, int(not retry), mail.id),
+            )
+        return retry
+
+    def pending(self) -> int:
+        """The number of mails still to be delivered"""
+        with self._connect() as connection:
+            [(count,)] = connection.execute("SELECT COUNT(*) FROM mails WHERE failed = 0")
+        return count
+
+
+class MailSender(BackgroundThread):
+    """Deliver the mails of a spool in a background thread
+
+    :param send: Delivers a mail, raising on failure.  Any exception
+        counts as a failed attempt, e.g. also the
+        :py:class:`UnicodeEncodeError` of an address which is not ASCII.
+    """
+
+    def __init__(self, spool: MailSpool, send: Callable[[str, str, str], None],
+                 poll_interval: float = 10):
+        super().__init__("mail-sender", self.deliver_due, interval=poll_interval)
+        self.spool = spool
+        self.send = send
+
+    def deliver_due(self) -> int:
+        """Try to deliver every due mail, returning how many were delivered"""
+        delivered = 0
+        while mails := self.spool.claim_due():
+            for mail in mails:
+                try:
+                    self.send(mail.from_addr, mail.to_addrs, mail.msg)
+                except Exception as e:
+                    if self.spool.attempt_failed(mail, repr(e)):
+                        logger.warning("Could not deliver mail %d, retrying later", mail.id,
+                                       extra={'data': {'exception_arguments': e.args}})
+                    else:
+                        logger.critical("Giving up delivering mail %d", mail.id,
+                                        extra={'data': {'exception_arguments': e.args}})
+                else:
+                    self.spool.delivered(mail)
+                    delivered += 1
+        return delivered
@@ -0,0 +1,115 @@
+"""
+Atom and JSON feeds of the news
+
+The feeds are built from the entries of a
+:py:class:`~sipa.flatpages.NewsIndex`, see :py:func:`feed_entries`, and
+contain the whole article with absolute links.
+"""
+from __future__ import annotations
+
+import json
+import typing as t
+from datetime import UTC, date, datetime
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+from sipa.utils.link_patch import resolve_script_root
+
+if t.TYPE_CHECKING:
+    from sipa.flatpages import Article
+
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+#: Used as the ``updated`` date of an empty feed
+_EPOCH = "1970-01-01T00:00:00Z"
+
+
+class FeedEntry(t.NamedTuple):
+    url: str
+    title: str
+    #: RFC 3339
+    published: str
+    content_html: str
+
+
+class Feed(t.NamedTuple):
+    title: str
+    home_url: str
+    feed_url: str
+    entries: list[FeedEntry]
+
+
+def timestamp(value: date | datetime | str) -> str:
+    """Format the ``date`` of a news article as RFC 3339
+
+    Dates without a time or time zone are taken to be midnight UTC.
+    """
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=UTC)).isoformat()
+    if isinstance(value, date):
+        return f"{value.isoformat()}T00:00:00Z"
+    return str(value)
+
+
+def feed_entries(
+    articles: t.Iterable[Article],
+    locale_order: tuple[str, ...],
+    url_for_article: t.Callable[[Article], str],
+    url_root: str,
+) -> list[FeedEntry]:
+    """The entries for the given (dated) news articles
+
+    :param url_for_article: Returns the absolute URL of an article
+    :param url_root: Prefixed to absolute links in the articles
+    """
+    entries = []
+    for article in articles:
+        page = article.page_for(locale_order)
+        entries.append(FeedEntry(
+            url=url_for_article(article),
+            title=page.meta['title'],
+            published=timestamp(page.meta['date']),
+            content_html=resolve_script_root(page.html, url_root),
+        ))
+    return entries
+
+
+def atom_feed(feed: Feed) -> bytes:
+    root = Element("feed", xmlns=ATOM_NAMESPACE)
+    SubElement(root, "id").text = feed.home_url
+    SubElement(root, "title").text = feed.title
+    SubElement(root, "updated").text = feed.entries[0].published if feed.entries else _EPOCH
+    SubElement(root, "link", rel="self", href=feed.feed_url)
+    SubElement(root, "link", rel="alternate", type="text/html", href=feed.home_url)
+    SubElement(SubElement(root, "author"), "name").text = "AG DSN"
+
+    for entry in feed.entries:
+        element = SubElement(root, "entry")
+        SubElement(element, "id").text = entry.url
+        SubElement(element, "title").text = entry.title
+        SubElement(element, "updated").text = entry.published
+        SubElement(element, "published").text = entry.published
+        SubElement(element, "link", rel="alternate", type="text/html", href=entry.url)
+        SubElement(element, "content", type="html").text = entry.content_html
+
+    return tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def json_feed(feed: Feed) -> bytes:
+    """The feed in the `JSON Feed <https://jsonfeed.org/version/1.1>`_ format"""
+    return json.dumps({
+        "version": JSON_FEED_VERSION,
+        "title": feed.title,
+        "home_page_url": feed.home_url,
+        "feed_url": feed.feed_url,
+        "authors": [{"name": "AG DSN"}],
+        "items": [
+            {
+                "id": entry.url,
+                "url": entry.url,
+                "title": entry.title,
+                "date_published": entry.published,
+                "content_html": entry.content_html,
+            }
+            for entry in feed.entries
+        ],
+    }, ensure_ascii=False).encode()
@@ -0,0 +1,183 @@
+"""
+Keeping the data of external services up to date in the background
+
+Functions decorated with :py:func:`background_feed` do not fetch
+anything when called: they return the last good snapshot of their
+result, which is kept in the :py:data:`~sipa.utils.cache.cache`.
+
+A :py:class:`Refresher` thread in every worker refreshes the snapshots
+once they are due, so requests never wait for the network.  Workers
+sharing a ``"uwsgi"`` cache also share the snapshots, and a worker
+takes a lease on a feed before fetching it, so that it is refreshed by
+only one of them.  Without ``BACKGROUND_REFRESH``
+(as in the tests), the thread is not started, and the snapshots are
+only refreshed by calling :py:meth:`Refresher.refresh_due`.
+
+A fetch raising an exception or returning ``None`` counts as failed:
+the previous snapshot is kept, and the next attempt is delayed
+exponentially, up to ``max_backoff`` seconds.
+"""
+from __future__ import annotations
+
+import logging
+import time
+import typing as t
+from collections.abc import Callable, Iterable
+
+from flask import Flask, current_app
+
+from sipa.utils.background import BackgroundThread
+from sipa.utils.cache import MISSING, CacheBackend
+
+logger = logging.getLogger(__name__)
+
+#: How long a lease on a feed is kept at most, in case a worker dies
+#: while fetching it
+LEASE_TTL = 60
+
+
+class Snapshot(t.NamedTuple):
+    value: t.Any
+    #: When ``value`` was fetched, ``None`` if no fetch succeeded yet
+    fetched: float | None
+    next_refresh: float
+    failures: int = 0
+
+
+class BackgroundFeed[R]:
+    """A function whose result is refreshed every ``interval`` seconds
+
+    Calling the feed returns the last good result, or ``default()`` if
+    there is none younger than ``max_age`` seconds.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[], R | None], interval: float,
+                 default: Callable[[], R], max_age: float, retry_delay: float = 30,
+                 max_backoff: float = 3600):
+        self.name = name
+        self.fetch = fetch
+        self.interval = interval
+        self.default = default
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self.max_backoff = max_backoff
+
+    @property
+    def key(self) -> str:
+        return f"refresher:{self.name}"
+
+    @property
+    def lease_key(self) -> str:
+        return f"refresher:lease:{self.name}"
+
+    def snapshot(self, backend: CacheBackend) -> Snapshot | None:
+        if (snapshot := backend.get(self.key)) is MISSING:
+            return None
+        return snapshot
+
+    def due(self, snapshot: Snapshot | None) -> bool:
+        return snapshot is None or time.time() >= snapshot.next_refresh
+
+    def refresh(self, backend: CacheBackend) -> Snapshot:
+        """Fetch the value and store the new snapshot"""
+        previous = self.snapshot(backend)
+        try:
+            value = self.fetch()
+        except Exception:
+            logger.exception("Could not refresh %s", self.name)
+            value = None
+
+        now = time.time()
+        if value is not None:
+            snapshot = Snapshot(value, now, now + self.interval)
+        else:
+            failures = previous.failures + 1 if previous else 1
+            delay = min(self.retry_delay * 2 ** (failures - 1), self.max_backoff)
+            logger.warning("Refreshing %s failed %d times, retrying in %ds",
+                           self.name, failures, delay)
+            snapshot = Snapshot(previous.value if previous else None,
+                                previous.fetched if previous else None,
+                                now + delay, failures)
+        backend.set(self.key, snapshot, max(self.max_age, self.max_backoff))
+        return snapshot
+
+    def __call__(self) -> R:
+        snapshot = self.snapshot(current_app.extensions['cache'])
+        if snapshot is None:
+            # e.g. right after the start, don't wait for the next tick
+            current_app.extensions['refresher'].wake_up()
+
+        if (snapshot is None or snapshot.fetched is None
+                or time.time() - snapshot.fetched > self.max_age):
+            return self.default()
+        return snapshot.value
+
+
+#: Every feed, by name
+FEEDS: dict[str, BackgroundFeed] = {}
+
+
+def background_feed[R](
+    interval: float, default: Callable[[], R], max_age: float | None = None,
+    name: str | None = None,
+) -> Callable[[Callable[[], R | None]], BackgroundFeed[R]]:
+    """Turn a function fetching external data into a
+    :py:class:`BackgroundFeed`
+
+    :param max_age: Defaults to ten times the ``interval``
+    :param name: Defaults to the qualified name of the function
+    """
+    def decorator(func: Callable[[], R | None]) -> BackgroundFeed[R]:
+        feed = BackgroundFeed(
+            name=name or f"{func.__module__}.{func.__qualname__}",
+            fetch=func,
+            interval=interval,
+            default=default,
+            max_age=max_age if max_age is not None else 10 * interval,
+        )
+        FEEDS[feed.name] = feed
+        return feed
+
+    return decorator
+
+
+class Refresher(BackgroundThread):
+    """Refresh the due feeds of an app in a background thread
+
+    :param tick: How often to check for due feeds, in seconds
+    """
+
+    def __init__(self, app: Flask, feeds: Iterable[BackgroundFeed], tick: float = 10):
+        super().__init__("refresher", self.refresh_due, interval=tick)
+        self.app = app
+        self.feeds = list(feeds)
+
+    def refresh_due(self) -> int:
+        """Refresh every due feed, returning how many were refreshed"""
+        refreshed = 0
+        with self.app.app_context():
+            backend = self.app.extensions['cache']
+            for feed in self.feeds:
+                if not feed.due(feed.snapshot(backend)):
+                    continue
+                if not backend.add(feed.lease_key, True, LEASE_TTL):
+                    # another worker is fetching it
+                    continue
+                try:
+                    # it may have been refreshed before we got the lease
+                    if feed.due(feed.snapshot(backend)):
+                        feed.refresh(backend)
+                        refreshed += 1
+                finally:
+                    backend.delete(feed.lease_key)
+        return refreshed
+
+
+def init_refresher(app: Flask) -> None:
+    """Refresh the :py:data:`FEEDS` in the background, unless
+    ``BACKGROUND_REFRESH`` is disabled
+    """
+    refresher = Refresher(app, FEEDS.values(), tick=app.config['BACKGROUND_REFRESH_TICK'])
+    app.extensions['refresher'] = refresher
+    if app.config['BACKGROUND_REFRESH']:
+        app.before_request(refresher.ensure_running)
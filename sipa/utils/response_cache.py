@@ -0,0 +1,194 @@
+"""
+Caching whole responses of content pages for anonymous visitors
+
+Views decorated with :py:func:`cache_anonymous_response` are only
+rendered once per path, locale and content commit, as long as the
+visitor is anonymous and nothing about the response depends on the
+session.  Query arguments are ignored, unless the view declares that
+it reads them.  Entries are kept for ``RESPONSE_CACHE_TTL`` seconds;
+a TTL of 0 disables this.  They do not live in the shared
+:py:data:`~sipa.utils.cache.cache`, but in a cache of at most
+``RESPONSE_CACHE_SIZE`` entries private to each worker, so that
+requests for arbitrary pages cannot crowd out the entries everything
+else depends on.
+
+Views decorated with :py:func:`conditional_anonymous_response` send an
+ETag derived from the same information, so that browsers and proxies
+can revalidate instead of fetching the page again.
+
+Both also depend on the revision of sipa itself, see
+:py:func:`app_revision`, so that a deploy changing templates or static
+files does not keep outdated pages alive.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import typing as t
+from collections.abc import Callable, Collection
+from functools import cache as memoize, wraps
+
+from flask import Flask, Response, current_app, g, request, session
+from flask_babel import get_locale
+from flask_login import current_user
+from werkzeug.local import LocalProxy
+
+from sipa.flatpages import request_locale_order
+from sipa.model.misc import should_display_traffic_data
+from sipa.utils.cache import MISSING, CacheBackend, SimpleCache
+
+
+class CachedResponse(t.NamedTuple):
+    data: bytes
+    status: int
+    headers: list[tuple[str, str]]
+
+    @classmethod
+    def from_response(cls, response: Response) -> CachedResponse:
+        return cls(response.get_data(), response.status_code, list(response.headers.items()))
+
+    def to_response(self) -> Response:
+        return current_app.response_class(self.data, self.status, self.headers)
+
+
+def init_response_cache(app: Flask) -> None:
+    app.extensions['response_cache'] = SimpleCache(maxsize=app.config['RESPONSE_CACHE_SIZE'])
+
+
+#: The cache of the current app for rendered responses
+response_cache: CacheBackend = t.cast(
+    CacheBackend, LocalProxy(lambda: current_app.extensions['response_cache'])
+)
+
+
+def _ttl() -> float:
+    return current_app.config.get('RESPONSE_CACHE_TTL', 0)
+
+
+def _anonymous_get() -> bool:
+    return (
+        request.method == 'GET'
+        and current_user.is_anonymous
+        # flashes are shown once, and e.g. `?locale=` is stored in the session
+        and '_flashes' not in session
+        and not session.modified
+    )
+
+
+def _cacheable_response(response: Response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        # nonces must not be reused across responses
+        and not hasattr(g, 'nonce_info')
+        and not session.modified
+    )
+
+
+@memoize
+def _package_fingerprint() -> str:
+    """Identifies the code, templates, translations and static files of
+    the installed ``sipa`` package by their names, sizes and mtimes
+    """
+    root = os.path.dirname(os.path.dirname(__file__))
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        # bytecode is written lazily, and would differ between workers
+        dirnames[:] = sorted(d for d in dirnames if d != '__pycache__')
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, root)}:{stat.st_size}:{stat.st_mtime_ns}\n"
+                          .encode())
+    return digest.hexdigest()[:16]
+
+
+def app_revision() -> str:
+    """The ``APP_REVISION`` if configured, else a fingerprint of the package"""
+    return current_app.config.get('APP_REVISION') or _package_fingerprint()
+
+
+def _variant(query_args: Collection[str]) -> str:
+    """Everything an anonymous response of a content view depends on
+
+    :param query_args: The query arguments the view reads
+    """
+    args = sorted((name, value) for name, value in request.args.items(multi=True)
+                  if name in query_args)
+    return ":".join((
+        app_revision(),
+        current_app.cf_pages.content_version,  # type: ignore
+        request.script_root,
+        request.path,
+        repr(args),
+        str(get_locale()),
+        ",".join(request_locale_order()),
+        str(should_display_traffic_data()),
+    ))
+
+
+def _etag(query_args: Collection[str]) -> str | None:
+    # without a commit, the workers could not agree on the ETag
+    if current_app.cf_pages.commit is None:  # type: ignore
+        return None
+    return hashlib.sha256(_variant(query_args).encode()).hexdigest()
+
+
+class _ViewDecorator(t.Protocol):
+    def __call__[**P](self, view: Callable[P, t.Any], /) -> Callable[P, Response]: ...
+
+
+def cache_anonymous_response(query_args: Collection[str] = ()) -> _ViewDecorator:
+    """Serve the response of the view from the cache for anonymous GETs
+
+    Only successful responses are stored, and only if no CSP nonces
+    were used and the session was not modified while rendering.
+
+    :param query_args: The query arguments the view reads.  Other
+        arguments are ignored, so they are served the same response.
+    """
+    def decorator[**P](view: Callable[P, t.Any]) -> Callable[P, Response]:
+        @wraps(view)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> Response:
+            if not (_ttl() > 0 and _anonymous_get()):
+                return current_app.make_response(view(*args, **kwargs))
+
+            key = f"response:{_variant(query_args)}"
+            if (cached := response_cache.get(key)) is not MISSING:
+                return cached.to_response()
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if _cacheable_response(response):
+                response_cache.set(key, CachedResponse.from_response(response), _ttl())
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_anonymous_response(query_args: Collection[str] = ()) -> _ViewDecorator:
+    """Add an ETag to anonymous responses of the view
+
+    If the request carries a matching ``If-None-Match``, a ``304 Not
+    Modified`` is returned without calling the view.  The ETag changes
+    with the revision of sipa, the content commit, the path, the
+    ``query_args`` and the locales, see :py:func:`_variant`.
+    """
+    def decorator[**P](view: Callable[P, t.Any]) -> Callable[P, Response]:
+        @wraps(view)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> Response:
+            etag = _etag(query_args) if _anonymous_get() else None
+            if etag is not None and request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if etag is not None and _cacheable_response(response):
+                response.set_etag(etag)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,54 @@
+"""
+Coalescing of concurrent identical calls
+"""
+from __future__ import annotations
+
+import threading
+import typing as t
+from collections.abc import Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: t.Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Let concurrent calls with the same key share one execution
+
+    The first thread calling :py:meth:`do` with a key executes the
+    function; every other thread calling :py:meth:`do` with that key
+    before it finishes waits for it and gets the same result (or
+    exception).  Results are not kept afterwards, so this is not a
+    cache.
+
+    As the result is shared between threads, callers must not modify it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do[R](self, key: Hashable, func: Callable[[], R]) -> R:
+        call = _Call()
+        with self._lock:
+            ongoing = self._calls.setdefault(key, call)
+
+        if ongoing is not call:
+            ongoing.done.wait()
+            if ongoing.error is not None:
+                raise ongoing.error
+            return ongoing.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,126 @@
+"""
+Fetching several slow values concurrently, with stale-while-revalidate
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import typing as t
+from collections.abc import Callable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+
+from flask import current_app
+
+from sipa.utils.cache import MISSING, CacheBackend
+from sipa.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class _Stamped(t.NamedTuple):
+    value: t.Any
+    fetched: float
+
+
+class StaleWhileRevalidate:
+    """Serve values from a :py:class:`~sipa.utils.cache.CacheBackend`,
+    refreshing them in the background once they got old
+
+    A value younger than ``fresh_for`` seconds is returned as is.  An
+    older one is still returned for another ``stale_for`` seconds, but a
+    refresh is started in a background thread.  Values which are not
+    cached at all are fetched concurrently, waiting at most ``timeout``
+    seconds for them.
+
+    A fetch returning ``None`` or raising counts as failed, and does not
+    replace a value which is still cached.  If there is none, the
+    failure is cached for ``failure_for`` seconds instead, so that an
+    unavailable service is not asked again on every request.
+    """
+
+    def __init__(self, fresh_for: float, stale_for: float, timeout: float = 2,
+                 max_workers: int = 4, failure_for: float = 10):
+        self.fresh_for = fresh_for
+        self.stale_for = stale_for
+        self.failure_for = failure_for
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self._flight = SingleFlight()
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._pid: int | None = None
+
+    def _submit(self, func: Callable[[], t.Any]) -> Future:
+        with self._lock:
+            # the worker threads of the executor do not survive a fork
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.max_workers,
+                                                    thread_name_prefix="revalidate")
+                self._pid = os.getpid()
+            return self._executor.submit(func)
+
+    def _fetch(self, backend: CacheBackend, key: str, fetch: Callable[[], t.Any]) -> t.Any:
+        try:
+            value = fetch()
+        except Exception:
+            logger.exception("Could not fetch %r", key)
+            value = None
+        if value is not None:
+            backend.set(key, _Stamped(value, time.time()), self.fresh_for + self.stale_for)
+        elif (entry := backend.get(key)) is MISSING or entry.value is None:
+            backend.set(key, _Stamped(None, time.time()), self.failure_for)
+        return value
+
+    def _revalidate(self, backend: CacheBackend, key: str, fetch: Callable[[], t.Any]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(backend, key, fetch)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._submit(refresh)
+
+    def get_many(self, fetchers: Mapping[str, Callable[[], t.Any]],
+                 backend: CacheBackend | None = None) -> dict[str, t.Any]:
+        """Get the value for every key of ``fetchers``
+
+        :param fetchers: Fetches the value of its key if it is missing
+            or stale
+        :param backend: Defaults to the cache of the current app
+        :returns: The values in the order of ``fetchers``, with ``None``
+            for values which could not be fetched in time
+        """
+        if backend is None:
+            backend = current_app.extensions['cache']
+        now = time.time()
+        values: dict[str, t.Any] = {}
+        pending: dict[str, Future] = {}
+
+        for key, fetch in fetchers.items():
+            entry = backend.get(key)
+            if entry is MISSING or (entry.value is None
+                                    and now - entry.fetched >= self.failure_for):
+                pending[key] = self._submit(partial(
+                    self._flight.do, key, partial(self._fetch, backend, key, fetch)
+                ))
+                continue
+            values[key] = entry.value
+            if entry.value is not None and now - entry.fetched >= self.fresh_for:
+                self._revalidate(backend, key, fetch)
+
+        if pending:
+            wait(pending.values(), timeout=self.timeout)
+            for key, future in pending.items():
+                values[key] = future.result() if future.done() else None
+
+        return {key: values[key] for key in fetchers}
@@ -19,7 +19,12 @@ def test_bustimes(client: TestClient):
     assert mock.called
 
 
+def refresh_feeds(client: TestClient):
+    client.application.extensions["refresher"].refresh_due()
+
+
 def test_meetingcal(client: TestClient):
+    refresh_feeds(client)
     with client.renders_template("meetingcal.html"):
         resp = client.assert_ok("features.render_meetingcal")
     assert "Teamsitzung" in resp.data.decode()
@@ -29,5 +34,6 @@ def test_support(client: TestClient):
 
 def test_unable_to_fetch(client: TestClient):
     with patch('sipa.utils.try_fetch_calendar', return_value=None):
+        refresh_feeds(client)
         client.assert_ok("features.support_office")
 
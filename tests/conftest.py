@@ -43,3 +43,13 @@ def bare_app() -> Flask:
 def app() -> Flask:
     """App with `sample` backend"""
     return make_testing_app(DEFAULT_TESTING_CONFIG | {"BACKEND": "sample"})
+
+
+@pytest.fixture
+def frozen_time(time_machine):
+    """Stop the clock (``time.time`` as well as ``time.monotonic``)
+
+    Use ``frozen_time.shift(seconds)`` to let time pass.
+    """
+    time_machine.move_to("2024-01-01 00:00:00", tick=False)
+    return time_machine
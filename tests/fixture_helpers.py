@@ -62,5 +62,7 @@ DEFAULT_TESTING_CONFIG = {
     "WTF_CSRF_ENABLED": False,
     "PRESERVE_CONTEXT_ON_EXCEPTION": False,
     "CONTACT_SENDER_MAIL": "test@foo.de",
+    # no fetching of calendars behind the back of the tests
+    "BACKGROUND_REFRESH": False,
     "MEETINGS_ICAL_URL": "https://agdsn.de/cloud/remote.php/dav/public-calendars/bgiQmBstmfzRdMeH?export",
 }
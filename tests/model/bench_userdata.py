@@ -0,0 +1,50 @@
+"""Compare validated and trusted decoding of pycroft user records
+
+Run as ``python -m tests.model.bench_userdata``.
+"""
+import argparse
+import timeit
+from datetime import date, timedelta
+
+from sipa.model.pycroft.schema import decode_histories, decode_user_data
+
+from .conftest import make_user_payload
+
+
+def make_payload(finance_entries: int, traffic_days: int = 7) -> dict:
+    start = date(2015, 1, 1)
+    return make_user_payload(
+        traffic_history=[
+            {"timestamp": f"{start + timedelta(days=i)}T00:00:00",
+             "ingress": 1024 * i, "egress": 512 * i}
+            for i in range(traffic_days)
+        ],
+        finance_history=[
+            {"valid_on": str(start + timedelta(days=30 * i)),
+             "amount": "-5.00" if i % 2 else "5.00",
+             "description": f"Mitgliedsbeitrag {i}"}
+            for i in range(finance_entries)
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'function':>18} {'validated':>12} {'trusted':>12}")
+    for entries in (10, 100, 1000, 5000):
+        payload = make_payload(entries)
+        for func in (decode_user_data, decode_histories):
+            validated, trusted = (
+                timeit.timeit(lambda func=func, payload=payload, trusted=trusted:
+                              func(payload, trusted=trusted), number=args.number)
+                / args.number * 1000
+                for trusted in (False, True)
+            )
+            print(f"{entries:>8} {func.__name__:>18} {validated:>10.3f}ms {trusted:>10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import typing as t
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from sipa.model.pycroft.api import PycroftApi
+from sipa.model.pycroft.cache import UserCache
+from sipa.utils.cache import SimpleCache
+
+from .pycroft_stub import PycroftStub
+
+
+def make_user_payload(id: int = 1, **kwargs) -> dict[str, t.Any]:
+    """A user record as returned by pycroft's ``user/<id>`` endpoint"""
+    return {
+        "id": id,
+        "user_id": f"{id}-0",
+        "login": "test",
+        "name": "Test User",
+        "status": {
+            "member": True,
+            "traffic_exceeded": False,
+            "network_access": True,
+            "account_balanced": True,
+            "violation": False,
+        },
+        "room": "Wu5 00-01",
+        "mail": "test@agdsn.de",
+        "mail_forwarded": False,
+        "mail_confirmed": True,
+        "properties": ["sipa_login", "network_access", "mail", "member"],
+        "traffic_history": [
+            {"timestamp": "2024-01-01T00:00:00", "ingress": 1024, "egress": 2048},
+        ],
+        "interfaces": [{"id": 1, "mac": "aa:bb:cc:dd:ee:ff", "ips": ["141.30.228.39"]}],
+        "finance_balance": "-3.50",
+        "finance_history": [
+            {"valid_on": "2024-01-01", "amount": "-3.50", "description": "Beitrag"},
+        ],
+        "last_finance_update": "2024-01-02",
+        "birthdate": None,
+        "membership_end_date": None,
+        "membership_begin_date": "2020-01-01",
+        "wifi_password": None,
+        "mpsk_clients": [],
+    } | kwargs
+
+
+@pytest.fixture
+def pycroft_api() -> MagicMock:
+    api = MagicMock()
+    api.get_user.side_effect = lambda user_id, **_: (200, make_user_payload(int(user_id)))
+    return api
+
+
+@pytest.fixture
+def pycroft_app(pycroft_api) -> t.Iterator[Flask]:
+    """A bare app providing what :py:class:`sipa.model.pycroft.user.User` needs"""
+    app = Flask("sipa")
+    app.config["DB_HELIOS_IP_MASK"] = "10.0.7.%"
+    app.extensions["pycroft_api"] = pycroft_api
+    app.extensions["pycroft_user_cache"] = UserCache(
+        SimpleCache(maxsize=16), ttl=60, stale_ttl=3600, stale_ip_ttl=600
+    )
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(scope="module")
+def _pycroft_stub_server() -> t.Iterator[PycroftStub]:
+    stub = PycroftStub()
+    stop = stub.serve()
+    yield stub
+    stop()
+
+
+@pytest.fixture
+def pycroft_stub(_pycroft_stub_server) -> PycroftStub:
+    _pycroft_stub_server.reset()
+    return _pycroft_stub_server
+
+
+@pytest.fixture
+def pycroft_stub_app(pycroft_app, pycroft_stub) -> Flask:
+    """Like ``pycroft_app``, but talking to the :py:class:`PycroftStub`"""
+    pycroft_app.extensions["pycroft_api"] = PycroftApi(pycroft_stub.endpoint, "secret")
+    return pycroft_app
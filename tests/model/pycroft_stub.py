@@ -0,0 +1,79 @@
+"""A stand-in for the pycroft API, to be run on a local port"""
+import json
+import threading
+import typing as t
+
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.routing import Map, Rule
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
+
+
+class PycroftStub:
+    """Serves the user lookup endpoints from :py:attr:`users`
+
+    Like pycroft, the lookups only return the comma-separated subset of
+    fields given by the ``fields`` parameter, if present.
+    Every request is recorded in :py:attr:`requests`.
+    """
+
+    url_map = Map([
+        Rule("/api/v0/user/from-ip", endpoint="user_from_ip"),
+        Rule("/api/v0/user/<int:user_id>", endpoint="user"),
+    ])
+
+    def __init__(self):
+        self.users: dict[int, dict[str, t.Any]] = {}
+        self.requests: list[Request] = []
+        self.endpoint: str | None = None
+
+    def reset(self) -> None:
+        self.users.clear()
+        self.requests.clear()
+
+    def add_user(self, payload: dict[str, t.Any]) -> None:
+        self.users[payload["id"]] = payload
+
+    def requested_fields(self) -> list[str | None]:
+        return [r.args.get("fields") for r in self.requests]
+
+    def user(self, request: Request, user_id: int) -> dict[str, t.Any]:
+        try:
+            return self._select_fields(request, self.users[user_id])
+        except KeyError:
+            raise NotFound from None
+
+    def user_from_ip(self, request: Request) -> dict[str, t.Any]:
+        ip = request.args["ip"]
+        for user in self.users.values():
+            if any(ip in interface["ips"] for interface in user["interfaces"]):
+                return self._select_fields(request, user)
+        raise NotFound
+
+    @staticmethod
+    def _select_fields(request: Request, user: dict[str, t.Any]) -> dict[str, t.Any]:
+        if (fields := request.args.get("fields")) is None:
+            return user
+        return {k: v for k, v in user.items() if k in fields.split(",")}
+
+    def __call__(self, environ, start_response):
+        request = Request(environ)
+        self.requests.append(request)
+        adapter = self.url_map.bind_to_environ(environ)
+        try:
+            endpoint, values = adapter.match()
+            body, status = getattr(self, endpoint)(request, **values), 200
+        except HTTPException as e:
+            body, status = {"code": "not_found", "message": e.description}, e.code
+        return Response(json.dumps(body), status=status,
+                        content_type="application/json")(environ, start_response)
+
+    def serve(self) -> t.Callable[[], None]:
+        """Serve on a free local port in a thread, and set :py:attr:`endpoint`
+
+        :return: a function stopping the server
+        """
+        server = make_server("127.0.0.1", 0, self, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{server.port}/api/v0/"
+        return server.shutdown
@@ -7,13 +7,17 @@ from typing import cast
 from unittest import TestCase
 from unittest.mock import MagicMock
 
-from ipaddress import IPv4Network
+from ipaddress import IPv4Address, IPv4Network
 
 import pytest
 from flask import Flask
+from flask_login import AnonymousUserMixin
 
 from sipa.backends import Backends, DataSource, Dormitory, InitContextCallable
-from sipa.backends.datasource import SubnetCollection
+from sipa.backends.datasource import DormitoryIndex, SubnetCollection
+from sipa.model import pycroft
+from sipa.utils.cache import SimpleCache
+from ..base import disable_logs
 
 
 class TestBackendInitializationCase(TestCase):
@@ -75,6 +79,144 @@ class TestBackendInitializationCase(TestCase):
         # TODO: Find an ip not in any dormitory
 
 
+class TestUserFromIp:
+    class User:
+        from_ip = MagicMock()
+        get = MagicMock()
+
+        def __init__(self, uid):
+            self.uid = uid
+
+        is_authenticated = True
+
+        def get_id(self):
+            return self.uid
+
+    @pytest.fixture
+    def user_class(self):
+        self.User.from_ip.reset_mock()
+        self.User.from_ip.side_effect = lambda ip: (
+            self.User("1") if ip == "127.0.0.1" else AnonymousUserMixin()
+        )
+        self.User.get.reset_mock()
+        self.User.get.side_effect = self.User
+        return self.User
+
+    def make_app(self, user_class, **config) -> Flask:
+        app = Flask("sipa")
+        app.config |= {"BACKEND": "foo"} | config
+        app.extensions["cache"] = SimpleCache(maxsize=16)
+        datasource = DataSource(
+            name='foo',
+            user_class=user_class,
+            mail_server="",
+            dormitories=[Dormitory(
+                name="test",
+                display_name="",
+                subnets=SubnetCollection([IPv4Network("127.0.0.0/8")]),
+            )],
+        )
+        Backends([datasource]).init_app(app)
+        app.add_url_rule("/", "index", lambda: "")
+        return app
+
+    def test_memoized_per_request(self, user_class):
+        app = self.make_app(user_class)
+        backends = app.extensions["backends"]
+        for _ in range(2):
+            with app.test_request_context("/"):
+                app.preprocess_request()
+                assert backends.user_from_ip("127.0.0.1").uid == "1"
+                assert backends.user_from_ip("127.0.0.1").uid == "1"
+        assert user_class.from_ip.call_count == 2
+
+    def test_memo_reset_in_shared_app_context(self, user_class):
+        app = self.make_app(user_class)
+        backends = app.extensions["backends"]
+        with app.app_context():
+            for _ in range(2):
+                with app.test_request_context("/"):
+                    app.preprocess_request()
+                    backends.user_from_ip("127.0.0.1")
+        assert user_class.from_ip.call_count == 2
+
+    def test_ip_outside_dormitories_not_looked_up(self, user_class):
+        app = self.make_app(user_class)
+        with app.test_request_context("/"):
+            user = app.extensions["backends"].user_from_ip("10.0.0.1")
+        assert not user.is_authenticated
+        assert not user_class.from_ip.called
+
+    def test_cached_across_requests(self, user_class):
+        app = self.make_app(user_class, USER_FROM_IP_CACHE_TTL=60)
+        backends = app.extensions["backends"]
+        for _ in range(3):
+            with app.test_request_context("/"):
+                app.preprocess_request()
+                assert backends.user_from_ip("127.0.0.1").uid == "1"
+                assert not backends.user_from_ip("127.0.0.2").is_authenticated
+        # one lookup each, including the negative one
+        assert user_class.from_ip.call_count == 2
+        assert user_class.get.call_count == 2
+
+    def test_failing_cached_user_falls_back_to_ip_lookup(self, user_class):
+        app = self.make_app(user_class, USER_FROM_IP_CACHE_TTL=60)
+        backends = app.extensions["backends"]
+        with app.test_request_context("/"):
+            backends.user_from_ip("127.0.0.1")
+        user_class.get.side_effect = LookupError
+        with app.test_request_context("/"), disable_logs(logging.WARNING):
+            assert backends.user_from_ip("127.0.0.1").uid == "1"
+        assert user_class.from_ip.call_count == 2
+
+
+class TestDormitoryIndex:
+    @pytest.fixture(scope="class")
+    def dormitories(self) -> list[Dormitory]:
+        def dorm(name, *subnets):
+            return Dormitory(
+                name=name,
+                display_name=name,
+                subnets=SubnetCollection([IPv4Network(s) for s in subnets]),
+            )
+
+        return [
+            dorm("inner", "10.0.1.0/24"),
+            dorm("outer", "10.0.0.0/16", "192.168.0.0/24"),
+            dorm("adjacent", "10.1.0.0/16"),
+            dorm("shadowed", "10.0.1.128/25"),
+        ]
+
+    @pytest.fixture(scope="class")
+    def index(self, dormitories) -> DormitoryIndex:
+        return DormitoryIndex(dormitories)
+
+    @staticmethod
+    def naive_lookup(dormitories, ip):
+        return next((d for d in dormitories if IPv4Address(ip) in d.subnets), None)
+
+    @pytest.mark.parametrize("ip", [
+        "9.255.255.255", "10.0.0.0", "10.0.0.255", "10.0.1.0", "10.0.1.200",
+        "10.0.2.0", "10.0.255.255", "10.1.0.0", "10.1.255.255", "10.2.0.0",
+        "192.168.0.17", "192.168.1.0", "255.255.255.255", "0.0.0.0",
+    ])
+    def test_lookup_matches_first_dormitory(self, index, dormitories, ip):
+        assert index.lookup(ip) == self.naive_lookup(dormitories, ip)
+
+    @pytest.mark.parametrize("ip", ["", "foo", "::1", "10.0.0", "010.0.0.1", "10.0.0.1\0"])
+    def test_invalid_ip(self, index, ip):
+        assert index.lookup(ip) is None
+
+    def test_pycroft_dormitories(self):
+        dormitories = pycroft.datasource.dormitories
+        index = DormitoryIndex(dormitories)
+        for dorm in dormitories:
+            for subnet in dorm.subnets.subnets:
+                for ip in (subnet.network_address, subnet.broadcast_address,
+                           subnet.network_address - 1, subnet.broadcast_address + 1):
+                    assert index.lookup(str(ip)) == self.naive_lookup(dormitories, ip)
+
+
 class TestDataSource:
     @pytest.fixture(scope="class")
     def app(self):
@@ -0,0 +1,180 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+from requests import ReadTimeout, Response
+from requests.exceptions import ChunkedEncodingError
+
+from sipa.backends.exceptions import InvalidConfiguration
+from sipa.model.pycroft.api import PycroftApi
+from sipa.model.pycroft.exc import PycroftBackendError
+from sipa.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+ENDPOINT = "http://pycroft.invalid/api/v0/"
+
+
+def json_response(status: int, body: bytes = b"{}") -> Response:
+    response = Response()
+    response.status_code = status
+    response._content = body
+    return response
+
+
+@pytest.fixture
+def api() -> PycroftApi:
+    api = PycroftApi(ENDPOINT, "secret", timeout=(1, 3), pool_size=4)
+    api._adapter.send = MagicMock(return_value=json_response(200, b'{"id": 1}'))
+    return api
+
+
+def test_endpoint_must_end_with_slash():
+    with pytest.raises(InvalidConfiguration):
+        PycroftApi(ENDPOINT.rstrip("/"), "secret")
+
+
+def test_pool_size_applied(api):
+    assert api._adapter._pool_maxsize == 4
+
+
+@pytest.mark.parametrize("method, args", [
+    ("get_user", ("1",)),
+    ("authenticate", ("test", "password")),
+    ("continue_membership", (1,)),
+    ("reset_wifi_password", (1,)),
+])
+def test_timeout_passed(api, method, args):
+    assert getattr(api, method)(*args) == (200, {"id": 1})
+    assert api._adapter.send.call_args.kwargs["timeout"] == (1, 3)
+
+
+def test_api_key_sent(api):
+    api.get_user("1")
+    [prepared_request] = api._adapter.send.call_args.args
+    assert prepared_request.headers["Authorization"] == "ApiKey secret"
+
+
+def test_timeout_raises_backend_error(api):
+    api._adapter.send.side_effect = ReadTimeout
+    with pytest.raises(PycroftBackendError, match="timed out"):
+        api.get_user("1")
+
+
+def test_sessions_per_thread_share_pool(api):
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(api.session))
+    thread.start()
+    thread.join()
+    [other_session] = sessions
+
+    assert api.session is api.session
+    assert api.session is not other_session
+    assert api.session.get_adapter(ENDPOINT) is other_session.get_adapter(ENDPOINT)
+
+
+def test_concurrent_gets_coalesced(api):
+    def send(*_args, **_kwargs):
+        # give the other threads time to join the in-flight request
+        threading.Event().wait(0.2)
+        return json_response(200, b'{"id": 1}')
+    api._adapter.send.side_effect = send
+
+    started = threading.Barrier(3)
+    results = []
+
+    def target():
+        started.wait()
+        results.append(api.get_user("1"))
+
+    threads = [threading.Thread(target=target) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [(200, {"id": 1})] * 3
+    assert api._adapter.send.call_count == 1
+    # the results are shared, not cached
+    api.get_user("1")
+    assert api._adapter.send.call_count == 2
+
+
+def test_resend_confirm_email_not_coalesced(api):
+    api._single_flight = MagicMock()
+    assert api.resend_confirm_email(1)
+    api._single_flight.do.assert_not_called()
+    api._adapter.send.assert_called_once()
+
+
+def test_authenticate_posts_credentials_only(api):
+    api.authenticate("test", "password")
+    [request] = api._adapter.send.call_args.args
+    assert request.body == "login=test&password=password"
+
+
+def test_posts_not_coalesced(api):
+    api.authenticate("test", "password")
+    api.authenticate("test", "password")
+    assert api._adapter.send.call_count == 2
+
+
+class TestCircuitBreaker:
+    @pytest.fixture
+    def api(self, api) -> PycroftApi:
+        api.circuit_breaker = CircuitBreaker("pycroft", window=2, min_calls=2)
+        return api
+
+    def test_opens_on_server_errors(self, api):
+        api._adapter.send.return_value = json_response(502)
+        for _ in range(2):
+            with pytest.raises(PycroftBackendError, match="status 502"):
+                api.get_user("1")
+        assert api.circuit_breaker.state is CircuitState.OPEN
+
+    def test_open_circuit_fails_fast(self, api):
+        api._adapter.send.side_effect = ReadTimeout
+        for _ in range(2):
+            with pytest.raises(PycroftBackendError):
+                api.get_user("1")
+        api._adapter.send.reset_mock()
+
+        with pytest.raises(PycroftBackendError, match="circuit open"):
+            api.change_password(1, "old", "new")
+        api._adapter.send.assert_not_called()
+
+    def test_failed_probe_reopens_circuit(self, api, frozen_time):
+        api._adapter.send.side_effect = ReadTimeout
+        for _ in range(2):
+            with pytest.raises(PycroftBackendError):
+                api.get_user("1")
+
+        frozen_time.shift(api.circuit_breaker.reset_timeout)
+        api._adapter.send.side_effect = ChunkedEncodingError
+        with pytest.raises(PycroftBackendError, match="call failed"):
+            api.get_user("1")
+        assert api.circuit_breaker.state is CircuitState.OPEN
+
+        frozen_time.shift(api.circuit_breaker.reset_timeout)
+        api._adapter.send.side_effect = None
+        api._adapter.send.return_value = json_response(200)
+        api.get_user("1")
+        assert api.circuit_breaker.state is CircuitState.CLOSED
+
+    def test_invalid_json_counts_as_failure(self, api):
+        api._adapter.send.return_value = json_response(200, b"<html>")
+        for _ in range(2):
+            with pytest.raises(PycroftBackendError, match="invalid JSON"):
+                api.get_user("1")
+        assert api.circuit_breaker.state is CircuitState.OPEN
+
+    def test_redirect_counts_as_success_only(self, api):
+        api.circuit_breaker = MagicMock(spec=CircuitBreaker)
+        api._adapter.send.return_value = json_response(302)
+        assert api.get_user("1") == (302, {})
+        api.circuit_breaker.record_failure.assert_not_called()
+        api.circuit_breaker.record_success.assert_called_once()
+
+    def test_client_errors_count_as_success(self, api):
+        api._adapter.send.return_value = json_response(404)
+        for _ in range(3):
+            assert api.get_user("1") == (404, {})
+        assert api.circuit_breaker.state is CircuitState.CLOSED
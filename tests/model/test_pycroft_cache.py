@@ -0,0 +1,164 @@
+import pytest
+
+from sipa.model.pycroft.cache import UserCache
+from sipa.model.pycroft.exc import PycroftBackendError
+from sipa.model.pycroft.schema import UserData
+from sipa.model.pycroft.user import User
+from sipa.utils.cache import SimpleCache
+
+from .conftest import make_user_payload
+
+
+@pytest.fixture
+def user_data() -> UserData:
+    return UserData.model_validate(make_user_payload(id=42))
+
+
+class TestUserCache:
+    def test_roundtrip(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=60)
+        cache.set(user_data)
+        assert cache.get(42) == user_data
+        assert cache.get("42") == user_data
+
+    def test_get_returns_copy(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=60)
+        cache.set(user_data)
+        cache.get(42).mail = "other@agdsn.de"
+        assert cache.get(42).mail == user_data.mail
+
+    def test_set_stores_copy(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=60, stale_ttl=3600)
+        cache.set(user_data)
+        user_data.mail = "other@agdsn.de"
+        user_data.interfaces[0].ips.append("141.30.228.40")
+        assert cache.get(42).mail != "other@agdsn.de"
+        assert cache.get_stale(42).interfaces[0].ips != user_data.interfaces[0].ips
+
+    def test_invalidate(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=60)
+        cache.set(user_data)
+        cache.invalidate(42)
+        assert cache.get(42) is None
+
+    def test_expiry(self, user_data, time_machine):
+        time_machine.move_to("2024-01-01 00:00:00", tick=False)
+        cache = UserCache(SimpleCache(maxsize=4), ttl=60)
+        cache.set(user_data)
+        time_machine.move_to("2024-01-01 00:01:01", tick=False)
+        assert cache.get(42) is None
+
+    def test_disabled(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=0)
+        assert not cache.enabled
+        cache.set(user_data)
+        assert cache.get(42) is None
+
+    def test_stale_survives_invalidation(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=60, stale_ttl=3600)
+        cache.set(user_data)
+        cache.invalidate(42)
+        assert cache.get_stale(42) == user_data
+
+    def test_stale_from_ip(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=0, stale_ttl=3600, stale_ip_ttl=600)
+        cache.set_from_ip("141.30.228.39", user_data)
+        assert cache.get(42) is None
+        assert cache.get_stale_from_ip("141.30.228.39") == user_data
+        assert cache.get_stale_from_ip("141.30.228.40") is None
+
+    def test_stale_ip_expires_before_user(self, user_data, frozen_time):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=0, stale_ttl=3600, stale_ip_ttl=600)
+        cache.set_from_ip("141.30.228.39", user_data)
+        frozen_time.shift(601)
+        assert cache.get_stale_from_ip("141.30.228.39") is None
+        assert cache.get_stale(42) == user_data
+
+    def test_forget_ip(self, user_data):
+        cache = UserCache(SimpleCache(maxsize=4), ttl=0, stale_ttl=3600, stale_ip_ttl=600)
+        cache.set_from_ip("141.30.228.39", user_data)
+        cache.forget_ip("141.30.228.39")
+        assert cache.get_stale_from_ip("141.30.228.39") is None
+
+
+@pytest.mark.usefixtures("pycroft_app")
+class TestUserGetCached:
+    def test_second_get_served_from_cache(self, pycroft_api):
+        assert User.get("1").user_data.id == 1
+        assert User.get("1").user_data.id == 1
+        assert pycroft_api.get_user.call_count == 1
+
+    def test_mutation_invalidates(self, pycroft_api):
+        pycroft_api.change_mail.return_value = (200, None)
+        user = User.get("1")
+        user.change_mail("password", "new@agdsn.de", False)
+        User.get("1")
+        assert pycroft_api.get_user.call_count == 2
+
+    def test_failing_mutation_invalidates(self, pycroft_api):
+        pycroft_api.change_mac.side_effect = RuntimeError
+        user = User.get("1")
+        with pytest.raises(RuntimeError):
+            user.change_mac_address("aa:bb:cc:dd:ee:00", "host", "password")
+        User.get("1")
+        assert pycroft_api.get_user.call_count == 2
+
+    def test_authenticate_refetches(self, pycroft_api):
+        pycroft_api.authenticate.return_value = (200, {"id": 1})
+        User.get("1")
+        User.authenticate("test", "password")
+        assert pycroft_api.get_user.call_count == 2
+
+    def test_authenticate_uses_returned_user(self, pycroft_api):
+        pycroft_api.authenticate.return_value = (200, make_user_payload(id=1))
+        user = User.authenticate("test", "password")
+        assert user.user_data.id == 1
+        # …and the `load_user` of the next request is free as well
+        User.get("1")
+        pycroft_api.get_user.assert_not_called()
+
+    def test_authenticate_replaces_cached_user(self, pycroft_api):
+        User.get("1")
+        pycroft_api.authenticate.return_value = (200, make_user_payload(id=1, mail="new@agdsn.de"))
+        User.authenticate("test", "password")
+        assert User.get("1").user_data.mail == "new@agdsn.de"
+
+
+@pytest.mark.usefixtures("pycroft_app")
+class TestStaleFallback:
+    def test_get_falls_back_to_stale(self, pycroft_api):
+        assert not User.get("1").stale
+        pycroft_api.get_user.side_effect = PycroftBackendError
+        pycroft_api.change_mail.return_value = (200, None)
+        # drop the fresh entry, keeping the stale one
+        User.get("1").change_mail("password", "new@agdsn.de", False)
+
+        user = User.get("1")
+        assert user.stale
+        assert user.user_data.id == 1
+
+    def test_get_without_stale_data_raises(self, pycroft_api):
+        pycroft_api.get_user.side_effect = PycroftBackendError
+        with pytest.raises(PycroftBackendError):
+            User.get("1")
+
+    def test_from_ip_falls_back_to_stale(self, pycroft_api):
+        pycroft_api.get_user_from_ip.return_value = (200, make_user_payload(id=3))
+        assert not User.from_ip("141.30.228.39").stale
+
+        pycroft_api.get_user_from_ip.side_effect = PycroftBackendError
+        user = User.from_ip("141.30.228.39")
+        assert user.stale
+        assert user.user_data.id == 3
+        with pytest.raises(PycroftBackendError):
+            User.from_ip("141.30.228.40")
+
+    def test_no_stale_fallback_once_ip_is_vacant(self, pycroft_api):
+        pycroft_api.get_user_from_ip.return_value = (200, make_user_payload(id=3))
+        User.from_ip("141.30.228.39")
+        pycroft_api.get_user_from_ip.return_value = (404, {})
+        assert not User.from_ip("141.30.228.39").is_authenticated
+
+        pycroft_api.get_user_from_ip.side_effect = PycroftBackendError
+        with pytest.raises(PycroftBackendError):
+            User.from_ip("141.30.228.39")
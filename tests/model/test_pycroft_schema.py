@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+import pytest
+
+from sipa.model.pycroft.schema import (
+    FinanceHistoryEntry,
+    decode_histories,
+    decode_user_data,
+)
+
+from .conftest import make_user_payload
+
+
+@pytest.fixture
+def payload() -> dict:
+    return make_user_payload(finance_history=[
+        {"valid_on": "2024-01-01", "amount": "-3.50", "description": "Beitrag"},
+        {"valid_on": "2024-01-15", "amount": 5, "description": "Zahlung"},
+        {"valid_on": "2024-02-01", "amount": 0.1, "description": "Rundung"},
+    ])
+
+
+def test_trusted_decoding_equivalent(payload):
+    assert decode_user_data(payload, trusted=True) == decode_user_data(payload)
+
+
+def test_trusted_decoding_converts_amounts(payload):
+    history = decode_user_data(payload, trusted=True).finance_history
+    assert [e.amount for e in history] == [Decimal("-3.50"), Decimal(5), Decimal("0.1")]
+    assert all(isinstance(e, FinanceHistoryEntry) for e in history)
+
+
+def test_trusted_decoding_without_histories(payload):
+    del payload["traffic_history"], payload["finance_history"]
+    user_data = decode_user_data(payload, trusted=True)
+    assert user_data.traffic_history is None
+    assert user_data.finance_history is None
+
+
+def test_trusted_histories_equivalent(payload):
+    histories = {k: payload[k] for k in ("traffic_history", "finance_history")}
+    assert decode_histories(histories, trusted=True) == decode_histories(histories)
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+@pytest.mark.parametrize("history", [
+    [{"valid_on": "2024-01-01", "amount": "lots", "description": "Beitrag"}],
+    [{"valid_on": "2024-01-01", "description": "Beitrag"}],
+    [None],
+])
+def test_malformed_history_raises_value_error(payload, trusted, history):
+    payload["finance_history"] = history
+    with pytest.raises(ValueError):
+        decode_user_data(payload, trusted=trusted)
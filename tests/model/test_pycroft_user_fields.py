@@ -0,0 +1,51 @@
+import pytest
+
+from sipa.model.pycroft.schema import BASE_FIELDS, HISTORY_FIELDS
+from sipa.model.pycroft.user import User, user_cache
+
+from .conftest import make_user_payload
+
+pytestmark = pytest.mark.usefixtures("pycroft_stub_app")
+
+BASE = ",".join(BASE_FIELDS)
+HISTORIES = ",".join(HISTORY_FIELDS)
+
+
+@pytest.fixture(autouse=True)
+def user(pycroft_stub):
+    pycroft_stub.add_user(make_user_payload(id=1))
+
+
+def test_get_requests_base_fields(pycroft_stub):
+    user = User.get(1)
+    assert user.login.value == "test"
+    assert user.user_data.traffic_history is None
+    assert pycroft_stub.requested_fields() == [BASE]
+
+
+def test_from_ip_requests_base_fields(pycroft_stub):
+    user = User.from_ip("141.30.228.39")
+    assert user.user_data.id == 1
+    assert pycroft_stub.requested_fields() == [BASE]
+
+
+def test_histories_loaded_on_access(pycroft_stub):
+    user = User.get(1)
+    assert len(user.traffic_history) == 1
+    assert user.finance_information.raw_balance == -3.5
+    assert pycroft_stub.requested_fields() == [BASE, HISTORIES]
+
+
+def test_histories_stored_in_cache(pycroft_stub):
+    assert User.get(1).traffic_history
+    assert user_cache.get(1).finance_history is not None
+    assert User.get(1).traffic_history
+    assert pycroft_stub.requested_fields() == [BASE, HISTORIES]
+
+
+def test_full_response_accepted(pycroft_stub, monkeypatch):
+    """An API ignoring `fields` must not cause another request"""
+    monkeypatch.setattr(pycroft_stub, "_select_fields", lambda _request, user: user)
+    user = User.get(1)
+    assert len(user.traffic_history) == 1
+    assert len(pycroft_stub.requests) == 1
@@ -0,0 +1,30 @@
+import threading
+
+from sipa.utils.background import BackgroundThread
+
+
+def test_runs_once_per_process_and_on_wake_up():
+    calls = threading.Semaphore(0)
+    thread = BackgroundThread("test", calls.release, interval=60)
+    thread.ensure_running()
+    thread.ensure_running()
+    assert calls.acquire(timeout=5)
+    assert not calls.acquire(timeout=0.1)
+
+    thread.wake_up()
+    assert calls.acquire(timeout=5)
+    assert thread.running()
+
+
+def test_keeps_running_after_exception():
+    calls = threading.Semaphore(0)
+
+    def target():
+        calls.release()
+        raise ValueError
+
+    thread = BackgroundThread("test", target, interval=60)
+    thread.ensure_running()
+    assert calls.acquire(timeout=5)
+    thread.wake_up()
+    assert calls.acquire(timeout=5)
@@ -0,0 +1,137 @@
+import pickle
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from sipa.utils.cache import (
+    MISSING,
+    SimpleCache,
+    UwsgiCache,
+    make_cache_backend,
+)
+
+
+class TestSimpleCache:
+    def test_missing(self):
+        assert SimpleCache(maxsize=4).get("foo") is MISSING
+        assert SimpleCache(maxsize=4).get("foo", None) is None
+
+    def test_roundtrip(self):
+        cache = SimpleCache(maxsize=4)
+        cache.set("foo", None, ttl=60)
+        assert cache.get("foo") is None
+
+    def test_per_entry_ttl(self, time_machine):
+        time_machine.move_to("2024-01-01 00:00:00", tick=False)
+        cache = SimpleCache(maxsize=4)
+        cache.set("short", 1, ttl=10)
+        cache.set("long", 2, ttl=100)
+        time_machine.move_to("2024-01-01 00:00:11", tick=False)
+        assert cache.get("short") is MISSING
+        assert cache.get("long") == 2
+
+    def test_add(self, time_machine):
+        time_machine.move_to("2024-01-01 00:00:00", tick=False)
+        cache = SimpleCache(maxsize=4)
+        assert cache.add("foo", 1, ttl=10)
+        assert not cache.add("foo", 2, ttl=10)
+        assert cache.get("foo") == 1
+        time_machine.move_to("2024-01-01 00:00:11", tick=False)
+        assert cache.add("foo", 3, ttl=10)
+        assert cache.get("foo") == 3
+
+    def test_delete_and_clear(self):
+        cache = SimpleCache(maxsize=4)
+        cache.set("foo", 1, ttl=60)
+        cache.set("bar", 2, ttl=60)
+        cache.delete("foo")
+        cache.delete("nonexistent")
+        assert cache.get("foo") is MISSING
+        cache.clear()
+        assert cache.get("bar") is MISSING
+
+
+@pytest.fixture
+def uwsgi_mock():
+    store = {}
+    uwsgi = MagicMock()
+
+    def cache_update(key, value, expires, name):
+        # like uwsgi, storing into a cache which is not configured fails
+        if name != "sipa":
+            return None
+        store[name, key] = value
+        return True
+
+    def cache_set(key, value, expires, name):
+        if (name, key) in store:
+            return None
+        return cache_update(key, value, expires, name)
+
+    uwsgi.cache_get.side_effect = lambda key, name: store.get((name, key))
+    uwsgi.cache_exists.side_effect = lambda key, name: (name, key) in store or None
+    uwsgi.cache_update.side_effect = cache_update
+    uwsgi.cache_set.side_effect = cache_set
+    uwsgi.cache_del.side_effect = lambda key, name: store.pop((name, key), None)
+    with patch.dict(sys.modules, {"uwsgi": uwsgi}):
+        yield uwsgi
+
+
+class TestUwsgiCache:
+    def test_values_pickled(self, uwsgi_mock):
+        cache = UwsgiCache(name="sipa")
+        cache.set("foo", {"a": [1, 2]}, ttl=0.5)
+        key, raw, expires, name = uwsgi_mock.cache_update.call_args.args
+        assert (key, expires, name) == ("foo", 1, "sipa")
+        assert pickle.loads(raw) == {"a": [1, 2]}
+        assert cache.get("foo") == {"a": [1, 2]}
+
+    def test_missing(self, uwsgi_mock):
+        assert UwsgiCache(name="sipa").get("foo") is MISSING
+
+    def test_add(self, uwsgi_mock):
+        cache = UwsgiCache(name="sipa")
+        assert cache.add("foo", 1, ttl=10)
+        assert not cache.add("foo", 2, ttl=10)
+        assert cache.get("foo") == 1
+
+    def test_make_backend(self, uwsgi_mock):
+        backend = make_cache_backend({"CACHE_BACKEND": "uwsgi", "CACHE_UWSGI_NAME": "sipa"})
+        assert isinstance(backend, UwsgiCache)
+
+
+def test_uwsgi_backend_falls_back_without_uwsgi():
+    with patch.dict(sys.modules, {"uwsgi": None}):
+        backend = make_cache_backend(
+            {"CACHE_BACKEND": "uwsgi", "CACHE_UWSGI_NAME": "sipa", "CACHE_SIMPLE_SIZE": 4}
+        )
+    assert isinstance(backend, SimpleCache)
+
+
+def test_auto_backend_uses_uwsgi(uwsgi_mock):
+    backend = make_cache_backend(
+        {"CACHE_BACKEND": "auto", "CACHE_UWSGI_NAME": "sipa", "CACHE_SIMPLE_SIZE": 4}
+    )
+    assert isinstance(backend, UwsgiCache)
+
+
+def test_auto_backend_without_uwsgi_cache(uwsgi_mock):
+    backend = make_cache_backend(
+        {"CACHE_BACKEND": "auto", "CACHE_UWSGI_NAME": "other", "CACHE_SIMPLE_SIZE": 4}
+    )
+    assert isinstance(backend, SimpleCache)
+
+
+def test_auto_backend_without_uwsgi():
+    with patch.dict(sys.modules, {"uwsgi": None}):
+        backend = make_cache_backend(
+            {"CACHE_BACKEND": "auto", "CACHE_UWSGI_NAME": "sipa", "CACHE_SIMPLE_SIZE": 4}
+        )
+    assert isinstance(backend, SimpleCache)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_cache_backend({"CACHE_BACKEND": "memcached"})
+
@@ -0,0 +1,65 @@
+import pytest
+
+from sipa.utils.circuit_breaker import CircuitBreaker, CircuitState
+
+
+@pytest.fixture
+def breaker(frozen_time) -> CircuitBreaker:
+    return CircuitBreaker("test", failure_rate=0.5, window=4, min_calls=2,
+                          reset_timeout=10)
+
+
+def test_opens_on_failure_rate(breaker):
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+    assert not breaker.allow()
+
+
+def test_stays_closed_below_min_calls(breaker):
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.allow()
+
+
+def test_window_forgets_old_failures(breaker):
+    breaker.record_failure()
+    for _ in range(4):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_half_open_allows_single_probe(breaker, frozen_time):
+    breaker.record_failure()
+    breaker.record_failure()
+    frozen_time.shift(10)
+    assert breaker.allow()
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_successful_probe_closes(breaker, frozen_time):
+    breaker.record_failure()
+    breaker.record_failure()
+    frozen_time.shift(10)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+    # the failures before opening are forgotten
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+
+
+def test_failed_probe_reopens(breaker, frozen_time):
+    breaker.record_failure()
+    breaker.record_failure()
+    frozen_time.shift(10)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+    frozen_time.shift(9)
+    assert not breaker.allow()
+    frozen_time.shift(1)
+    assert breaker.allow()
@@ -0,0 +1,654 @@
+import os
+import sys
+import typing as t
+from dataclasses import replace
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import git
+import pytest
+from flask import Flask, g, render_template
+from flask_flatpages import FlatPages
+
+import sipa.search
+from sipa.flatpages import CategorizedFlatPages, Navigation, content_locale_order
+from sipa.utils.cache import MISSING, SimpleCache
+from sipa.utils.content_bundle import bundle_path, load_bundle
+from sipa.utils.csp import NonceInfo
+from sipa.utils.link_patch import SCRIPT_ROOT_PLACEHOLDER, resolve_script_root
+
+from .fixture_helpers import make_testing_app, DEFAULT_TESTING_CONFIG
+
+PAGES = {
+    "about/index.de.md": "title: Über uns\nrank: 1\n\nWir sind die AG DSN.",
+    "about/contact.de.md": "title: Kontakt\n\nSchreib uns! [Impressum](/pages/about/imprint)",
+    "about/contact.en.md": "title: Contact\n\nWrite to us!",
+    "news/first.de.md": "title: Erste News\ndate: 2024-01-01\n\nHallo.",
+}
+
+
+def commit_pages(repo: git.Repo, pages: dict[str, str | None], message: str = "update") -> str:
+    """Write (or, for ``None``, delete) pages and commit them"""
+    root = Path(repo.working_tree_dir)
+    for path, content in pages.items():
+        if content is None:
+            repo.index.remove([path], working_tree=True)
+            continue
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text(content)
+        repo.index.add([path])
+    return repo.index.commit(message).hexsha
+
+
+@pytest.fixture
+def content_repo(tmp_path) -> git.Repo:
+    repo = git.Repo.init(tmp_path / "content")
+    commit_pages(repo, PAGES, "initial commit")
+    return repo
+
+
+@pytest.fixture
+def bundle_dir(tmp_path) -> str:
+    return str(tmp_path / "bundles")
+
+
+@pytest.fixture
+def make_app(content_repo, bundle_dir) -> t.Callable[[], Flask]:
+    def make_app():
+        return make_testing_app(DEFAULT_TESTING_CONFIG | {
+            "FLATPAGES_ROOT": content_repo.working_tree_dir,
+            "CONTENT_BUNDLE_DIR": bundle_dir,
+        })
+    return make_app
+
+
+def cf_pages(app: Flask) -> CategorizedFlatPages:
+    return app.cf_pages  # type: ignore
+
+
+class TestContentBundle:
+    def test_bundle_written(self, make_app, content_repo, bundle_dir):
+        app = make_app()
+        assert cf_pages(app).commit == content_repo.head.commit.hexsha
+        assert os.path.isfile(bundle_path(bundle_dir, cf_pages(app).commit))
+
+    def test_pages_loaded_from_bundle(self, make_app, monkeypatch):
+        make_app()
+        monkeypatch.setattr(FlatPages, "_load_file", pytest.fail)
+        app = make_app()
+
+        with app.test_request_context():
+            app.preprocess_request()
+            article = cf_pages(app).get("about", "contact")
+            assert article.title == "Kontakt"
+            assert article.localized_pages["en"].body == "Write to us!"
+            assert "Schreib uns!" in article.html
+            assert cf_pages(app).get_category("about").rank == 1
+
+    def test_bundle_contains_html(self, make_app, bundle_dir):
+        app = make_app()
+        bundle = load_bundle(bundle_dir, cf_pages(app).commit)
+        [record] = [r for r in bundle.pages if r.path == "about/contact.de"]
+        assert "Schreib uns!" in record.html
+
+    def test_no_bundle_without_git(self, tmp_path, bundle_dir):
+        root = tmp_path / "plain"
+        root.mkdir()
+        (root / "page.de.md").write_text("title: Seite\n\nText")
+        app = make_testing_app(DEFAULT_TESTING_CONFIG | {
+            "FLATPAGES_ROOT": str(root),
+            "CONTENT_BUNDLE_DIR": bundle_dir,
+        })
+        assert cf_pages(app).commit is None
+        assert not os.path.exists(bundle_dir)
+
+    def test_build_command(self, make_app, bundle_dir):
+        app = make_app()
+        path = bundle_path(bundle_dir, cf_pages(app).commit)
+        os.unlink(path)
+        result = app.test_cli_runner().invoke(args=["build-content-bundle"])
+        assert result.exit_code == 0, result.output
+        assert os.path.isfile(path)
+
+
+def wait_for_background_reload(cf: CategorizedFlatPages):
+    with cf._reload_lock:
+        pass
+
+
+class TestReload:
+    def test_reload_swaps_tree(self, make_app, content_repo):
+        app = make_app()
+        old_root, generation = cf_pages(app).root_category, cf_pages(app).generation
+        new_commit = commit_pages(content_repo, {
+            "about/imprint.de.md": "title: Impressum\n\nText",
+            "news/first.de.md": None,
+        })
+
+        cf_pages(app).reload()
+
+        assert cf_pages(app).commit == new_commit
+        assert cf_pages(app).generation == generation + 1
+        assert cf_pages(app).get("about", "imprint") is not None
+        assert cf_pages(app).get_articles_of_category("news") == []
+        # the old tree is left alone for requests still using it
+        assert "first" in old_root.categories["news"]._articles
+
+    def test_reload_publishes_commit(self, make_app, content_repo):
+        app = make_app()
+        new_commit = commit_pages(content_repo, {"about/imprint.de.md": "title: Impressum\n\nText"})
+        cf_pages(app).reload()
+        assert app.extensions["cache"].get(CategorizedFlatPages.COMMIT_CACHE_KEY) == new_commit
+
+    def test_reload_in_background(self, make_app, content_repo):
+        app = make_app()
+        old_content = cf_pages(app)._content
+        new_commit = commit_pages(content_repo, {"about/imprint.de.md": "title: Impressum\n\nText"})
+
+        assert cf_pages(app).reload_in_background()
+        wait_for_background_reload(cf_pages(app))
+
+        content = cf_pages(app)._content
+        assert content is not old_content
+        assert (content.commit, content.generation) == (new_commit, old_content.generation + 1)
+        assert content.root.categories["about"]._articles.keys() >= {"imprint"}
+        # not published, the other workers were told by whoever published it
+        assert app.extensions["cache"].get(CategorizedFlatPages.COMMIT_CACHE_KEY) is MISSING
+
+    def test_no_concurrent_background_reloads(self, make_app):
+        app = make_app()
+        with cf_pages(app)._reload_lock:
+            assert not cf_pages(app).reload_in_background()
+
+    def test_other_worker_reloads_in_background(self, make_app, content_repo):
+        app, other_app = make_app(), make_app()
+        other_app.extensions["cache"] = app.extensions["cache"]
+        new_commit = commit_pages(content_repo, {"about/imprint.de.md": "title: Impressum\n\nText"})
+        cf_pages(app).reload()
+
+        with other_app.test_request_context():
+            other_app.preprocess_request()
+        wait_for_background_reload(cf_pages(other_app))
+
+        assert cf_pages(other_app).commit == new_commit
+        assert cf_pages(other_app).get("about", "imprint") is not None
+
+    def test_unreachable_commit_reloaded_once(self, make_app, monkeypatch):
+        app = make_app()
+        app.extensions["cache"].set(CategorizedFlatPages.COMMIT_CACHE_KEY, "0" * 40, ttl=60)
+        reloads = []
+        monkeypatch.setattr(cf_pages(app), "reload_in_background",
+                            lambda: reloads.append(1) or True)
+        for _ in range(2):
+            with app.test_request_context():
+                app.preprocess_request()
+        assert reloads == [1]
+
+    def test_commit_published_during_reload_not_missed(self, make_app, monkeypatch):
+        app = make_app()
+        app.extensions["cache"].set(CategorizedFlatPages.COMMIT_CACHE_KEY, "0" * 40, ttl=60)
+        started = iter([False, True])
+        reloads = []
+        monkeypatch.setattr(cf_pages(app), "reload_in_background",
+                            lambda: reloads.append(1) or next(started))
+        for _ in range(3):
+            with app.test_request_context():
+                app.preprocess_request()
+        assert reloads == [1, 1]
+
+    def test_reload_all_workers_with_shared_cache(self, make_app, monkeypatch):
+        app = make_app()
+        monkeypatch.setattr(app.extensions["cache"], "shared", True)
+        uwsgi = MagicMock()
+        with patch.dict(sys.modules, {"uwsgi": uwsgi}), \
+                patch.object(cf_pages(app), "reload") as reload:
+            cf_pages(app).reload_all_workers()
+        reload.assert_called_once()
+        uwsgi.reload.assert_not_called()
+
+    def test_reload_all_workers_restarts_uwsgi_without_shared_cache(self, make_app):
+        app = make_app()
+        uwsgi = MagicMock()
+        with patch.dict(sys.modules, {"uwsgi": uwsgi}), \
+                patch.object(cf_pages(app), "reload") as reload:
+            cf_pages(app).reload_all_workers()
+        uwsgi.reload.assert_called_once()
+        reload.assert_not_called()
+
+    def test_reload_all_workers_without_uwsgi(self, make_app):
+        app = make_app()
+        with patch.dict(sys.modules, {"uwsgi": None}), \
+                patch.object(cf_pages(app), "reload") as reload:
+            cf_pages(app).reload_all_workers()
+        reload.assert_called_once()
+
+
+class TestIncrementalReload:
+    @pytest.fixture
+    def loaded_files(self, monkeypatch) -> list[str]:
+        loaded = []
+        load_file = FlatPages._load_file
+
+        def recording_load_file(self, path, filename, rel_path):
+            loaded.append(path)
+            return load_file(self, path, filename, rel_path)
+        monkeypatch.setattr(FlatPages, "_load_file", recording_load_file)
+        return loaded
+
+    def test_only_changed_pages_parsed(self, make_app, content_repo, loaded_files):
+        app = make_app()
+        loaded_files.clear()
+        commit_pages(content_repo, {
+            "about/contact.en.md": "title: Contact us\n\nWrite to us!",
+            "news/first.de.md": None,
+            "news/second.de.md": "title: Zweite News\ndate: 2024-02-01\n\nNochmal hallo.",
+        })
+
+        cf_pages(app).reload()
+
+        assert sorted(loaded_files) == ["about/contact.en", "news/second.de"]
+        contact = cf_pages(app).get("about", "contact")
+        assert contact.localized_pages["en"].meta["title"] == "Contact us"
+        assert contact.localized_pages["de"].meta["title"] == "Kontakt"
+        assert [a.id for a in cf_pages(app).get_articles_of_category("news")] == ["second"]
+
+    def test_case_insensitive_paths(self, make_app, content_repo):
+        app = make_app()
+        app.config["FLATPAGES_CASE_INSENSITIVE"] = True
+        commit_pages(content_repo, {"about/Imprint.de.md": "title: Impressum\n\nText"})
+        cf_pages(app).reload()
+        assert "about/imprint.de" in cf_pages(app)._content.pages
+        assert cf_pages(app).get("about", "imprint") is not None
+
+    def test_unknown_commit_reloads_fully(self, make_app, content_repo, loaded_files):
+        app = make_app()
+        app.config["CONTENT_BUNDLE_DIR"] = None
+        cf_pages(app)._content = replace(cf_pages(app)._content, commit="0" * 40)
+        loaded_files.clear()
+        cf_pages(app).reload()
+        assert len(loaded_files) == len(PAGES)
+
+    def test_bundle_written_for_new_commit(self, make_app, content_repo, bundle_dir):
+        app = make_app()
+        new_commit = commit_pages(content_repo, {"about/imprint.de.md": "title: Impressum\n\nText"})
+        cf_pages(app).reload()
+        assert os.path.isfile(bundle_path(bundle_dir, new_commit))
+
+
+class TestScriptRoot:
+    LINK = 'href="{}/pages/about/imprint"'
+
+    def test_html_independent_of_request(self, make_app):
+        app = make_app()
+        page = cf_pages(app).get("about", "contact").localized_pages["de"]
+        with app.test_request_context("/", base_url="http://localhost.localdomain/sipa/"):
+            assert self.LINK.format(SCRIPT_ROOT_PLACEHOLDER) in page.html
+
+    @pytest.mark.parametrize("script_root, prefix", [("", ""), ("/sipa/", "/sipa")])
+    def test_resolve(self, script_root, prefix):
+        html = self.LINK.format(SCRIPT_ROOT_PLACEHOLDER)
+        assert resolve_script_root(html, script_root) == self.LINK.format(prefix)
+
+    def test_resolved_in_response(self, make_app):
+        app = make_app()
+        response = app.test_client().get(
+            "/pages/about/contact", base_url="http://localhost.localdomain/sipa/"
+        )
+        html = response.get_data(as_text=True)
+        assert self.LINK.format("/sipa") in html
+        assert SCRIPT_ROOT_PLACEHOLDER not in html
+
+
+class TestNewsIndex:
+    @pytest.fixture
+    def app(self, make_app, content_repo) -> Flask:
+        commit_pages(content_repo, {
+            "news/second.de.md": "title: Zweite News\ndate: 2024-02-01\n\nNochmal hallo.",
+            "news/second.en.md": "title: Second news\ndate: 2024-02-01\n\nHello again.",
+            "news/undated.de.md": "title: Ohne Datum\n\nIrgendwann.",
+        })
+        return make_app()
+
+    @pytest.mark.parametrize("preferred, order", [
+        (("de", "en"), ("de", "en")),
+        (("en-US", "en", "de-DE"), ("en", "de")),
+        (("fr",), ()),
+    ])
+    def test_content_locale_order(self, preferred, order):
+        assert content_locale_order(preferred) == order
+
+    def test_articles_sorted_by_date(self, app):
+        index = cf_pages(app).news_index(("de", "en"))
+        assert [a.id for a in index.articles] == ["second", "first"]
+
+    @pytest.mark.parametrize("locale_order, title", [
+        (("de", "en"), "Zweite News"),
+        (("en", "de"), "Second news"),
+        (("en",), "Second news"),
+    ])
+    def test_by_basename(self, app, locale_order, title):
+        index = cf_pages(app).news_index(locale_order)
+        assert index.by_basename.keys() == {"first", "second", "undated"}
+        assert index.by_basename["second"].page_for(locale_order).meta["title"] == title
+
+    def test_rebuilt_on_reload(self, app, content_repo):
+        commit_pages(content_repo, {"news/first.de.md": None})
+        cf_pages(app).reload()
+        index = cf_pages(app).news_index(("de",))
+        assert [a.id for a in index.articles] == ["second"]
+        assert "first" not in index.by_basename
+
+    def test_show_news(self, app):
+        client = app.test_client()
+        assert client.get("/news/second").status_code == 200
+        assert client.get("/news/missing").status_code == 404
+
+    def test_edit_news(self, app):
+        client = app.test_client()
+        assert "Zweite News" in client.get("/news/second/edit").get_data(as_text=True)
+        assert client.get("/news/edit").status_code == 200
+
+
+class TestLocalizedPage:
+    @pytest.mark.parametrize("accept_language, title", [("de", "Kontakt"), ("en", "Contact")])
+    def test_negotiated(self, make_app, accept_language, title):
+        app = make_app()
+        with app.test_request_context(headers={"Accept-Language": accept_language}):
+            app.preprocess_request()
+            assert cf_pages(app).get("about", "contact").title == title
+
+    def test_locale_order_computed_once_per_request(self, make_app, monkeypatch):
+        app = make_app()
+        calls = []
+        monkeypatch.setattr("sipa.flatpages.content_locale_order",
+                            lambda preferred: calls.append(preferred) or ("en",))
+        article = cf_pages(app).get("about", "contact")
+        with app.app_context():
+            for _ in range(2):
+                with app.test_request_context():
+                    app.preprocess_request()
+                    assert (article.title, article.rank, article.title) == ("Contact", 100, "Contact")
+        assert len(calls) == 2
+
+
+class TestNavigation:
+    @pytest.fixture
+    def app(self, make_app, content_repo) -> Flask:
+        commit_pages(content_repo, {
+            "about/index.de.md": "title: Über uns\nname: Über uns\nindex: true\nrank: 2\n\n",
+            "about/index.en.md": "title: About us\nname: About us\nindex: true\nrank: 2\n\n",
+            "about/contact.de.md": "title: Kontakt\nrank: 2\nicon: bi-envelope\n\nSchreib uns!",
+            "about/imprint.de.md": "title: Impressum\nrank: 1\n\nText",
+            "about/secret.de.md": "title: Geheim\nhidden: true\n\nPst.",
+            "legal/index.de.md": "title: Rechtliches\nname: Rechtliches\nindex: true\nrank: 1\n\n",
+            "unlisted/index.de.md": "title: Versteckt\nname: Versteckt\n\n",
+        })
+        app = make_app()
+        app.jinja_env.auto_reload = False
+        return app
+
+    def test_model(self, app):
+        navigation = cf_pages(app).navigation(("en", "de"))
+        assert [(c.id, c.name) for c in navigation.categories] \
+            == [("legal", "Rechtliches"), ("about", "About us")]
+        [_, about] = navigation.categories
+        assert [(a.id, a.title, a.icon) for a in about.articles] == [
+            ("imprint", "Impressum", None),
+            ("contact", "Contact", None),
+        ]
+
+    def test_rendered_once(self, app, monkeypatch):
+        client = app.test_client()
+        html = client.get("/news/").get_data(as_text=True)
+        assert 'href="/pages/about/imprint"' in html
+
+        monkeypatch.setattr(Navigation, "_render", pytest.fail)
+        assert client.get("/news/").get_data(as_text=True) == html
+        # a different script root is rendered separately
+        monkeypatch.undo()
+        html = client.get("/news/", base_url="http://localhost.localdomain/sipa/").get_data(as_text=True)
+        assert 'href="/sipa/pages/about/imprint"' in html
+
+    def test_rebuilt_on_reload(self, app, content_repo):
+        commit_pages(content_repo, {"about/imprint.de.md": None})
+        cf_pages(app).reload()
+        [_, about] = cf_pages(app).navigation(("de",)).categories
+        assert [a.id for a in about.articles] == ["contact"]
+
+
+class TestResponseCache:
+    @pytest.fixture
+    def app(self, make_app) -> Flask:
+        app = make_app()
+        app.config["RESPONSE_CACHE_TTL"] = 60
+        return app
+
+    @pytest.fixture
+    def renders(self, monkeypatch) -> list[str]:
+        renders = []
+
+        def recording_render_template(template_name, **context):
+            renders.append(template_name)
+            return render_template(template_name, **context)
+        monkeypatch.setattr("sipa.blueprints.pages.render_template", recording_render_template)
+        return renders
+
+    def test_rendered_once(self, app, renders):
+        client = app.test_client()
+        responses = [client.get("/pages/about/contact") for _ in range(2)]
+        assert renders == ["page.html"]
+        assert responses[0].data == responses[1].data
+        # the CSP is still set on cached responses
+        assert responses[1].content_security_policy.default_src
+
+    def test_disabled_by_default(self, make_app, renders):
+        client = make_app().test_client()
+        for _ in range(2):
+            client.get("/pages/about/contact")
+        assert len(renders) == 2
+
+    def test_keyed_by_locale(self, app, renders):
+        client = app.test_client()
+        for locale in ("de", "en"):
+            client.get("/pages/about/contact", headers={"Accept-Language": locale})
+        assert len(renders) == 2
+
+    def test_unknown_query_args_ignored(self, app, renders):
+        client = app.test_client()
+        for junk in range(2):
+            client.get("/pages/about/contact", query_string={"utm_source": junk})
+        assert renders == ["page.html"]
+
+    def test_keyed_by_query_args_read(self, app, monkeypatch):
+        renders = []
+
+        def recording_render_template(template_name, **context):
+            renders.append(context["articles"])
+            return render_template(template_name, **context)
+        monkeypatch.setattr("sipa.blueprints.news.render_template", recording_render_template)
+
+        client = app.test_client()
+        for query in ({}, {"start": 0, "end": 0}, {}):
+            client.get("/news/", query_string=query)
+        assert len(renders) == 2
+
+    def test_not_in_shared_cache(self, app, monkeypatch):
+        shared = app.extensions["cache"]
+        monkeypatch.setattr(shared, "set", pytest.fail)
+        app.test_client().get("/pages/about/contact")
+
+    def test_bounded(self, make_app, renders):
+        app = make_app()
+        app.config["RESPONSE_CACHE_TTL"] = 60
+        app.extensions["response_cache"] = SimpleCache(maxsize=1)
+        client = app.test_client()
+        for path in ("contact", "index", "contact"):
+            client.get(f"/pages/about/{path}")
+        assert len(renders) == 3
+
+    def test_locale_selection_not_cached(self, app, renders):
+        client = app.test_client()
+        for _ in range(2):
+            client.get("/pages/about/contact?locale=en")
+        assert len(renders) == 2
+
+    def test_invalidated_on_reload(self, app, content_repo):
+        client = app.test_client()
+        client.get("/pages/about/contact")
+        commit_pages(content_repo, {"about/contact.de.md": "title: Kontakt\n\nRuf uns an!"})
+        cf_pages(app).reload()
+        assert "Ruf uns an!" in client.get("/pages/about/contact").get_data(as_text=True)
+
+    def test_not_cached_with_nonces(self, app, renders, monkeypatch):
+        def render_with_nonce(template_name, **context):
+            g.nonce_info = NonceInfo()
+            renders.append(template_name)
+            return render_template(template_name, **context)
+        monkeypatch.setattr("sipa.blueprints.pages.render_template", render_with_nonce)
+
+        client = app.test_client()
+        for _ in range(2):
+            client.get("/pages/about/contact")
+        assert len(renders) == 2
+
+
+class TestETag:
+    @pytest.fixture
+    def client(self, make_app):
+        return make_app().test_client()
+
+    def test_not_modified(self, client, monkeypatch):
+        etag = client.get("/pages/about/contact").get_etag()[0]
+        assert etag
+
+        monkeypatch.setattr("sipa.blueprints.pages.render_template", pytest.fail)
+        response = client.get("/pages/about/contact", headers={"If-None-Match": f'"{etag}"'})
+        assert response.status_code == 304
+        assert response.get_etag() == (etag, False)
+
+    def test_news(self, client):
+        response = client.get("/news/")
+        assert response.get_etag()[0]
+        other = client.get("/news/", query_string={"start": 0, "end": -1})
+        assert other.get_etag()[0] != response.get_etag()[0]
+
+    def test_differs_by_locale(self, client):
+        de, en = (client.get("/pages/about/contact", headers={"Accept-Language": locale})
+                  for locale in ("de", "en"))
+        assert de.get_etag()[0] != en.get_etag()[0]
+
+    def test_changes_with_commit(self, make_app, content_repo):
+        app = make_app()
+        client = app.test_client()
+        etag = client.get("/pages/about/contact").get_etag()[0]
+        commit_pages(content_repo, {"about/contact.de.md": "title: Kontakt\n\nRuf uns an!"})
+        cf_pages(app).reload()
+        response = client.get("/pages/about/contact", headers={"If-None-Match": f'"{etag}"'})
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+
+
+    def test_changes_with_app_revision(self, make_app):
+        app = make_app()
+        client = app.test_client()
+        etag = client.get("/pages/about/contact").get_etag()[0]
+        app.config["APP_REVISION"] = "next-release"
+        response = client.get("/pages/about/contact", headers={"If-None-Match": f'"{etag}"'})
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+
+
+class TestSearch:
+    def test_per_locale(self, make_app):
+        app = make_app()
+        [de] = cf_pages(app).search("schreib", locale="de")
+        assert (de.title, de.values) == ("Kontakt", {"category_id": "about", "article_id": "contact"})
+        [en] = cf_pages(app).search("write", locale="en")
+        assert en.title == "Contact"
+        # untranslated articles are found in their default locale
+        assert [r.endpoint for r in cf_pages(app).search("hallo", locale="en")] \
+            == ["news.show_news"]
+
+    def test_only_changed_pages_tokenized(self, make_app, content_repo, monkeypatch):
+        app = make_app()
+        tokenized = []
+        plain_text = sipa.search.plain_text
+        monkeypatch.setattr(sipa.search, "plain_text",
+                            lambda html: tokenized.append(html) or plain_text(html))
+        commit_pages(content_repo, {"about/contact.de.md": "title: Kontakt\n\nRuf uns an!"})
+
+        cf_pages(app).reload()
+
+        assert len(tokenized) == 1
+        assert cf_pages(app).search("ruf", locale="de")
+        assert cf_pages(app).search("schreib", locale="de") == []
+
+    def test_broken_page_skipped(self, make_app, monkeypatch):
+        plain_text = sipa.search.plain_text
+
+        def fail_on_contact(html):
+            if "schreib" in html.lower():
+                raise ValueError("broken page")
+            return plain_text(html)
+
+        monkeypatch.setattr(sipa.search, "plain_text", fail_on_contact)
+        app = make_app()
+        assert cf_pages(app).search("schreib", locale="de") == []
+        assert cf_pages(app).search("hallo", locale="de")
+
+    def test_endpoint(self, make_app):
+        client = make_app().test_client()
+        html = client.get("/search", query_string={"q": "kont"},
+                          headers={"Accept-Language": "de"}).get_data(as_text=True)
+        assert 'href="/pages/about/contact"' in html
+        assert client.get("/search").status_code == 200
+
+
+class TestNewsFeed:
+    @pytest.fixture
+    def app(self, make_app, content_repo) -> Flask:
+        commit_pages(content_repo, {
+            "news/second.de.md": "title: Zweite News\ndate: 2024-02-01\n\nSiehe [Kontakt](/pages/about/contact).",
+            "news/second.en.md": "title: Second news\ndate: 2024-02-01\n\nHello again.",
+        })
+        return make_app()
+
+    def test_json(self, app):
+        feed = app.test_client().get("/news/feed.json", headers={"Accept-Language": "en"}).json
+        assert [item["title"] for item in feed["items"]] == ["Second news", "Erste News"]
+        assert feed["items"][0]["url"] == "http://localhost.localdomain/news/second"
+
+    def test_atom(self, app):
+        response = app.test_client().get("/news/feed.atom", headers={"Accept-Language": "de"})
+        assert response.mimetype == "application/atom+xml"
+        html = response.get_data(as_text=True)
+        assert "Zweite News" in html
+        # links in the content are absolute
+        assert 'href="http://localhost.localdomain/pages/about/contact"' in html
+
+    def test_cached_per_content_version(self, app, content_repo, monkeypatch):
+        client = app.test_client()
+        body = client.get("/news/feed.json").data
+        monkeypatch.setattr("sipa.blueprints.news.feed_entries", pytest.fail)
+        assert client.get("/news/feed.json").data == body
+
+        monkeypatch.undo()
+        commit_pages(content_repo, {"news/first.de.md": None})
+        cf_pages(app).reload()
+        assert len(client.get("/news/feed.json").json["items"]) == 1
+
+    def test_links_use_host_without_server_name(self, app):
+        app.config["SERVER_NAME"] = None
+        client = app.test_client()
+        for host in ("example.org", "evil.example"):
+            feed = client.get("/news/feed.json", headers={"Host": host}).json
+            assert feed["items"][0]["url"] == f"http://{host}/news/second"
+        # the feeds depending on the Host header stay out of the shared cache
+        assert not any(key.startswith("news-feed")
+                       for key in app.extensions["cache"]._cache)
+
+    def test_not_modified(self, app):
+        client = app.test_client()
+        etag, _ = client.get("/news/feed.atom").get_etag()
+        response = client.get("/news/feed.atom", headers={"If-None-Match": f'"{etag}"'})
+        assert response.status_code == 304
@@ -6,7 +6,7 @@ from unittest import TestCase
 
 from git import Repo
 
-from sipa.utils.git_utils import init_repo, update_repo
+from sipa.utils.git_utils import changed_files, init_repo, update_repo
 
 SAMPLE_FILE_NAME = "sample_file"
 OTHER_FILE_NAME = "other_sample_file"
@@ -194,3 +194,14 @@ class TestUpdateRepo(ExplicitlyClonedSampleRepoTestBase):
     def test_same_commit_after_update(self):
         self.update_repo()
         assert self.repo.commit().hexsha == self.cloned_repo.commit().hexsha
+
+    def test_update_returns_whether_changed(self):
+        assert update_repo(self.cloned_repo_path) is True
+        assert update_repo(self.cloned_repo_path) is False
+
+    def test_changed_files(self):
+        old_commit = self.cloned_repo.commit().hexsha
+        update_repo(self.cloned_repo_path)
+        new_commit = self.cloned_repo.commit().hexsha
+        assert changed_files(self.cloned_repo_path, old_commit, new_commit) == {OTHER_FILE_NAME}
+        assert changed_files(self.cloned_repo_path, "0" * 40, new_commit) is None
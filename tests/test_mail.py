@@ -1,10 +1,15 @@
+import smtplib
+import socket
 from dataclasses import dataclass, field
-from unittest import TestCase
+from importlib.util import find_spec
+from unittest import TestCase, skipUnless
 from unittest.mock import MagicMock, patch
 
+import time_machine
+
 from sipa.mail import send_contact_mail, send_complex_mail, \
     send_official_contact_mail, send_usersuite_contact_mail, \
-    compose_subject, compose_body, send_mail
+    compose_subject, compose_body, send_mail, SMTPConfig, SMTPTransport
 
 
 class MailSendingTestBase(TestCase):
@@ -429,3 +434,115 @@ class UsersuiteContactMailTestCase(MailSendingTestBase):
     def test_message_complete(self):
         self.assert_arg_in_call_arg("message", "message")
         assert self.user_mock.login.value in self.send_mail_mock.call_args[1]["message"]
+
+
+class SMTPTransportTestCase(TestCase):
+    CONFIG = SMTPConfig(host="some-mailserver.agdsn.network", port=587, ssl="starttls",
+                        user="test", password="secure")
+
+    def setUp(self):
+        super().setUp()
+        self.connections: list[MagicMock] = []
+        self.sendmail_error: type[Exception] | None = None
+
+        def connect(**_kwargs):
+            smtp = MagicMock()
+            smtp.noop.return_value = (250, b"OK")
+            smtp.sendmail.side_effect = self.sendmail_error
+            self.connections.append(smtp)
+            return smtp
+
+        patcher = patch('sipa.mail.smtplib.SMTP', side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.transport = SMTPTransport(self.CONFIG, pool_size=1, idle_timeout=60)
+
+    def send(self):
+        self.transport.send(from_addr="noreply@agdsn.de", to_addrs="support@agd.sn", msg="Hi")
+
+    def test_connection_reused(self):
+        self.send()
+        self.send()
+        [smtp] = self.connections
+        assert smtp.starttls.call_count == 1
+        assert smtp.login.call_count == 1
+        assert smtp.sendmail.call_count == 2
+        assert smtp.noop.called
+        assert not smtp.close.called
+
+    def test_no_pool(self):
+        self.transport.pool_size = 0
+        self.send()
+        self.send()
+        assert len(self.connections) == 2
+        assert all(smtp.close.called for smtp in self.connections)
+
+    def test_idle_connection_expires(self):
+        with time_machine.travel("2024-01-01 00:00:00", tick=False) as traveller:
+            self.send()
+            traveller.shift(61)
+            self.send()
+        old, new = self.connections
+        assert old.close.called
+        assert not old.noop.called
+        assert new.sendmail.called
+
+    def test_unhealthy_connection_replaced(self):
+        self.send()
+        self.connections[0].noop.side_effect = smtplib.SMTPServerDisconnected
+        self.send()
+        assert len(self.connections) == 2
+        assert self.connections[1].sendmail.called
+
+    def test_resent_after_disconnect(self):
+        self.send()
+        self.connections[0].sendmail.side_effect = smtplib.SMTPServerDisconnected
+        self.send()
+        assert len(self.connections) == 2
+        assert self.connections[1].sendmail.called
+
+    def test_failure_raised(self):
+        self.send()
+        self.connections[0].sendmail.side_effect = smtplib.SMTPServerDisconnected
+        self.sendmail_error = smtplib.SMTPServerDisconnected
+        with self.assertRaises(OSError):
+            self.send()
+        assert all(smtp.close.called for smtp in self.connections)
+
+    def test_close(self):
+        self.send()
+        self.transport.close()
+        assert self.connections[0].close.called
+
+
+@skipUnless(find_spec("aiosmtpd"), "aiosmtpd is not installed")
+class SMTPTransportServerTestCase(TestCase):
+    """Send mails to a local aiosmtpd server"""
+
+    def setUp(self):
+        from aiosmtpd.controller import Controller
+
+        self.messages = []
+        messages = self.messages
+
+        class Handler:
+            async def handle_DATA(self, server, session, envelope):
+                messages.append((session.peer, envelope))
+                return "250 OK"
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.controller = Controller(Handler(), hostname="127.0.0.1", port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        config = SMTPConfig(host="127.0.0.1", port=port)
+        self.transport = SMTPTransport(config, pool_size=1)
+        self.addCleanup(self.transport.close)
+
+    def test_messages_sent_over_one_connection(self):
+        for i in range(3):
+            self.transport.send(from_addr="noreply@agdsn.de", to_addrs="support@agd.sn",
+                                msg=f"Subject: {i}\n\nHi")
+        assert [envelope.rcpt_tos for _, envelope in self.messages] == [["support@agd.sn"]] * 3
+        assert len({peer for peer, _ in self.messages}) == 1
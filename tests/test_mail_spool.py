@@ -0,0 +1,93 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from sipa.mail import send_mail
+from sipa.utils.mail_spool import MailSender, MailSpool
+
+from .fixture_helpers import make_testing_app, DEFAULT_TESTING_CONFIG
+
+
+@pytest.fixture
+def spool(tmp_path, frozen_time) -> MailSpool:
+    return MailSpool(str(tmp_path / "spool" / "mails.sqlite"), max_attempts=3,
+                     retry_delay=10, lease=60)
+
+
+def test_claimed_mails_are_leased(spool, frozen_time):
+    spool.enqueue("noreply@agdsn.de", "support@agd.sn", "Hi")
+    [mail] = spool.claim_due()
+    assert (mail.to_addrs, mail.msg, mail.attempts) == ("support@agd.sn", "Hi", 0)
+    assert spool.claim_due() == []
+
+    frozen_time.shift(61)
+    assert [m.id for m in spool.claim_due()] == [mail.id]
+
+
+def test_delivered_mails_are_removed(spool):
+    spool.enqueue("noreply@agdsn.de", "support@agd.sn", "Hi")
+    [mail] = spool.claim_due()
+    spool.delivered(mail)
+    assert spool.pending() == 0
+
+
+def test_retry_backoff(spool, frozen_time):
+    spool.enqueue("noreply@agdsn.de", "support@agd.sn", "Hi")
+    for delay in (10, 20):
+        [mail] = spool.claim_due()
+        assert spool.attempt_failed(mail, "refused")
+        frozen_time.shift(delay - 1)
+        assert spool.claim_due() == []
+        frozen_time.shift(1)
+
+    [mail] = spool.claim_due()
+    assert mail.attempts == 2
+    assert not spool.attempt_failed(mail, "refused")
+    assert spool.pending() == 0
+
+
+def test_sender_delivers_and_retries(spool, frozen_time):
+    send = MagicMock(side_effect=[ConnectionRefusedError, None, None])
+    sender = MailSender(spool, send)
+    for recipient in ("a@agd.sn", "b@agd.sn"):
+        spool.enqueue("noreply@agdsn.de", recipient, "Hi")
+
+    assert sender.deliver_due() == 1
+    assert spool.pending() == 1
+    frozen_time.shift(10)
+    assert sender.deliver_due() == 1
+    assert [c.args[1] for c in send.call_args_list] == ["a@agd.sn", "b@agd.sn", "a@agd.sn"]
+
+
+def test_sender_counts_any_exception_as_failed_attempt(spool, frozen_time):
+    error = UnicodeEncodeError("ascii", "ä", 0, 1, "ordinal not in range(128)")
+    send = MagicMock(side_effect=[error, None])
+    sender = MailSender(spool, send)
+    for recipient in ("ä@agd.sn", "b@agd.sn"):
+        spool.enqueue("noreply@agdsn.de", recipient, "Hi")
+
+    # the rest of the batch is still delivered
+    assert sender.deliver_due() == 1
+    assert spool.claim_due() == []
+    frozen_time.shift(10)
+    [mail] = spool.claim_due()
+    assert (mail.to_addrs, mail.attempts) == ("ä@agd.sn", 1)
+
+
+def test_send_mail_only_enqueues(tmp_path):
+    app = make_testing_app(DEFAULT_TESTING_CONFIG | {
+        "MAIL_SPOOL_PATH": str(tmp_path / "mails.sqlite"),
+        "CONTACT_SENDER_MAIL": "noreply@agdsn.de",
+    })
+    delivered = threading.Event()
+    transport = MagicMock(**{"send.side_effect": lambda **_: delivered.set()})
+
+    with patch("sipa.mail.get_transport", return_value=transport) as get_transport, \
+            app.app_context():
+        assert send_mail("foo@bar.baz", "support@agd.sn", "Internet broken", "Fix it!")
+        assert delivered.wait(5)
+
+    assert get_transport.call_args.args == (app.config,)
+    assert transport.send.call_args.kwargs["to_addrs"] == "support@agd.sn"
+    assert "Subject: Internet broken" in transport.send.call_args.kwargs["msg"]
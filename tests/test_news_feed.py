@@ -0,0 +1,47 @@
+import json
+from datetime import date, datetime, timezone, timedelta
+from xml.etree import ElementTree
+
+import pytest
+
+from sipa.utils.news_feed import ATOM_NAMESPACE, Feed, FeedEntry, atom_feed, json_feed, timestamp
+
+FEED = Feed(
+    title="AG DSN News",
+    home_url="http://localhost/news/",
+    feed_url="http://localhost/news/feed.atom",
+    entries=[
+        FeedEntry("http://localhost/news/second", "Zweite", "2024-02-01T00:00:00Z", "<p>2</p>"),
+        FeedEntry("http://localhost/news/first", "Erste", "2024-01-01T00:00:00Z", "<p>1</p>"),
+    ],
+)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (date(2024, 1, 2), "2024-01-02T00:00:00Z"),
+    (datetime(2024, 1, 2, 12, 30), "2024-01-02T12:30:00+00:00"),
+    (datetime(2024, 1, 2, 12, 30, tzinfo=timezone(timedelta(hours=1))),
+     "2024-01-02T12:30:00+01:00"),
+])
+def test_timestamp(value, expected):
+    assert timestamp(value) == expected
+
+
+def test_atom_feed():
+    ns = {"atom": ATOM_NAMESPACE}
+    root = ElementTree.fromstring(atom_feed(FEED))
+    assert root.findtext("atom:updated", namespaces=ns) == "2024-02-01T00:00:00Z"
+    entries = root.findall("atom:entry", ns)
+    assert [e.findtext("atom:title", namespaces=ns) for e in entries] == ["Zweite", "Erste"]
+    assert entries[0].findtext("atom:content", namespaces=ns) == "<p>2</p>"
+
+
+def test_empty_atom_feed():
+    root = ElementTree.fromstring(atom_feed(FEED._replace(entries=[])))
+    assert root.findtext(f"{{{ATOM_NAMESPACE}}}updated") == "1970-01-01T00:00:00Z"
+
+
+def test_json_feed():
+    feed = json.loads(json_feed(FEED))
+    assert feed["feed_url"] == FEED.feed_url
+    assert [item["id"] for item in feed["items"]] == [e.url for e in FEED.entries]
@@ -0,0 +1,128 @@
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from sipa.utils.cache import MISSING, SimpleCache
+from sipa.utils.refresher import BackgroundFeed, Refresher, init_refresher
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.extensions['cache'] = SimpleCache(maxsize=16)
+    return app
+
+
+class Source:
+    """Returns the given results one after another"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def make_feed(source, **kwargs):
+    return BackgroundFeed("test", source, interval=60, default=lambda: "default",
+                          max_age=600, **kwargs)
+
+
+@pytest.fixture
+def refresh(app):
+    """Refresh the due feeds, as the thread would"""
+    def refresh(*feeds):
+        return Refresher(app, feeds).refresh_due()
+    return refresh
+
+
+@pytest.fixture
+def refresher(app):
+    refresher = app.extensions['refresher'] = Refresher(app, [])
+    with patch.object(refresher, 'wake_up'):
+        yield refresher
+
+
+@pytest.mark.usefixtures("refresher")
+class TestBackgroundFeed:
+    def test_fetched_once_per_interval(self, app, frozen_time, refresh):
+        feed = make_feed(source := Source(1, 2))
+        assert refresh(feed) == 1
+        frozen_time.shift(59)
+        assert refresh(feed) == 0
+        frozen_time.shift(1)
+        assert refresh(feed) == 1
+        with app.app_context():
+            assert feed() == 2
+        assert source.calls == 2
+
+    def test_failure_keeps_snapshot(self, app, frozen_time, refresh):
+        feed = make_feed(Source(1, OSError(), None))
+        refresh(feed)
+        for delay in (60, 30):
+            frozen_time.shift(delay)
+            refresh(feed)
+            with app.app_context():
+                assert feed() == 1
+
+    def test_default_without_snapshot(self, app, refresh):
+        feed = make_feed(Source(None))
+        refresh(feed)
+        with app.app_context():
+            assert feed() == "default"
+
+    def test_default_once_too_old(self, app, frozen_time, refresh):
+        feed = make_feed(Source(1, *[None] * 10), max_backoff=60)
+        refresh(feed)
+        for _ in range(10):
+            frozen_time.shift(60)
+            refresh(feed)
+        frozen_time.shift(1)
+        with app.app_context():
+            assert feed() == "default"
+
+    def test_backoff(self, frozen_time, refresh):
+        feed = make_feed(source := Source(None, None, None, 1),
+                         retry_delay=10, max_backoff=25)
+        refresh(feed)
+        for delay in (10, 20, 25):
+            frozen_time.shift(delay - 1)
+            assert refresh(feed) == 0
+            frozen_time.shift(1)
+            assert refresh(feed) == 1
+        assert source.calls == 4
+
+    def test_leased_feed_skipped(self, app, refresh):
+        feed = make_feed(source := Source(1))
+        backend = app.extensions['cache']
+        backend.set(feed.lease_key, True, ttl=60)
+        assert refresh(feed) == 0
+        assert source.calls == 0
+
+        backend.delete(feed.lease_key)
+        assert refresh(feed) == 1
+        # the lease is released afterwards
+        assert backend.get(feed.lease_key) is MISSING
+
+    def test_calls_never_fetch(self, app, refresher):
+        feed = make_feed(source := Source(1))
+        with app.app_context():
+            assert feed() == "default"
+            # the thread is told to fetch the missing snapshot right away
+            refresher.wake_up.assert_called_once()
+        assert source.calls == 0
+
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_init_refresher(enabled):
+    app = Flask(__name__)
+    app.config.update(BACKGROUND_REFRESH=enabled, BACKGROUND_REFRESH_TICK=10)
+    init_refresher(app)
+    refresher = app.extensions['refresher']
+    assert (refresher.ensure_running in app.before_request_funcs[None]) == enabled
@@ -0,0 +1,67 @@
+from collections import Counter
+
+import pytest
+
+from sipa.search import SearchIndex, SearchResult, plain_text, summarize, tokenize
+
+
+def result(title: str) -> SearchResult:
+    return SearchResult(title=title, summary="", endpoint="pages.show", values={})
+
+
+@pytest.fixture
+def index() -> SearchIndex:
+    documents = {
+        "WLAN": "wlan wlan einrichten passwort",
+        "Mitgliedschaft": "mitgliedschaft beitrag beenden",
+        "Passwort": "passwort passwort passwort ändern",
+    }
+    return SearchIndex(
+        ((result(title), Counter(text.split())) for title, text in documents.items()),
+        locale="de",
+    )
+
+
+def titles(results: list[SearchResult]) -> list[str]:
+    return [r.title for r in results]
+
+
+@pytest.mark.parametrize("locale, text, terms", [
+    ("de", "Das WLAN-Passwort ändern", ["wlan", "passwort", "ändern"]),
+    ("en", "Change the WiFi password", ["change", "wifi", "password"]),
+    ("fr", "Le mot de passe", ["le", "mot", "de", "passe"]),
+])
+def test_tokenize(locale, text, terms):
+    assert tokenize(text, locale) == terms
+
+
+def test_plain_text():
+    assert plain_text("<p>Hallo &amp;\n<a href='/'>Welt</a></p>") == "Hallo & Welt"
+
+
+def test_summarize():
+    assert summarize("kurz") == "kurz"
+    assert summarize("wort " * 100).endswith("wort…")
+
+
+def test_ranked_by_weight(index):
+    assert titles(index.search("passwort")) == ["Passwort", "WLAN"]
+
+
+def test_prefix(index):
+    assert titles(index.search("mitglied")) == ["Mitgliedschaft"]
+    assert titles(index.search("pass")) == ["Passwort", "WLAN"]
+
+
+def test_all_terms_required(index):
+    assert titles(index.search("WLAN Passwort")) == ["WLAN"]
+    assert index.search("WLAN Beitrag") == []
+
+
+@pytest.mark.parametrize("query", ["", "der die das", "nichts"])
+def test_no_results(index, query):
+    assert index.search(query) == []
+
+
+def test_limit(index):
+    assert len(index.search("pass", limit=1)) == 1
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from sipa.utils.single_flight import SingleFlight
+
+
+def run_concurrently(single_flight: SingleFlight, key, func, n: int = 3):
+    """Call ``func`` through ``single_flight`` in ``n`` threads at once"""
+    started = threading.Barrier(n)
+    results = []
+
+    def target():
+        started.wait()
+        try:
+            results.append(single_flight.do(key, func))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def slow(result, calls: list):
+    def func():
+        calls.append(None)
+        threading.Event().wait(0.2)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return func
+
+
+def test_concurrent_calls_share_result():
+    calls = []
+    results = run_concurrently(SingleFlight(), "key", slow({"id": 1}, calls))
+    assert len(calls) == 1
+    assert results == [{"id": 1}] * 3
+    assert results[0] is results[1] is results[2]
+
+
+def test_concurrent_calls_share_error():
+    calls = []
+    error = ValueError("nope")
+    results = run_concurrently(SingleFlight(), "key", slow(error, calls))
+    assert len(calls) == 1
+    assert results == [error] * 3
+
+
+def test_sequential_calls_not_cached():
+    single_flight = SingleFlight()
+    assert single_flight.do("key", lambda: 1) == 1
+    assert single_flight.do("key", lambda: 2) == 2
+
+
+def test_failure_does_not_stick():
+    single_flight = SingleFlight()
+    with pytest.raises(ValueError):
+        single_flight.do("key", lambda: int("x"))
+    assert single_flight.do("key", lambda: 3) == 3
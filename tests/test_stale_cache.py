@@ -0,0 +1,92 @@
+import threading
+
+from sipa.utils.cache import SimpleCache
+from sipa.utils.stale_cache import StaleWhileRevalidate
+
+
+def fetcher(value, calls: list, delay: float = 0):
+    def fetch():
+        calls.append(value)
+        threading.Event().wait(delay)
+        return value
+    return fetch
+
+
+def swr(**kwargs):
+    return StaleWhileRevalidate(fresh_for=20, stale_for=100, **kwargs)
+
+
+def wait_for_refresh(cache: StaleWhileRevalidate):
+    cache._executor.shutdown(wait=True)
+    cache._executor = None
+
+
+def test_missing_values_fetched_concurrently():
+    cache, backend, calls = swr(), SimpleCache(maxsize=8), []
+    started = threading.Barrier(3, timeout=1)
+
+    def fetch(value):
+        def inner():
+            # fails unless all three are fetched at the same time
+            started.wait()
+            calls.append(value)
+            return value
+        return inner
+
+    values = cache.get_many({key: fetch(key) for key in "abc"}, backend)
+    assert values == {"a": "a", "b": "b", "c": "c"}
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+def test_fresh_value_not_fetched_again(frozen_time):
+    backend, calls = SimpleCache(maxsize=8), []
+    cache = swr()
+    cache.get_many({"a": fetcher(1, calls)}, backend)
+    frozen_time.shift(19)
+    assert cache.get_many({"a": fetcher(2, calls)}, backend) == {"a": 1}
+    assert calls == [1]
+
+
+def test_stale_value_served_while_refreshing(frozen_time):
+    backend, calls = SimpleCache(maxsize=8), []
+    cache = swr()
+    cache.get_many({"a": fetcher(1, calls)}, backend)
+    frozen_time.shift(30)
+    assert cache.get_many({"a": fetcher(2, calls)}, backend) == {"a": 1}
+    wait_for_refresh(cache)
+    assert calls == [1, 2]
+    assert cache.get_many({"a": fetcher(3, calls)}, backend) == {"a": 2}
+
+
+def test_failed_refresh_keeps_stale_value(frozen_time):
+    backend = SimpleCache(maxsize=8)
+    cache = swr()
+    cache.get_many({"a": lambda: 1}, backend)
+    frozen_time.shift(30)
+
+    def fail():
+        raise OSError
+
+    cache.get_many({"a": fail}, backend)
+    wait_for_refresh(cache)
+    assert cache.get_many({"a": lambda: None}, backend) == {"a": 1}
+
+
+def test_failed_fetch_cached_briefly(frozen_time):
+    cache, backend, calls = swr(failure_for=5), SimpleCache(maxsize=8), []
+    assert cache.get_many({"a": fetcher(None, calls)}, backend) == {"a": None}
+    frozen_time.shift(4)
+    assert cache.get_many({"a": fetcher(1, calls)}, backend) == {"a": None}
+    assert calls == [None]
+    frozen_time.shift(1)
+    assert cache.get_many({"a": fetcher(1, calls)}, backend) == {"a": 1}
+
+
+def test_slow_fetch_times_out():
+    cache, backend, calls = swr(timeout=0.05), SimpleCache(maxsize=8), []
+    values = cache.get_many({"slow": fetcher(1, calls, delay=0.3), "fast": fetcher(2, calls)},
+                            backend)
+    assert values == {"slow": None, "fast": 2}
+    wait_for_refresh(cache)
+    # the slow value is still stored once it arrives
+    assert cache.get_many({"slow": fetcher(3, calls)}, backend) == {"slow": 1}